@@ -0,0 +1,218 @@
+"""Mede a latência dos dashboards e da importação de planilhas em um banco sintético.
+
+Gera (ou reaproveita) um banco e uma planilha com benchmarks.synthetic e roda
+cada cenário em um processo separado, com a aplicação completa via cliente de
+teste do Flask, para medir também o pico de memória (RSS) de cada um:
+
+- dashboard_master / dashboard_seller: primeira abertura de cada mês (cache
+  frio) e aberturas repetidas do mês atual (cache quente);
+- upload: envio da planilha até o job terminar, e o reenvio do mesmo arquivo.
+
+O resultado é gravado em JSON (com o commit atual) para comparar entre versões.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.app_benchmark --sellers 40 --years 5 --orders 2000
+    python -m benchmarks.app_benchmark --compare benchmarks/results/anterior.json
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+
+ROOT = synthetic.ROOT
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+SCENARIOS = ('dashboard_master', 'dashboard_seller', 'upload')
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {'count': len(samples),
+            'mean_ms': statistics.fmean(samples) * 1000,
+            'p50_ms': samples[len(samples) // 2] * 1000,
+            'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            'max_ms': samples[-1] * 1000}
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def client_for(role, user_id):
+    import comisys
+    client = comisys.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['role'] = role
+    return client
+
+
+def measure_dashboard(role, user_id, months, repeat):
+    client = client_for(role, user_id)
+    prefix = '/dashboard' if role == 'master' else f'/dashboard/{user_id}'
+
+    def get(year, month):
+        response = client.get(f'{prefix}/{year}/{month}')
+        if response.status_code != 200:
+            raise RuntimeError(f'{prefix}/{year}/{month}: {response.status_code}')
+
+    cold = [timed(lambda: get(year, month))[0] for year, month in months]
+    year, month = months[-1]
+    warm = [timed(lambda: get(year, month))[0] for _ in range(repeat)]
+    return {'cold': summarize(cold), 'warm': summarize(warm)}
+
+
+def measure_upload(master_id, sheet):
+    client = client_for('master', master_id)
+
+    def upload():
+        with open(sheet, 'rb') as file:
+            response = client.post('/upload', data={'file': (file, 'vendas.xlsx')},
+                                   headers={'Accept': 'application/json'})
+        status_url = response.json['status_url']
+        while True:
+            job = client.get(status_url).json
+            if job['status'] in ('done', 'error'):
+                if job['status'] == 'error':
+                    raise RuntimeError(job['result'])
+                return job
+            time.sleep(0.01)
+
+    first, job = timed(upload)
+    repeated, _ = timed(upload)
+    return {'first_s': first, 'repeated_s': repeated, 'rows_parsed': job['rows_parsed'], 'result': job['result']}
+
+
+def measure(scenario, database, sheet, master_id, seller_id, months, repeat):
+    # Cada cenário roda em uma cópia do banco, com a aplicação importada já apontando para ela
+    os.environ['COMISYS_DATABASE'] = database
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import comisys  # noqa: F401 (inicializa o banco e a aplicação)
+    startup = time.perf_counter() - start
+
+    if scenario == 'dashboard_master':
+        result = measure_dashboard('master', master_id, months, repeat)
+    elif scenario == 'dashboard_seller':
+        result = measure_dashboard('seller', seller_id, months, repeat)
+    else:
+        result = measure_upload(master_id, sheet)
+
+    # ru_maxrss é em KB no Linux
+    result['startup_s'] = startup
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        sheet = os.path.join(tmp, 'vendas.xlsx')
+        start = time.perf_counter()
+        master_id, seller_ids = synthetic.make_database(database, args.sellers, tuple(args.branches.split(',')),
+                                                        args.years, args.orders)
+        sheet_rows = synthetic.make_sheet(database, sheet)
+        generated = time.perf_counter() - start
+        months = synthetic.periods(args.years)[-args.months:]
+
+        results = {}
+        for scenario in args.scenarios:
+            copy = os.path.join(tmp, f'{scenario}.db')
+            shutil.copy(database, copy)
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.app_benchmark', '--measure', scenario, copy, sheet,
+                 str(master_id), str(seller_ids[0]), json.dumps(months), str(args.repeat)],
+                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+            results[scenario] = json.loads(output.splitlines()[-1])
+
+    return {'commit': git_commit(),
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'params': {'sellers': args.sellers, 'branches': args.branches, 'years': args.years,
+                       'orders_per_month': args.orders, 'months': args.months, 'repeat': args.repeat,
+                       'sheet_rows': sheet_rows},
+            'generate_s': generated,
+            'results': results}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}, só com os valores numéricos."""
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not key.endswith('count'):
+            values[f'{prefix}{key}'] = value
+    return values
+
+
+def print_report(report, previous=None):
+    current = flatten(report['results'])
+    before = flatten(previous['results']) if previous else {}
+    header = f'{"métrica":<40} {report["commit"] or "atual":>12}'
+    if previous:
+        header += f' {previous["commit"] or "anterior":>12} {"variação":>9}'
+    print(header)
+    for name, value in current.items():
+        line = f'{name:<40} {value:>12.2f}'
+        if name in before:
+            change = (value - before[name]) / before[name] * 100 if before[name] else 0
+            line += f' {before[name]:>12.2f} {change:>+8.1f}%'
+        print(line)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sellers', type=int, default=20)
+    parser.add_argument('--branches', default='Loja,Oficina')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--orders', type=int, default=1000, help='Pedidos por mês.')
+    parser.add_argument('--months', type=int, default=12, help='Meses abertos com o cache frio.')
+    parser.add_argument('--repeat', type=int, default=50, help='Aberturas do mês atual com o cache quente.')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('-o', '--output', help='Arquivo JSON do resultado (padrão: benchmarks/results/).')
+    parser.add_argument('--compare', help='Resultado anterior (JSON) para comparar.')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f'{datetime.datetime.now():%Y%m%d-%H%M%S}-{report["commit"]}.json')
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    print_report(report, previous)
+    print(f'Resultado gravado em {output}')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        scenario, database, sheet, master_id, seller_id, months, repeat = sys.argv[2:9]
+        measure(scenario, database, sheet, int(master_id), int(seller_id), [tuple(month) for month in
+                json.loads(months)], int(repeat))
+    else:
+        main(sys.argv[1:])
@@ -0,0 +1,85 @@
+"""Compara a leitura em fluxo da planilha com a leitura dupla via pd.read_excel.
+
+Gera uma planilha sintética no layout do ERP e mede, em um processo separado
+para cada modo, o tempo total e o pico de memória (RSS).
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.parser_benchmark 200000
+"""
+import datetime
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+SELLERS = ['JUCILANDE BISPO DA SILVA', 'JOSUILTON MOREIRA DOS SANTOS', 'JOAO PAULO SANTANA BATISTA']
+CLIENTS = ['Cliente A', 'Cliente B', 'COMAGRO OFICINA', 'Cliente C']
+
+
+def make_workbook(path, rows):
+    rng = random.Random(rows)
+    today = datetime.date.today().strftime('%d/%m/%Y')
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Relatório de Vendas'])
+    sheet.append([])
+    sheet.append(['Data', 'Valor Total', 'Nº Ped/ OS/ PRQ', 'Vendedor', 'Cliente'])
+    for _ in range(rows):
+        sheet.append([today, round(rng.uniform(1, 500), 2), rng.randrange(rows), rng.choice(SELLERS),
+                      rng.choice(CLIENTS)])
+    workbook.save(path)
+
+
+def legacy_read(file_path):
+    # Leitura anterior: a planilha inteira duas vezes, procurando o cabeçalho com iterrows
+    import pandas as pd
+    df = pd.read_excel(file_path, header=None)
+    start_row = next(i for i, row in df.iterrows() if 'data' in row.astype(str).str.lower().tolist())
+    df = pd.read_excel(file_path, skiprows=start_row)
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    df = df.dropna(how='all')
+    df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y', errors='coerce')
+    df['valor total'] = pd.to_numeric(df['valor total'], errors='coerce')
+    return len(df.dropna(subset=['data', 'valor total']))
+
+
+def streaming_read(file_path):
+    from modules.sales.parser import iter_chunks
+    return sum(len(chunk) for chunk in iter_chunks(file_path))
+
+
+def measure(mode, file_path):
+    start = time.perf_counter()
+    rows = {'legacy': legacy_read, 'streaming': streaming_read}[mode](file_path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss é em KB no Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'mode': mode, 'rows': rows, 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb}))
+
+
+def main(argv):
+    rows = int(argv[0]) if argv else 200000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'vendas.xlsx')
+        make_workbook(path, rows)
+        print(f'{rows} linhas ({os.path.getsize(path) / 1024 / 1024:.1f} MB)')
+        print(f'{"modo":>10} {"linhas":>8} {"tempo (s)":>10} {"pico RSS (MB)":>14}')
+        for mode in ('legacy', 'streaming'):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.parser_benchmark', '--measure', mode, path],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output)
+            print(f'{mode:>10} {result["rows"]:>8} {result["seconds"]:>10.2f} {result["peak_rss_mb"]:>14.1f}')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        measure(sys.argv[2], sys.argv[3])
+    else:
+        main(sys.argv[1:])
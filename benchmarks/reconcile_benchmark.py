@@ -0,0 +1,146 @@
+"""Compara a importação por diferença (content_hash) com a regravação do mês inteiro.
+
+O banco já contém a planilha anterior do mês e a nova planilha muda só uma
+fração dos pedidos, como acontece quando a mesma planilha é reenviada ao longo
+do mês. Mede o tempo e o número de linhas escritas em Sales.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.reconcile_benchmark 1000 10000 100000
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from modules.db import get_db_connection
+from modules.sales.reconcile import (ORDER_COLUMN, group_orders, apply_orders, create_staging, stage_orders,
+                                     register_functions)
+from modules.sales.sellers import SellerResolver
+
+SELLERS = ['Jucilande Bispo Da Silva', 'Josuilton Moreira Dos Santos', 'João Paulo Santana Batista']
+CHANGED_FRACTION = 0.01
+
+
+def create_db(path, df):
+    conn = get_db_connection(path)
+    register_functions(conn)
+    conn.executescript('''
+        CREATE TABLE Users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL);
+        CREATE TABLE Sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            amount REAL NOT NULL,
+            user_id INTEGER,
+            order_number TEXT NOT NULL,
+            processed BOOLEAN DEFAULT 0,
+            content_hash INTEGER
+        );
+        CREATE TABLE SellerAliases (alias TEXT PRIMARY KEY, user_id INTEGER NOT NULL);
+        CREATE UNIQUE INDEX idx_sales_order_number ON Sales (order_number);
+        CREATE INDEX idx_sales_date ON Sales (date);
+    ''')
+    conn.executemany('INSERT INTO Users (name) VALUES (?)', [(name,) for name in SELLERS])
+    # Planilha anterior já importada
+    bulk(conn, df)
+    # Contador de linhas escritas em Sales (as tabelas temporárias não entram)
+    conn.executescript('''
+        CREATE TEMP TABLE Written (count INTEGER);
+        INSERT INTO Written VALUES (0);
+        CREATE TEMP TRIGGER written_insert AFTER INSERT ON main.Sales BEGIN UPDATE Written SET count = count + 1; END;
+        CREATE TEMP TRIGGER written_update AFTER UPDATE ON main.Sales BEGIN UPDATE Written SET count = count + 1; END;
+        CREATE TEMP TRIGGER written_delete AFTER DELETE ON main.Sales BEGIN UPDATE Written SET count = count + 1; END;
+    ''')
+    return conn
+
+
+def make_sheet(rows, seed=0):
+    rng = random.Random(seed)
+    now = pd.Timestamp(datetime.date.today())
+    return pd.DataFrame({
+        'data': [now] * rows,
+        'valor total': [round(rng.uniform(1, 500), 2) for _ in range(rows)],
+        ORDER_COLUMN: [str(order) for order in range(rows)],
+        'vendedor': [rng.choice(SELLERS).upper() for _ in range(rows)],
+        'cliente': ['Cliente'] * rows,
+    })
+
+
+def change_sheet(df):
+    """Nova versão da planilha: alguns valores mudam, alguns pedidos somem e outros entram."""
+    rng = random.Random(len(df))
+    df = df.copy()
+    changed = max(1, int(len(df) * CHANGED_FRACTION))
+    positions = rng.sample(range(len(df)), changed * 2)
+    df.loc[positions[:changed], 'valor total'] += 10
+    df = df.drop(index=positions[changed:])
+    extra = make_sheet(changed, seed=1)
+    extra[ORDER_COLUMN] = [f'N{order}' for order in range(changed)]
+    return pd.concat([df, extra], ignore_index=True)
+
+
+def orders(conn, df):
+    return group_orders(df.assign(user_id=SellerResolver(conn.cursor()).resolve(df['vendedor'])))
+
+
+def rewrite(conn, df):
+    # Conciliação anterior ao content_hash: toda venda do mês é marcada,
+    # regravada a partir da planilha e as não processadas são apagadas
+    now = datetime.datetime.now()
+    start_date = f'{now.year:04d}-{now.month:02d}-01'
+    cursor = conn.cursor()
+    create_staging(cursor)
+    stage_orders(cursor, orders(conn, df))
+    cursor.execute("UPDATE Sales SET processed = 0 WHERE date >= ?", (start_date,))
+    cursor.execute('''
+        INSERT INTO Sales (date, amount, user_id, order_number, processed)
+        SELECT date, amount, user_id, order_number, 1
+        FROM ImportStaging
+        WHERE true
+        ON CONFLICT(order_number) DO UPDATE SET date = excluded.date, amount = excluded.amount,
+                                                user_id = excluded.user_id, processed = 1
+    ''')
+    cursor.execute('DELETE FROM Sales WHERE amount <= 0 OR (processed = 0 AND date >= ?)', (start_date,))
+    conn.commit()
+
+
+def bulk(conn, df):
+    now = datetime.datetime.now()
+    apply_orders(conn.cursor(), orders(conn, df), now.year, now.month)
+    conn.commit()
+
+
+def run(rows):
+    previous = make_sheet(rows)
+    current = change_sheet(previous)
+    results = {}
+    for name, func in (('rewrite', rewrite), ('delta', bulk)):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = create_db(os.path.join(tmp, 'bench.db'), previous)
+            start = time.perf_counter()
+            func(conn, current)
+            results[name] = time.perf_counter() - start
+            results[name + '_written'] = conn.execute('SELECT count FROM Written').fetchone()[0]
+            results[name + '_rows'] = conn.execute('SELECT COUNT(*), ROUND(SUM(amount), 2) FROM Sales').fetchone()
+            conn.close()
+    return results
+
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [1000, 10000, 100000]
+    print(f'{"linhas":>8} {"mês (s)":>10} {"escritas":>9} {"delta (s)":>10} {"escritas":>9} {"ganho":>8}')
+    for rows in sizes:
+        results = run(rows)
+        if tuple(results['rewrite_rows']) != tuple(results['delta_rows']):
+            print(f'  aviso: resultados diferentes {tuple(results["rewrite_rows"])} x {tuple(results["delta_rows"])}')
+        print(f'{rows:>8} {results["rewrite"]:>10.3f} {results["rewrite_written"]:>9} '
+              f'{results["delta"]:>10.3f} {results["delta_written"]:>9} '
+              f'{results["rewrite"] / results["delta"]:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,169 @@
+"""Gera dados sintéticos para os benchmarks: um sales_tracking.db completo e
+planilhas do ERP no layout lido por process_file.
+
+O banco é criado com o esquema da própria aplicação (importando comisys com
+COMISYS_DATABASE apontando para o arquivo novo) e preenchido com vendedores,
+metas e vendas de todos os meses do período, terminando no mês atual. A
+planilha traz os pedidos do mês atual que já estão no banco, com uma fração
+alterada e alguns pedidos novos, como um reenvio real ao longo do mês.
+
+Uso (a partir da raiz do projeto):
+
+    python -m benchmarks.synthetic db /tmp/bench.db --sellers 40 --years 5 --orders 2000
+    python -m benchmarks.synthetic sheet /tmp/bench.db /tmp/vendas.xlsx
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+
+from openpyxl import Workbook
+from werkzeug.security import generate_password_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENTS = ['Cliente A', 'Cliente B', 'Cliente C', 'Cliente D']
+PASSWORD = 'senha'
+
+
+def seller_name(index):
+    return f'Vendedor {index:03d}'
+
+
+def periods(years, today=None):
+    """Meses (ano, mês) dos últimos `years` anos, do mais antigo até o mês atual."""
+    today = today or datetime.date.today()
+    year, month = today.year - years, today.month
+    result = []
+    while (year, month) <= (today.year, today.month):
+        result.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return result[1:]
+
+
+def create_schema(path):
+    """Cria o banco vazio com o esquema da aplicação (as migrações rodam ao importar comisys)."""
+    env = dict(os.environ, COMISYS_DATABASE=path)
+    subprocess.run([sys.executable, '-c', 'import comisys'], cwd=ROOT, env=env, check=True)
+
+
+def make_database(path, sellers=20, branches=('Loja', 'Oficina'), years=3, orders_per_month=1000, seed=0):
+    """Cria um banco sintético e retorna os ids dos vendedores e do usuário master."""
+    if os.path.exists(path):
+        os.remove(path)
+    create_schema(path)
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    password = generate_password_hash(PASSWORD, method='pbkdf2:sha256')
+
+    cursor.execute("INSERT INTO Users (username, password, name, role, branch) VALUES ('master', ?, 'Master', 'master', ?)",
+                   (password, branches[0]))
+    master_id = cursor.lastrowid
+    seller_ids = []
+    for index in range(1, sellers + 1):
+        cursor.execute("INSERT INTO Users (username, password, name, role, branch) VALUES (?, ?, ?, 'seller', ?)",
+                       (f'vendedor{index:03d}', password, seller_name(index), branches[index % len(branches)]))
+        seller_ids.append(cursor.lastrowid)
+
+    average_amount = 250.0
+    order_number = 0
+    for year, month in periods(years):
+        monthly_total = orders_per_month * average_amount
+        cursor.execute('INSERT INTO GeneralGoals (year, month, goal) VALUES (?, ?, ?)',
+                       (year, month, round(monthly_total * 0.9, 2)))
+        cursor.executemany('INSERT INTO IndividualGoals (user_id, year, month, goal) VALUES (?, ?, ?, ?)',
+                           [(user_id, year, month, round(monthly_total / sellers * 0.9, 2)) for user_id in seller_ids])
+
+        sales = []
+        for _ in range(orders_per_month):
+            order_number += 1
+            day = rng.randint(1, 28)
+            sales.append((f'{year:04d}-{month:02d}-{day:02d}', round(rng.uniform(1, average_amount * 2), 2),
+                          rng.choice(seller_ids), str(order_number)))
+        cursor.executemany('INSERT INTO Sales (date, amount, user_id, order_number) VALUES (?, ?, ?, ?)', sales)
+
+    # Resumo mensal, catálogo de meses e content_hash, como depois de importações reais
+    sys.path.insert(0, ROOT)
+    from modules.summary import rebuild_monthly_summary
+    from modules.sales.reconcile import register_functions
+    register_functions(conn)
+    cursor.execute('UPDATE Sales SET content_hash = content_hash(date, amount, user_id)')
+    rebuild_monthly_summary(cursor)
+    conn.commit()
+    cursor.execute('ANALYZE')
+    conn.close()
+    return master_id, seller_ids
+
+
+def make_sheet(database, path, changed=0.02, new_orders=0.02, lines_per_order=2, seed=1):
+    """Gera a planilha do mês atual a partir das vendas do banco; retorna o número de linhas."""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    start = f'{today.year:04d}-{today.month:02d}-01'
+
+    conn = sqlite3.connect(database)
+    rows = conn.execute('''
+        SELECT s.date, s.amount, s.order_number, u.name
+        FROM Sales s JOIN Users u ON u.id = s.user_id
+        WHERE s.date >= ?
+        ORDER BY s.date, s.order_number
+    ''', (start,)).fetchall()
+    names = [row[0] for row in conn.execute("SELECT name FROM Users WHERE role = 'seller'")]
+    last_order = conn.execute('SELECT MAX(CAST(order_number AS INTEGER)) FROM Sales').fetchone()[0] or 0
+    conn.close()
+
+    orders = [list(row) for row in rows]
+    for order in rng.sample(orders, int(len(orders) * changed)):
+        order[1] = round(order[1] + 10, 2)
+    for index in range(int(len(orders) * new_orders) or 1):
+        orders.append([today.strftime('%Y-%m-%d'), round(rng.uniform(1, 500), 2), str(last_order + index + 1),
+                       rng.choice(names)])
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Relatório de Vendas'])
+    sheet.append([])
+    sheet.append(['Data', 'Valor Total', 'Nº Ped/ OS/ PRQ', 'Vendedor', 'Cliente'])
+    count = 0
+    for date, amount, order_number, name in orders:
+        # O valor do pedido é dividido entre as linhas (itens) do pedido
+        date = datetime.date.fromisoformat(date).strftime('%d/%m/%Y')
+        line_amount = round(amount / lines_per_order, 2)
+        for line in range(lines_per_order):
+            value = line_amount if line < lines_per_order - 1 else round(amount - line_amount * line, 2)
+            sheet.append([date, value, int(order_number), name.upper(), rng.choice(CLIENTS)])
+            count += 1
+    workbook.save(path)
+    return count
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    db_parser = commands.add_parser('db', help='Gera o banco sintético.')
+    db_parser.add_argument('path')
+    db_parser.add_argument('--sellers', type=int, default=20)
+    db_parser.add_argument('--branches', default='Loja,Oficina')
+    db_parser.add_argument('--years', type=int, default=3)
+    db_parser.add_argument('--orders', type=int, default=1000, help='Pedidos por mês.')
+    sheet_parser = commands.add_parser('sheet', help='Gera a planilha do mês atual a partir do banco.')
+    sheet_parser.add_argument('database')
+    sheet_parser.add_argument('path')
+    sheet_parser.add_argument('--changed', type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    if args.command == 'db':
+        make_database(args.path, args.sellers, tuple(args.branches.split(',')), args.years, args.orders)
+        print(f'Banco gerado em {args.path} ({os.path.getsize(args.path) / 1024 / 1024:.1f} MB)')
+    else:
+        rows = make_sheet(args.database, args.path, args.changed)
+        print(f'Planilha gerada em {args.path} ({rows} linhas)')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,84 +1,53 @@
-import sqlite3
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template
 from modules.dashboards import dashboards_bp
 from modules.sales import sales_bp
 from modules.users import users_bp
+from modules.commissions import commissions_bp
+from modules.api import api_bp
+from modules.exports import exports_bp
+from modules.analytics import analytics_bp
+from modules.metrics import metrics_bp
+from modules.goals import goals_bp
+from modules import db, metrics, migrations
+from modules.sales import jobs
+from modules.dashboards import cache as dashboard_cache, snapshot as dashboard_snapshot
+from modules.users import auth as users_auth
 from utils.text_utils import format_currency, format_percentage, month_name
-import datetime
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 
+# Conexões com o banco de dados (caminho em COMISYS_DATABASE ou sales_tracking.db)
+db.init_app(app)
+
+# Métricas das requisições, do SQL e das importações (expostas em /metrics)
+metrics.init_app(app)
+
+# Verificação de senhas em um pool limitado e limite de tentativas de login
+users_auth.init_app(app)
+
+# Cache dos dashboards (diretório opcional em disco em COMISYS_DASHBOARD_CACHE_DIR)
+dashboard_cache.init_app(app)
+
+# Leituras dos dashboards fora do pool principal (COMISYS_DASHBOARD_READ_MODE: primary, wal ou snapshot)
+dashboard_snapshot.init_app(app)
+
 # Registrar os blueprints
 app.register_blueprint(dashboards_bp)
 app.register_blueprint(sales_bp)
 app.register_blueprint(users_bp)
+app.register_blueprint(commissions_bp)
+app.register_blueprint(api_bp)
+app.register_blueprint(exports_bp)
+app.register_blueprint(analytics_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(goals_bp)
 
+# Aplicar as migrações pendentes do esquema (só trabalha quando a versão muda)
+migrations.init_app(app)
 
-# Conectar ao banco de dados
-
-
-def get_db_connection():
-    conn = sqlite3.connect('sales_tracking.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# Inicializar o banco de dados
-
-
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Criar tabela de usuários
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT NOT NULL,
-        password TEXT NOT NULL,
-        name TEXT NOT NULL,  -- Nome completo do usuário
-        role TEXT NOT NULL,  -- 'seller' ou 'master'
-        branch TEXT NOT NULL,  -- Filial do usuário
-        active INTEGER NOT NULL DEFAULT 1
-    );
-    ''')
-
-    # Criar tabela de metas individuais
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS IndividualGoals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        goal REAL NOT NULL,
-        FOREIGN KEY(user_id) REFERENCES Users(id)
-    );
-    ''')
-
-    # Criar tabela de metas gerais
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS GeneralGoals (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        goal REAL NOT NULL
-    );
-    ''')
-
-    # Criar tabela de vendas
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Sales (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date DATE NOT NULL,
-        amount REAL NOT NULL,
-        user_id INTEGER,
-        order_number TEXT NOT NULL,
-        FOREIGN KEY(user_id) REFERENCES Users(id)
-    );
-    ''')
-
-    conn.commit()
-    conn.close()
-
-
-# Chamar a função de inicialização do banco de dados
-init_db()
+# Iniciar o processamento de importações (retoma jobs interrompidos)
+jobs.init_app(app)
 
 # Rota inicial
 
@@ -88,71 +57,6 @@ def index():
     return render_template('index.html')
 
 
-# Rota para definir metas
-@app.route('/set_goals', methods=['GET', 'POST'])
-def set_goals():
-    if 'user_id' not in session or session['role'] != 'master':
-        return redirect(url_for('users.login'))
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    if request.method == 'POST':
-        individual_goal = request.form['individual_goal']
-        general_goal = request.form['general_goal']
-        user_id = request.form['user_id']
-        year = datetime.datetime.now().year
-        month = datetime.datetime.now().month
-
-        if not individual_goal and not general_goal:
-            flash('Preencha pelo menos um dos campos de metas.', 'error')
-            return redirect(request.url)
-
-        # Atualizar ou inserir meta individual
-        if individual_goal:
-            cursor.execute('''
-            INSERT INTO IndividualGoals (user_id, year, month, goal)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(user_id, year, month) DO UPDATE SET goal=excluded.goal
-        ''', (user_id, year, month, individual_goal))
-
-        # Atualizar meta geral (apenas uma entrada)
-        if general_goal:
-            cursor.execute('''
-            INSERT INTO GeneralGoals (year, month, goal)
-            VALUES (?, ?, ?)
-            ON CONFLICT(year, month) DO UPDATE SET goal=excluded.goal
-        ''', (year, month, general_goal))
-
-        conn.commit()
-
-        flash('Metas atualizadas com sucesso!', 'success')
-        return redirect(url_for('set_goals'))
-
-    # Buscar a meta geral atual
-    cursor.execute('SELECT goal FROM GeneralGoals ORDER BY id DESC LIMIT 1')
-    general_goal_row = cursor.fetchone()
-    general_goal = general_goal_row['goal'] if general_goal_row else 0
-
-    # Buscar vendedores e suas metas individuais
-    cursor.execute('SELECT id, username FROM Users WHERE role = "seller"')
-    sellers = cursor.fetchall()
-
-    cursor.execute('SELECT user_id, goal FROM IndividualGoals')
-    individual_goals = cursor.fetchall()
-    individual_goals_dict = {goal['user_id']: goal['goal'] for goal in individual_goals}
-
-    # Garantir que todos os vendedores tenham um valor de meta, mesmo que seja 0
-    for seller in sellers:
-        if seller['id'] not in individual_goals_dict:
-            individual_goals_dict[seller['id']] = 0
-
-    conn.close()
-    return render_template('set_goals.html', sellers=sellers,
-                           general_goal=general_goal,
-                           individual_goals=individual_goals_dict)
-
-
 app.jinja_env.filters['currency'] = format_currency
 app.jinja_env.filters['percentage'] = format_percentage
 app.jinja_env.filters['month_name'] = month_name
@@ -0,0 +1,59 @@
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from ..db import get_db, parse_period
+from .series import time_series, GROUPS, COLUMNS
+from datetime import datetime
+
+analytics_bp = Blueprint('analytics', __name__)
+
+CHART_WIDTH = 360
+CHART_HEIGHT = 60
+
+
+def requested_range(args):
+    """Período pedido em start/end (aaaa-mm); por padrão, os últimos 12 meses."""
+    now = datetime.now()
+    end = parse_period(args.get('end')) or (now.year, now.month)
+    start = parse_period(args.get('start'))
+    if start is None:
+        start = (end[0] - 1, end[1] + 1) if end[1] < 12 else (end[0], 1)
+    if start > end:
+        raise ValueError('O início do período deve ser anterior ao fim.')
+    return start, end
+
+
+def chart_points(points, maximum):
+    """Coordenadas da linha de totais do gráfico (SVG polyline)."""
+    if not points or not maximum:
+        return ''
+    step = CHART_WIDTH / max(len(points) - 1, 1)
+    return ' '.join(f'{index * step:.1f},{CHART_HEIGHT - point[2] / maximum * CHART_HEIGHT:.1f}'
+                    for index, point in enumerate(points))
+
+
+# Rota para a análise de tendências (totais mensais, comparação anual e metas)
+
+
+@analytics_bp.route('/analytics')
+def analytics():
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    group = request.args.get('group', 'seller')
+    if group not in GROUPS:
+        group = 'seller'
+    try:
+        start, end = requested_range(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('analytics.analytics'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+    series = time_series(cursor, start, end, group)
+
+    maximum = max((point[2] for item in series for point in item.points), default=0)
+    charts = {item.key: chart_points(item.points, maximum) for item in series}
+
+    return render_template('analytics.html', series=series, charts=charts, group=group,
+                           start=f'{start[0]:04d}-{start[1]:02d}', end=f'{end[0]:04d}-{end[1]:02d}',
+                           chart_width=CHART_WIDTH, chart_height=CHART_HEIGHT, columns=COLUMNS)
@@ -0,0 +1,114 @@
+from dataclasses import dataclass, field
+
+# Séries mensais para a análise de tendências, calculadas direto do resumo
+# mensal (MonthlySalesSummary): uma consulta com funções de janela devolve,
+# para cada vendedor ou filial, o total do mês, o do mesmo mês do ano
+# anterior (LAG) e o total e a meta acumulados no período (SUM OVER), então o
+# custo depende do número de meses e vendedores, não do volume de vendas.
+
+GROUPS = ('seller', 'branch')
+
+COLUMNS = ['year', 'month', 'total', 'order_count', 'previous_total', 'yoy_percentage', 'goal',
+           'goal_percentage', 'running_goal_percentage']
+
+# Chave e meta de cada agrupamento: vendedores usam a meta individual;
+# filiais, a meta geral (como no dashboard). Vale a última meta cadastrada no
+# mês, buscada pelos índices por período das tabelas de metas.
+_GROUP_SQL = {
+    'seller': ('m.user_id', '''(SELECT goal FROM IndividualGoals g
+                                WHERE g.user_id = s.key AND g.year = s.year AND g.month = s.month
+                                ORDER BY g.id DESC LIMIT 1)'''),
+    'branch': ('m.branch', '''(SELECT goal FROM GeneralGoals g
+                               WHERE g.year = s.year AND g.month = s.month
+                               ORDER BY g.id DESC LIMIT 1)'''),
+}
+
+
+@dataclass
+class Series:
+    key: object
+    label: str
+    points: list = field(default_factory=list)
+
+    @property
+    def total(self):
+        return sum(point[2] for point in self.points)
+
+
+def period_index(year, month):
+    return year * 100 + month
+
+
+def time_series(cursor, start, end, group='seller', seller_id=None):
+    """Séries mensais de `start` a `end` (pares (ano, mês), inclusivos) por vendedor ou filial.
+
+    Cada ponto segue COLUMNS; percentuais sem base (sem meta ou sem vendas no
+    ano anterior) ficam como None.
+    """
+    key_sql, goal_sql = _GROUP_SQL[group]
+    seller_filter = 'AND m.user_id = ?' if seller_id is not None else ''
+    params = [period_index(start[0] - 1, start[1]), period_index(*end)]
+    if seller_id is not None:
+        params.append(seller_id)
+    params.append(period_index(*start))
+
+    cursor.execute(f'''
+        WITH monthly AS (
+            -- Inclui o ano anterior ao início, para a comparação com o mesmo mês
+            SELECT m.year, m.month, {key_sql} AS key, SUM(m.total) AS total, SUM(m.order_count) AS order_count
+            FROM MonthlySalesSummary m
+            WHERE m.year * 100 + m.month BETWEEN ? AND ?
+            AND {key_sql} IS NOT NULL
+            {seller_filter}
+            GROUP BY m.year, m.month, key
+        ),
+        series AS (
+            SELECT m.year, m.month, m.key, m.total, m.order_count,
+                   LAG(m.total) OVER (PARTITION BY m.key, m.month ORDER BY m.year) AS lag_total,
+                   LAG(m.year) OVER (PARTITION BY m.key, m.month ORDER BY m.year) AS lag_year
+            FROM monthly m
+        ),
+        ranged AS (
+            SELECT s.year, s.month, s.key, s.total, s.order_count,
+                   CASE WHEN s.lag_year = s.year - 1 THEN s.lag_total END AS previous_total,
+                   {goal_sql} AS goal
+            FROM series s
+            WHERE s.year * 100 + s.month >= ?
+        )
+        SELECT r.*,
+               -- Meta acumulada: só entram os meses que têm meta
+               SUM(CASE WHEN r.goal IS NOT NULL THEN r.total END) OVER running AS running_total,
+               SUM(r.goal) OVER running AS running_goal
+        FROM ranged r
+        WINDOW running AS (PARTITION BY r.key ORDER BY r.year, r.month)
+        ORDER BY r.key, r.year, r.month
+    ''', params)
+    rows = cursor.fetchall()
+
+    labels = _labels(cursor, group)
+    series = {}
+    for row in rows:
+        current = series.get(row['key'])
+        if current is None:
+            current = series[row['key']] = Series(row['key'], labels.get(row['key'], row['key']))
+        previous_total = row['previous_total']
+        current.points.append([
+            row['year'], row['month'], round(row['total'], 2), row['order_count'],
+            round(previous_total, 2) if previous_total is not None else None,
+            _percentage(row['total'] - previous_total, previous_total) if previous_total else None,
+            row['goal'],
+            _percentage(row['total'], row['goal']),
+            _percentage(row['running_total'], row['running_goal']),
+        ])
+    return sorted(series.values(), key=lambda item: str(item.label))
+
+
+def _labels(cursor, group):
+    if group != 'seller':
+        return {}
+    cursor.execute('SELECT id, name FROM Users')
+    return {row['id']: row['name'] for row in cursor.fetchall()}
+
+
+def _percentage(value, base):
+    return round(value / base * 100, 2) if base else None
@@ -0,0 +1,254 @@
+from flask import Blueprint, request, session, jsonify, current_app
+from ..db import get_db, month_range
+from ..analytics import requested_range
+from ..analytics.series import time_series, GROUPS, COLUMNS
+from ..summary import data_version
+from ..dashboards.views import cached_view
+from ..dashboards.snapshot import get_read_db, snapshot_info
+from ..goals.batch import month_goals, save_goals, validate_goals
+from ..users.batch import update_users
+from ..users.profiles import active_profile, invalidate as invalidate_profile
+import base64
+import binascii
+import gzip
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# API JSON (versão 1) usada pelos dashboards para carregar os números do mês e,
+# aos poucos, a lista de vendas, além das séries da análise de tendências. As
+# vendas são paginadas por chave (keyset) na data e no número do pedido, na
+# mesma ordem da página (date DESC, order_number DESC), usando o índice
+# (user_id, date, order_number): cada página começa na posição do cursor dentro
+# do mês do vendedor e lê só as linhas que devolve. As respostas
+# grandes são comprimidas com gzip. Os números do dashboard e a lista de
+# vendas leem da mesma origem que as páginas (ver dashboards/snapshot.py). As
+# rotas de metas e usuários (só master) gravam listas inteiras em uma transação.
+
+SALES_PAGE_SIZE = 200
+MAX_SALES_PAGE_SIZE = 1000
+GZIP_MIN_SIZE = 1024
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_bp.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'error': error.message}), error.status
+
+
+@api_bp.before_request
+def require_login():
+    # A sessão de um usuário removido ou desativado depois do login deixa de valer
+    if 'user_id' not in session or active_profile(get_db().cursor(), session['user_id']) is None:
+        raise ApiError('Login necessário.', 401)
+
+
+@api_bp.after_request
+def compress(response):
+    if (response.status_code == 200 and not response.direct_passthrough
+            and 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+            and 'Content-Encoding' not in response.headers):
+        data = response.get_data()
+        if len(data) >= GZIP_MIN_SIZE:
+            response.set_data(gzip.compress(data, compresslevel=5))
+            response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def allowed_seller(seller_id):
+    """Vendedores só podem consultar os próprios dados."""
+    if session['role'] != 'master' and seller_id != session['user_id']:
+        raise ApiError('Acesso negado.', 403)
+    return seller_id
+
+
+def require_master():
+    if session['role'] != 'master':
+        raise ApiError('Acesso negado.', 403)
+
+
+# Rotas para os números do dashboard
+
+
+@api_bp.route('/dashboard/<int:year>/<int:month>', defaults={'seller_id': None})
+@api_bp.route('/dashboard/<int:seller_id>/<int:year>/<int:month>')
+def dashboard(seller_id, year, month):
+    if seller_id is None and session['role'] != 'master':
+        seller_id = session['user_id']
+    page = 'master' if seller_id is None else 'seller'
+    if seller_id is not None:
+        allowed_seller(seller_id)
+
+    conn = get_read_db()
+    cursor = conn.cursor()
+    view = cached_view(current_app.extensions['dashboard_cache'], cursor, page, seller_id, year, month,
+                       data_version(cursor, year, month))
+    if view is None:
+        raise ApiError('Usuário inativo ou não encontrado.', 404)
+
+    return jsonify({'year': year, 'month': month, 'snapshot': snapshot_info(), **view})
+
+
+# Rota para as séries mensais (?start=aaaa-mm&end=aaaa-mm&group=seller|branch&seller_id=)
+
+
+@api_bp.route('/analytics')
+def analytics():
+    group = request.args.get('group', 'seller')
+    seller_id = request.args.get('seller_id')
+    try:
+        start, end = requested_range(request.args)
+        seller_id = int(seller_id) if seller_id else None
+    except ValueError as e:
+        raise ApiError(str(e))
+    if group not in GROUPS:
+        raise ApiError(f'Agrupamento inválido: {group}.')
+    # Vendedores só veem a própria série
+    if session['role'] != 'master':
+        group, seller_id = 'seller', session['user_id']
+
+    conn = get_db()
+    cursor = conn.cursor()
+    series = time_series(cursor, start, end, group, seller_id)
+
+    return jsonify({'group': group,
+                    'start': f'{start[0]:04d}-{start[1]:02d}',
+                    'end': f'{end[0]:04d}-{end[1]:02d}',
+                    'columns': COLUMNS,
+                    'series': [{'key': item.key, 'label': item.label, 'points': item.points} for item in series]})
+
+
+# Rota para a lista de vendas de um vendedor no mês, paginada por cursor
+
+
+@api_bp.route('/sales')
+def sales():
+    try:
+        seller_id = int(request.args.get('seller_id', session['user_id']))
+        year = int(request.args['year'])
+        month = int(request.args['month'])
+        limit = min(int(request.args.get('limit', SALES_PAGE_SIZE)), MAX_SALES_PAGE_SIZE)
+    except (KeyError, ValueError):
+        raise ApiError('Informe seller_id, year e month válidos.')
+    if not 1 <= month <= 12 or limit < 1:
+        raise ApiError('Informe seller_id, year e month válidos.')
+    allowed_seller(seller_id)
+
+    conn = get_read_db()
+    cursor = conn.cursor()
+    rows, next_cursor = sales_page(cursor, seller_id, year, month, decode_cursor(request.args.get('cursor')),
+                                   limit)
+
+    return jsonify({'columns': ['id', 'order_number', 'date', 'amount'],
+                    'rows': rows,
+                    'next_cursor': next_cursor})
+
+
+def sales_page(cursor, seller_id, year, month, after=None, limit=SALES_PAGE_SIZE):
+    """Retorna uma página de vendas (date DESC, order_number DESC) e o cursor da próxima, ou None."""
+    start_date, end_date = month_range(year, month)
+    params = [seller_id, start_date]
+    if after is None:
+        after_clause = 'AND date < ?'
+        params.append(end_date)
+    else:
+        # O cursor (data, pedido) já limita o fim da página ao mês; um cursor
+        # com data depois do mês equivale ao início da lista
+        after_clause = 'AND (date, order_number) < (?, ?)'
+        params.extend(min(after, (end_date, '')))
+
+    # Uma linha a mais indica se existe uma próxima página
+    cursor.execute(f'''
+        SELECT id, order_number, date, amount
+        FROM Sales
+        WHERE user_id = ?
+        AND date >= ?
+        {after_clause}
+        ORDER BY date DESC, order_number DESC
+        LIMIT ?
+    ''', (*params, limit + 1))
+    rows = [tuple(row) for row in cursor.fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][2], rows[-1][1])
+    return rows, next_cursor
+
+
+def encode_cursor(date, order_number):
+    return base64.urlsafe_b64encode(f'{date}|{order_number}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(data, pedido) da última venda da página anterior, ou None na primeira página."""
+    if not cursor:
+        return None
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ApiError('Cursor inválido.')
+    date, separator, order_number = value.partition('|')
+    if not separator:
+        raise ApiError('Cursor inválido.')
+    return date, order_number
+
+
+# Rotas para as metas de um mês ({"general_goal": 450000, "goals": {"3": 225000}})
+
+
+@api_bp.route('/goals/<int:year>/<int:month>', methods=['GET', 'PUT'])
+def goals(year, month):
+    require_master()
+    if not 1 <= month <= 12:
+        raise ApiError('Mês inválido.')
+
+    conn = get_db()
+    cursor = conn.cursor()
+    if request.method == 'PUT':
+        data = request.get_json(silent=True) or {}
+        try:
+            general_goal = data.get('general_goal')
+            general_goals = [(year, month, float(general_goal))] if general_goal is not None else []
+            individual_goals = [(int(user_id), year, month, float(goal))
+                                for user_id, goal in (data.get('goals') or {}).items()]
+        except (TypeError, ValueError, AttributeError):
+            raise ApiError('Informe general_goal e goals ({user_id: meta}) numéricos.')
+        errors = validate_goals(cursor, general_goals, individual_goals)
+        if errors:
+            raise ApiError(' '.join(errors))
+        save_goals(cursor, general_goals, individual_goals)
+        conn.commit()
+
+    general_goal, individual_goals = month_goals(cursor, year, month)
+    return jsonify({'year': year, 'month': month, 'general_goal': general_goal,
+                    'goals': {str(user_id): goal for user_id, goal in individual_goals.items()}})
+
+
+# Rota para alterar filial e status de vários usuários ({"users": [{"id": 3, "branch": "Loja", "active": 1}]})
+
+
+@api_bp.route('/users', methods=['PATCH'])
+def users():
+    require_master()
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get('users'), list):
+        raise ApiError('Informe a lista users.')
+
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        changed = update_users(cursor, data['users'])
+    except ValueError as e:
+        raise ApiError(str(e))
+    conn.commit()
+    for user_id in changed:
+        invalidate_profile(user_id)
+
+    return jsonify({'updated': len(changed)})
@@ -0,0 +1,55 @@
+from flask import Blueprint, render_template, redirect, url_for, session
+from ..db import get_db
+from .engine import month_commissions, load_rules
+import click
+
+commissions_bp = Blueprint('commissions', __name__)
+
+# Rota para o relatório de comissões do mês
+
+
+@commissions_bp.route('/commissions/<int:year>/<int:month>')
+def commissions(year, month):
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+    report = month_commissions(cursor, year, month)
+
+    return render_template('commissions.html', report=report, year=year, month=month)
+
+
+# Comandos do relatório de comissões (flask --app comisys commissions ...)
+
+
+@commissions_bp.cli.command('report')
+@click.argument('year', type=int)
+@click.argument('month', type=int)
+def report_command(year, month):
+    """Imprime as comissões de todos os vendedores do mês, separadas por ';'."""
+    conn = get_db()
+    cursor = conn.cursor()
+    report = month_commissions(cursor, year, month)
+
+    print('vendedor;filial;vendas;meta;meta_individual_%;meta_filial_%;comissao;bonus;total')
+    for seller in report.sellers:
+        print(f'{seller.name};{seller.branch};{seller.total:.2f};{seller.goal:.2f};'
+              f'{seller.individual_percentage:.2f};{seller.branch_percentage:.2f};'
+              f'{seller.commission:.2f};{seller.bonus:.2f};{seller.extra_total:.2f}')
+
+
+@commissions_bp.cli.command('tiers')
+@click.argument('year', type=int)
+@click.argument('month', type=int)
+def tiers_command(year, month):
+    """Lista as faixas de comissão e bônus vigentes no mês."""
+    conn = get_db()
+    cursor = conn.cursor()
+    rules = load_rules(cursor, year, month)
+
+    for (branch, kind), tiers in sorted(rules.tiers.items()):
+        for tier in tiers:
+            basis = 'filial' if tier.basis == 'branch' else 'vendedor'
+            print(f'{branch} {kind}: {tier.rate:.2%} a partir de {tier.min_amount:.2f} ({basis}), '
+                  f'meta geral >= {tier.min_branch_percentage:.0f}%')
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from .totals import month_totals
+from ..summary import data_version
+
+# Cálculo de comissões e bônus a partir das faixas em CommissionTiers.
+# Cada filial tem um conjunto de faixas por vigência (valid_from, aaaamm); no
+# mês calculado vale o conjunto mais recente já vigente. Dentro de um tipo
+# ('commission' ou 'bonus'), as faixas são testadas da maior taxa para a menor
+# e vale a primeira cujas condições forem atendidas.
+#
+# O cálculo do mês inteiro parte dos totais já agregados (month_totals) e é
+# guardado em cache até a versão dos dados do mês mudar (DataVersions).
+
+CACHE_SIZE = 32
+
+
+@dataclass
+class Tier:
+    kind: str
+    basis: str
+    min_amount: float
+    min_branch_percentage: float
+    rate: float
+
+
+@dataclass
+class SellerCommission:
+    user_id: int
+    name: str
+    branch: str
+    total: float = 0.0
+    goal: float = 0.0
+    branch_total: float = 0.0
+    individual_percentage: float = 0.0
+    branch_percentage: float = 0.0
+    commission_rate: float = 0.0
+    commission: float = 0.0
+    bonus_rate: float = 0.0
+    bonus: float = 0.0
+
+    @property
+    def extra_total(self):
+        return self.commission + self.bonus
+
+
+class CommissionRules:
+    def __init__(self, tiers):
+        # {(filial, tipo): [faixas da maior para a menor taxa]}
+        self.tiers = {}
+        for branch, tier in tiers:
+            self.tiers.setdefault((branch, tier.kind), []).append(tier)
+        for branch_tiers in self.tiers.values():
+            branch_tiers.sort(key=lambda tier: tier.rate, reverse=True)
+
+    def rate(self, branch, kind, seller_total, branch_total, branch_percentage):
+        for tier in self.tiers.get((branch, kind), ()):
+            amount = branch_total if tier.basis == 'branch' else seller_total
+            if amount >= tier.min_amount and branch_percentage >= tier.min_branch_percentage:
+                return tier.rate
+        return 0
+
+    def compute(self, user_id, name, branch, totals):
+        """Calcula comissão, bônus e percentuais de um vendedor nos totais do mês."""
+        result = SellerCommission(user_id, name, branch,
+                                  total=totals.seller_total(user_id),
+                                  goal=totals.seller_goal(user_id),
+                                  branch_total=totals.branch_total(branch))
+        if result.goal:
+            result.individual_percentage = (result.total / result.goal) * 100
+        if totals.general_goal:
+            result.branch_percentage = (result.branch_total / totals.general_goal) * 100
+
+        rate_args = (result.total, result.branch_total, result.branch_percentage)
+        result.commission_rate = self.rate(branch, 'commission', *rate_args)
+        result.bonus_rate = self.rate(branch, 'bonus', *rate_args)
+        result.commission = result.total * result.commission_rate
+        result.bonus = result.total * result.bonus_rate
+        return result
+
+
+@dataclass
+class MonthCommissions:
+    year: int
+    month: int
+    version: tuple
+    totals: object
+    rules: CommissionRules
+    sellers: list = field(default_factory=list)
+
+    def get(self, user_id):
+        return next((seller for seller in self.sellers if seller.user_id == user_id), None)
+
+    @property
+    def total_commission(self):
+        return sum(seller.commission for seller in self.sellers)
+
+    @property
+    def total_bonus(self):
+        return sum(seller.bonus for seller in self.sellers)
+
+
+def load_rules(cursor, year, month):
+    """Carrega as faixas vigentes no mês, por filial."""
+    cursor.execute('''
+        SELECT t.branch, t.kind, t.basis, t.min_amount, t.min_branch_percentage, t.rate
+        FROM CommissionTiers t
+        WHERE t.valid_from = (SELECT MAX(v.valid_from) FROM CommissionTiers v
+                              WHERE v.branch = t.branch AND v.valid_from <= ?)
+    ''', (year * 100 + month,))
+    return CommissionRules([(row['branch'], Tier(row['kind'], row['basis'], row['min_amount'],
+                                                 row['min_branch_percentage'], row['rate']))
+                            for row in cursor.fetchall()])
+
+
+def compute_month(cursor, year, month, version=None):
+    """Calcula as comissões de todos os vendedores do mês em uma passada."""
+    totals = month_totals(cursor, year, month)
+    rules = load_rules(cursor, year, month)
+    report = MonthCommissions(year, month, version, totals, rules)
+
+    # Vendedores ativos e qualquer usuário com vendas ou meta no mês
+    cursor.execute('SELECT id, name, branch, role, active FROM Users ORDER BY name')
+    for user in cursor.fetchall():
+        if (user['role'] == 'seller' and user['active']) or user['id'] in totals.sellers:
+            report.sellers.append(rules.compute(user['id'], user['name'], user['branch'], totals))
+    return report
+
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+def month_commissions(cursor, year, month):
+    """Comissões do mês, recalculadas só quando a versão dos dados muda."""
+    version = data_version(cursor, year, month)
+    key = (year, month)
+    with _cache_lock:
+        report = _cache.get(key)
+        if report is not None and report.version == version:
+            _cache.move_to_end(key)
+            return report
+
+    report = compute_month(cursor, year, month, version)
+    with _cache_lock:
+        _cache[key] = report
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return report
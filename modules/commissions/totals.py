@@ -0,0 +1,74 @@
+from dataclasses import dataclass, field
+
+# Totais do mês usados no cálculo das comissões (e, por ele, nos dashboards),
+# lidos do resumo mensal (MonthlySalesSummary, uma linha por vendedor) e das
+# metas. Os totais por filial e geral são somados a partir dos totais por
+# vendedor, que são poucos.
+
+
+@dataclass
+class SellerTotals:
+    user_id: int
+    name: str
+    branch: str
+    total: float = 0.0
+    order_count: int = 0
+    goal: float = 0.0
+
+
+@dataclass
+class MonthTotals:
+    year: int
+    month: int
+    total: float = 0.0
+    general_goal: float = 0.0
+    branches: dict = field(default_factory=dict)
+    sellers: dict = field(default_factory=dict)
+
+    def branch_total(self, branch):
+        return self.branches.get(branch, 0.0)
+
+    def seller_total(self, user_id):
+        seller = self.sellers.get(user_id)
+        return seller.total if seller else 0.0
+
+    def seller_goal(self, user_id):
+        seller = self.sellers.get(user_id)
+        return seller.goal if seller else 0.0
+
+
+def month_totals(cursor, year, month):
+    """Calcula os totais de vendas e metas de um mês."""
+    totals = MonthTotals(year=year, month=month)
+
+    cursor.execute('''
+        SELECT m.user_id, u.name, m.branch, m.total, m.order_count
+        FROM MonthlySalesSummary m
+        LEFT JOIN Users u ON u.id = m.user_id
+        WHERE m.year = ? AND m.month = ?
+    ''', (year, month))
+    for row in cursor.fetchall():
+        total = row['total'] or 0.0
+        totals.total += total
+        if row['user_id'] is None:
+            continue  # Vendedores não cadastrados só entram no total geral
+        totals.sellers[row['user_id']] = SellerTotals(row['user_id'], row['name'], row['branch'], total,
+                                                     row['order_count'])
+        totals.branches[row['branch']] = totals.branch_total(row['branch']) + total
+
+    # Metas individuais e meta geral do mês (user_id nulo)
+    cursor.execute('''
+        SELECT user_id, goal FROM IndividualGoals WHERE year = ? AND month = ?
+        UNION ALL
+        SELECT * FROM (SELECT CAST(NULL AS INTEGER), goal FROM GeneralGoals
+                       WHERE year = ? AND month = ? ORDER BY id DESC LIMIT 1) AS general
+    ''', (year, month, year, month))
+    for row in cursor.fetchall():
+        if row['user_id'] is None:
+            totals.general_goal = float(row['goal'])
+        elif row['user_id'] in totals.sellers:
+            totals.sellers[row['user_id']].goal = float(row['goal'])
+        else:
+            totals.sellers[row['user_id']] = SellerTotals(row['user_id'], None, None, goal=float(row['goal']))
+
+    return totals
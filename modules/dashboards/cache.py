@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import os
+import pickle
+import time
+
+# Cache dos dados calculados para os dashboards (não do HTML, que depende da
+# sessão e das mensagens flash). Cada entrada guarda a versão dos dados usada
+# no cálculo (DataVersions) e só é aproveitada enquanto ela não mudar; o TTL
+# limita por quanto tempo uma entrada fica na memória. Com DASHBOARD_CACHE_DIR
+# configurado, as entradas também são gravadas em disco e sobrevivem a
+# reinícios e são compartilhadas entre processos.
+
+
+def init_app(app):
+    app.config.setdefault('DASHBOARD_CACHE_SIZE', 256)
+    app.config.setdefault('DASHBOARD_CACHE_TTL', 3600)
+    app.config.setdefault('DASHBOARD_CACHE_DIR', os.environ.get('COMISYS_DASHBOARD_CACHE_DIR'))
+    disk = DiskBackend(app.config['DASHBOARD_CACHE_DIR']) if app.config['DASHBOARD_CACHE_DIR'] else None
+    app.extensions['dashboard_cache'] = ViewCache(app.config['DASHBOARD_CACHE_SIZE'],
+                                                  app.config['DASHBOARD_CACHE_TTL'], disk)
+
+
+class DiskBackend:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.pickle')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as cache_file:
+                return pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def set(self, key, entry):
+        # Gravar em um arquivo temporário e renomear, para não deixar entradas pela metade
+        path = self._path(key)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump(entry, cache_file)
+        os.replace(temp_path, path)
+
+
+class ViewCache:
+    def __init__(self, size=256, ttl=3600, disk=None):
+        self.size = size
+        self.ttl = ttl
+        self.disk = disk
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """Retorna o valor guardado para a chave na versão informada, ou None."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+
+        if self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None and stored[0] == version and stored[1] > time.time():
+                self._remember(key, version, stored[2])
+                with self.lock:
+                    self.hits += 1
+                return stored[2]
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, version, value):
+        self._remember(key, version, value)
+        if self.disk is not None:
+            self.disk.set(key, (version, time.time() + self.ttl, value))
+
+    def _remember(self, key, version, value):
+        with self.lock:
+            self.entries[key] = (version, time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries),
+                    'size': self.size, 'ttl': self.ttl, 'disk': self.disk is not None}
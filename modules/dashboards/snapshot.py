@@ -0,0 +1,216 @@
+from flask import current_app, g
+from ..db import ConnectionPool, get_db, get_db_connection
+from ..metrics.sql import InstrumentedConnection
+from ..storage import get_storage
+from ..storage.sqlite import READ_PRAGMAS
+from datetime import datetime
+from threading import Lock, Thread
+import glob
+import logging
+import os
+import pathlib
+import queue
+import sqlite3
+import time
+
+logger = logging.getLogger('comisys.snapshot')
+
+# Leituras dos dashboards separadas das escritas das importações.
+# DASHBOARD_READ_MODE escolhe de onde as páginas e a API dos dashboards leem:
+#
+# - 'primary': o pool principal, como as demais rotas;
+# - 'wal' (padrão): um pool próprio de conexões somente leitura no banco
+#   principal. Em WAL, leitores não esperam pelo escritor: cada leitura vê o
+#   último commit, sem as alterações da importação em andamento, e uma escrita
+#   acidental falha na hora em vez de esperar pela trava. No PostgreSQL são
+#   conexões em transações somente leitura; DASHBOARD_READ_DATABASE (padrão:
+#   o próprio DATABASE) pode apontar o pool para uma réplica de leitura;
+# - 'snapshot': uma cópia do banco feita com a API de backup do SQLite, em
+#   DASHBOARD_SNAPSHOT_DIR, refeita em segundo plano quando os dados dos
+#   dashboards mudam no banco principal (DataVersions, e não qualquer commit:
+#   o andamento das importações e os registros de jobs não provocam cópias).
+#   A cópia é outro arquivo, então nem o WAL da importação nem os checkpoints
+#   pesam nas leituras. Se ela não for conferida com o banco principal há mais
+#   de DASHBOARD_SNAPSHOT_MAX_AGE segundos (ou ainda não existir), a
+#   requisição lê do pool principal. Só existe no SQLite.
+
+READ_MODES = ('primary', 'wal', 'snapshot')
+
+
+def init_app(app):
+    app.config.setdefault('DASHBOARD_READ_MODE', os.environ.get('COMISYS_DASHBOARD_READ_MODE', 'wal'))
+    app.config.setdefault('DASHBOARD_SNAPSHOT_MAX_AGE', float(os.environ.get('COMISYS_DASHBOARD_SNAPSHOT_MAX_AGE',
+                                                                             60)))
+    app.config.setdefault('DASHBOARD_SNAPSHOT_DIR', os.path.join(app.instance_path, 'snapshots'))
+    app.config.setdefault('DASHBOARD_READ_DATABASE', os.environ.get('COMISYS_DASHBOARD_READ_DATABASE',
+                                                                    app.config['DATABASE']))
+    mode = app.config['DASHBOARD_READ_MODE']
+    if mode not in READ_MODES:
+        raise ValueError(f'DASHBOARD_READ_MODE inválido: {mode} (use {", ".join(READ_MODES)}).')
+    if mode == 'snapshot' and get_storage(app.config['DATABASE']).name != 'sqlite':
+        raise ValueError('DASHBOARD_READ_MODE snapshot só vale para bancos SQLite (use wal ou primary).')
+
+    if mode == 'wal':
+        app.extensions['dashboard_read_pool'] = ConnectionPool(app.config['DASHBOARD_READ_DATABASE'],
+                                                               app.config['DB_POOL_SIZE'], read_only=True)
+    elif mode == 'snapshot':
+        app.extensions['dashboard_read_pool'] = Snapshot(app.config['DATABASE'],
+                                                         app.config['DASHBOARD_SNAPSHOT_DIR'],
+                                                         app.config['DASHBOARD_SNAPSHOT_MAX_AGE'],
+                                                         app.config['DB_POOL_SIZE'])
+    app.teardown_appcontext(close_read_db)
+
+
+def get_read_db():
+    """Conexão das leituras dos dashboards na requisição atual, conforme DASHBOARD_READ_MODE."""
+    if 'read_db' not in g:
+        pool = current_app.extensions.get('dashboard_read_pool')
+        g.read_db = pool.acquire() if pool is not None else None
+    return g.read_db if g.read_db is not None else get_db()
+
+
+def close_read_db(exception=None):
+    conn = g.pop('read_db', None)
+    if conn is not None:
+        current_app.extensions['dashboard_read_pool'].release(conn)
+
+
+def snapshot_info():
+    """Número e horário da cópia lida na requisição, ou None se a leitura foi no banco principal."""
+    return getattr(g.get('read_db'), 'snapshot', None)
+
+
+class Snapshot:
+    """Cópia somente leitura do banco, com um pool de conexões para a cópia atual."""
+
+    def __init__(self, database, directory, max_age=60, size=8):
+        self.database = database
+        self.directory = directory
+        self.max_age = max_age
+        # Conferir com folga, para a cópia não passar do limite entre duas conferências
+        self.interval = max(max_age / 3, 1)
+        self.version = 0  # Número da cópia atual (0 = nenhuma)
+        self.path = None
+        self.copied_at = None
+        self.checked_at = None  # Última conferência com o banco principal (epoch)
+        self._data_version = None
+        self._source = None
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = Lock()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """Inicia a atualização em segundo plano (na primeira leitura, e não ao importar a
+        aplicação, para os comandos de linha não copiarem o banco)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = Thread(target=self._run, name='dashboard-snapshot', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except (sqlite3.Error, OSError):
+                logger.exception('Falha ao atualizar a cópia de leitura dos dashboards.')
+            time.sleep(self.interval)
+
+    def refresh(self):
+        """Refaz a cópia se os dados dos dashboards mudaram desde a última; retorna True se copiou."""
+        if self._source is None:
+            self._source = get_db_connection(self.database)
+        # Lido antes da cópia: um commit no meio dela só provoca outra cópia na próxima conferência.
+        # Cada alteração incrementa a versão de um escopo, então a soma sempre cresce
+        checked_at = time.time()
+        data_version = self._source.execute('SELECT COALESCE(SUM(version), 0) FROM DataVersions').fetchone()[0]
+        if self.path is not None and data_version == self._data_version:
+            try:
+                # A data do arquivo marca as cópias em uso (ver _remove_old_copies)
+                os.utime(self.path)
+            except OSError:
+                pass
+            else:
+                with self._lock:
+                    self.checked_at = checked_at
+                return False
+
+        version = self.version + 1
+        path = os.path.join(self.directory, f'snapshot-{os.getpid()}-{version}.db')
+        target = sqlite3.connect(path)
+        try:
+            self._source.backup(target)
+            # A cópia é um arquivo só, sem -wal e -shm
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+
+        with self._lock:
+            self.path, self.version = path, version
+            self.copied_at = self.checked_at = checked_at
+        self._data_version = data_version
+        logger.info('Cópia de leitura %d atualizada em %.3f s.', version, time.time() - checked_at)
+        self._remove_old_copies()
+        return True
+
+    def _remove_old_copies(self):
+        # As cópias anteriores deste processo saem logo (as conexões abertas
+        # continuam lendo até fecharem); as de outros processos, só quando
+        # ninguém as confere há mais de duas vezes o limite de idade
+        own_prefix = f'snapshot-{os.getpid()}-'
+        for path in glob.glob(os.path.join(self.directory, 'snapshot-*.db')):
+            if path == self.path:
+                continue
+            try:
+                if (os.path.basename(path).startswith(own_prefix)
+                        or os.path.getmtime(path) < time.time() - 2 * self.max_age):
+                    os.remove(path)
+            except OSError:
+                pass  # Ainda aberta (Windows) ou já removida por outro processo
+
+    def age(self):
+        """Segundos desde a última conferência da cópia com o banco principal, ou None."""
+        with self._lock:
+            return time.time() - self.checked_at if self.checked_at is not None else None
+
+    def acquire(self):
+        """Conexão com a cópia atual, ou None se ela não existir ou estiver velha demais."""
+        self.start()
+        with self._lock:
+            path, version, copied_at, checked_at = self.path, self.version, self.copied_at, self.checked_at
+        if path is None or time.time() - checked_at > self.max_age:
+            return None
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn.snapshot['version'] == version:
+                return conn
+            conn.close()
+
+        try:
+            conn = sqlite3.connect(pathlib.Path(path).as_uri() + '?mode=ro', uri=True, timeout=30,
+                                   check_same_thread=False, factory=InstrumentedConnection)
+        except sqlite3.OperationalError:
+            # Cópia trocada e removida entre a leitura do caminho e a conexão
+            return None
+        conn.row_factory = sqlite3.Row
+        for pragma in READ_PRAGMAS:
+            conn.execute(pragma)
+        conn.snapshot = {'version': version,
+                         'copied_at': datetime.fromtimestamp(copied_at).strftime('%d/%m/%Y %H:%M:%S')}
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if conn.snapshot['version'] != self.version:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
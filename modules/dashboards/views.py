@@ -0,0 +1,60 @@
+from ..commissions.engine import month_commissions
+from ..users.profiles import get_profile
+
+# Dados calculados para os templates dos dashboards e para a API. São
+# dicionários simples (sem sqlite3.Row), para poderem ser guardados no cache e
+# gravados em disco. A lista de vendas do vendedor não faz parte deles: a
+# página a carrega aos poucos pela API (/api/v1/sales).
+
+
+def cached_view(cache, cursor, page, seller_id, year, month, version):
+    """Dados do dashboard ('seller' ou 'master'), do cache se a versão do mês não mudou."""
+    key = (page, seller_id, year, month)
+    view = cache.get(key, version)
+    if view is None:
+        view = seller_view(cursor, seller_id, year, month) if page == 'seller' else master_view(cursor, year, month)
+        if view is not None:
+            cache.set(key, version, view)
+    return view
+
+
+def seller_view(cursor, seller_id, year, month):
+    """Dados do dashboard de um vendedor no mês, ou None se ele estiver inativo ou não existir."""
+    # Pegar informações do vendedor (do cache de perfis)
+    user_info = get_profile(cursor, seller_id)
+    if not user_info or user_info['active'] == 0:
+        return None
+
+    # Totais e comissões do mês (vendedores, filiais e metas) em uma única passada
+    report = month_commissions(cursor, year, month)
+
+    # Comissão, bônus e percentuais do vendedor, pelas faixas da filial
+    seller = (report.get(seller_id)
+              or report.rules.compute(seller_id, user_info['name'], user_info['branch'], report.totals))
+
+    return {'seller_id': seller_id,
+            'user_name': user_info['name'],
+            'user_branch': user_info['branch'],
+            'general_goal': report.totals.general_goal,
+            'individual_goal': seller.goal,
+            'total_seller_sales': seller.total,
+            'total_branch_sales': seller.branch_total,
+            'individual_percentage': seller.individual_percentage,
+            'branch_percentage': seller.branch_percentage,
+            'commission': seller.commission,
+            'bonus': seller.bonus,
+            'extra_total': seller.extra_total}
+
+
+def master_view(cursor, year, month):
+    """Dados do dashboard geral do mês."""
+    cursor.execute("SELECT id, username, name FROM Users WHERE role = 'seller' AND active = 1")
+    sellers = [dict(row) for row in cursor.fetchall()]
+
+    totals = month_commissions(cursor, year, month).totals
+
+    return {'sellers': sellers,
+            'general_goal': totals.general_goal,
+            'total_sales': totals.total,
+            'total_store_sales': totals.branch_total('Loja'),
+            'total_workshop_sales': totals.branch_total('Oficina')}
@@ -1,7 +1,96 @@
-import sqlite3
+import os
+import queue
+from datetime import datetime, timedelta
+from flask import current_app, g, has_app_context
+from .storage import get_storage
 
+# Caminho padrão do banco: sales_tracking.db na raiz do projeto, independente
+# do diretório de onde a aplicação é iniciada
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sales_tracking.db')
 
-def get_db_connection():
-    conn = sqlite3.connect('sales_tracking.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+
+def get_db_connection(database=None, read_only=False):
+    """Abre uma conexão nova e configurada, para uso fora das requisições
+    (inicialização, comandos de linha e tarefas em segundo plano).
+
+    O banco é o caminho de um arquivo SQLite ou uma URL postgresql:// (ver
+    modules/storage). A conexão é instrumentada: os comandos entram nas
+    métricas de SQL e no log de consultas lentas (ver modules/metrics/sql.py).
+    Com read_only, qualquer escrita falha em vez de esperar pela trava do banco."""
+    if database is None:
+        database = current_app.config['DATABASE'] if has_app_context() else DEFAULT_DATABASE
+    return get_storage(database).connect(read_only)
+
+
+class ConnectionPool:
+    """Mantém conexões abertas para serem reaproveitadas entre requisições."""
+
+    def __init__(self, database, size=8, read_only=False):
+        self.database = database
+        self.read_only = read_only
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return get_db_connection(self.database, self.read_only)
+
+    def release(self, conn):
+        # Descartar o que a requisição deixou sem commit antes de devolver ao pool
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def get_db():
+    """Retorna a conexão da requisição atual, obtida do pool na primeira chamada."""
+    if 'db' not in g:
+        g.db = current_app.extensions['db_pool'].acquire()
+    return g.db
+
+
+def close_db(exception=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        current_app.extensions['db_pool'].release(conn)
+
+
+def init_app(app):
+    app.config.setdefault('DATABASE', os.environ.get('COMISYS_DATABASE', DEFAULT_DATABASE))
+    app.config.setdefault('DB_POOL_SIZE', 8)
+    app.extensions['db_pool'] = ConnectionPool(app.config['DATABASE'], app.config['DB_POOL_SIZE'])
+    app.teardown_appcontext(close_db)
+
+
+def month_range(year, month):
+    """Retorna o intervalo [início, fim) das datas de um mês no formato de Sales.date.
+
+    Filtrar com `date >= ? AND date < ?` permite que o SQLite use os índices de
+    Sales, ao contrário de comparar strftime('%Y', date) e strftime('%m', date).
+    """
+    year, month = int(year), int(month)
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f'{year:04d}-{month:02d}-01', f'{next_year:04d}-{next_month:02d}-01'
+
+
+def timestamp(seconds_ago=0):
+    """Data e hora local atuais (ou de `seconds_ago` segundos atrás) no formato das colunas de data e hora
+    (created_at, updated_at, rolled_back_at)."""
+    return (datetime.now() - timedelta(seconds=seconds_ago)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_period(value):
+    """Converte 'aaaa-mm' em (ano, mês); vazio vira None."""
+    if not value:
+        return None
+    try:
+        year, month = (int(part) for part in value.split('-'))
+    except ValueError:
+        raise ValueError(f'Período inválido: {value} (use aaaa-mm).')
+    if not 1 <= month <= 12:
+        raise ValueError(f'Período inválido: {value} (use aaaa-mm).')
+    return year, month
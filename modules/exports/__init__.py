@@ -0,0 +1,89 @@
+from flask import Blueprint, Response, request, redirect, url_for, session, flash, stream_with_context
+from ..db import get_db, parse_period
+from .queries import iter_sales, iter_commissions, SALES_HEADER, COMMISSIONS_HEADER
+from .writers import iter_export, CONTENT_TYPES
+import click
+import sys
+
+exports_bp = Blueprint('exports', __name__)
+
+# Exportações de vendas e comissões em CSV ou XLSX. As respostas são enviadas
+# em blocos enquanto as linhas são lidas do banco (stream_with_context mantém
+# a conexão da requisição aberta até o fim do envio).
+
+EXPORTS = {
+    'sales': (SALES_HEADER, iter_sales, 'Vendas'),
+    'commissions': (COMMISSIONS_HEADER, iter_commissions, 'Comissoes'),
+}
+
+
+def export_filters(args):
+    """Lê start, end (aaaa-mm), seller_id e branch dos argumentos."""
+    seller_id = args.get('seller_id')
+    if seller_id and not str(seller_id).isdigit():
+        raise ValueError(f'Vendedor inválido: {seller_id}.')
+    return {'start': parse_period(args.get('start')),
+            'end': parse_period(args.get('end')),
+            'seller_id': int(seller_id) if seller_id else None,
+            'branch': args.get('branch') or None}
+
+
+# Rota para exportar vendas ou comissões (ex.: /export/sales.csv?start=2024-01&end=2024-12&branch=Loja)
+
+
+@exports_bp.route('/export/<any(sales, commissions):kind>.<any(csv, xlsx):file_format>')
+def export(kind, file_format):
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    try:
+        filters = export_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('dashboards.dashboard'))
+
+    header, iter_rows, sheet_name = EXPORTS[kind]
+    cursor = get_db().cursor()
+    rows = iter_rows(cursor, **filters)
+    kwargs = {'sheet_name': sheet_name} if file_format == 'xlsx' else {}
+
+    return Response(stream_with_context(iter_export(file_format, header, rows, **kwargs)),
+                    mimetype=CONTENT_TYPES[file_format],
+                    headers={'Content-Disposition': f'attachment; filename={kind}.{file_format}'})
+
+
+# Comandos para exportar (ex.: flask --app comisys exports sales --start 2024-01 --format xlsx -o vendas.xlsx)
+
+
+def export_command(kind):
+    @exports_bp.cli.command(kind, help=f'Exporta {"vendas" if kind == "sales" else "comissões"} em CSV ou XLSX.')
+    @click.option('--start', help='Primeiro mês (aaaa-mm).')
+    @click.option('--end', help='Último mês (aaaa-mm).')
+    @click.option('--seller-id', help='Somente este vendedor.')
+    @click.option('--branch', help='Somente esta filial.')
+    @click.option('--format', 'file_format', type=click.Choice(list(CONTENT_TYPES)), default='csv')
+    @click.option('-o', '--output', type=click.Path(dir_okay=False), help='Arquivo de saída (padrão: saída padrão).')
+    def command(start, end, seller_id, branch, file_format, output):
+        try:
+            filters = export_filters({'start': start, 'end': end, 'seller_id': seller_id, 'branch': branch})
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+
+        header, iter_rows, sheet_name = EXPORTS[kind]
+        cursor = get_db().cursor()
+        rows = iter_rows(cursor, **filters)
+        kwargs = {'sheet_name': sheet_name} if file_format == 'xlsx' else {}
+
+        target = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in iter_export(file_format, header, rows, **kwargs):
+                target.write(chunk)
+        finally:
+            if output:
+                target.close()
+
+    return command
+
+
+for kind in EXPORTS:
+    export_command(kind)
@@ -0,0 +1,74 @@
+from ..db import month_range
+from ..commissions.engine import month_commissions
+
+# Consultas das exportações. As linhas são lidas do cursor em lotes
+# (fetchmany), então a memória usada não depende do período exportado.
+
+FETCH_SIZE = 1000
+
+SALES_HEADER = ['id', 'pedido', 'data', 'valor', 'vendedor_id', 'vendedor', 'filial']
+COMMISSIONS_HEADER = ['ano', 'mes', 'vendedor_id', 'vendedor', 'filial', 'vendas', 'meta', 'meta_individual_%',
+                      'meta_filial_%', 'comissao', 'bonus', 'total']
+
+
+def _filters(start=None, end=None, seller_id=None, branch=None):
+    clauses, params = [], []
+    if start:
+        clauses.append('s.date >= ?')
+        params.append(month_range(*start)[0])
+    if end:
+        clauses.append('s.date < ?')
+        params.append(month_range(*end)[1])
+    if seller_id is not None:
+        clauses.append('s.user_id = ?')
+        params.append(seller_id)
+    if branch:
+        clauses.append('u.branch = ?')
+        params.append(branch)
+    return ' AND '.join(clauses) or '1 = 1', params
+
+
+def iter_sales(cursor, start=None, end=None, seller_id=None, branch=None):
+    """Vendas do período (meses inclusivos), em ordem de data."""
+    where, params = _filters(start, end, seller_id, branch)
+    cursor.execute(f'''
+        SELECT s.id, s.order_number, s.date, s.amount, s.user_id, u.name, u.branch
+        FROM Sales s
+        LEFT JOIN Users u ON u.id = s.user_id
+        WHERE {where}
+        ORDER BY s.date, s.id
+    ''', params)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            yield tuple(row)
+
+
+def iter_commissions(cursor, start=None, end=None, seller_id=None, branch=None):
+    """Comissões por vendedor de cada mês com vendas no período."""
+    clauses, params = [], []
+    if start:
+        clauses.append('year * 100 + month >= ?')
+        params.append(start[0] * 100 + start[1])
+    if end:
+        clauses.append('year * 100 + month <= ?')
+        params.append(end[0] * 100 + end[1])
+    cursor.execute(f'''
+        SELECT DISTINCT year, month FROM MonthlySalesSummary
+        WHERE {' AND '.join(clauses) or '1 = 1'}
+        ORDER BY year, month
+    ''', params)
+    periods = [(row['year'], row['month']) for row in cursor.fetchall()]
+
+    for year, month in periods:
+        for seller in month_commissions(cursor, year, month).sellers:
+            if seller_id is not None and seller.user_id != seller_id:
+                continue
+            if branch and seller.branch != branch:
+                continue
+            yield (year, month, seller.user_id, seller.name, seller.branch, round(seller.total, 2),
+                   round(seller.goal, 2), round(seller.individual_percentage, 2),
+                   round(seller.branch_percentage, 2), round(seller.commission, 2), round(seller.bonus, 2),
+                   round(seller.extra_total, 2))
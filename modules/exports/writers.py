@@ -0,0 +1,122 @@
+from xml.sax.saxutils import escape
+import csv
+import io
+import math
+import zipfile
+
+# Escrita em fluxo de CSV e XLSX. Os dois geradores recebem o cabeçalho e um
+# iterável de linhas e devolvem blocos de bytes assim que ficam prontos, sem
+# montar o arquivo inteiro na memória.
+#
+# O XLSX é escrito diretamente (um zip com o XML mínimo de uma planilha, com
+# textos inline), porque o openpyxl só entrega o arquivo depois de salvo: o
+# zipfile grava em um destino não pesquisável, com descritores de dados, e os
+# bytes comprimidos são repassados a cada bloco de linhas.
+
+BATCH_SIZE = 1000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def iter_csv(header, rows, batch_size=BATCH_SIZE):
+    """CSV separado por ';' em UTF-8 com BOM (abre direto no Excel)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _Pipe(io.RawIOBase):
+    """Destino do zipfile que só acumula os bytes até serem lidos pelo gerador."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_xlsx(header, rows, sheet_name='Dados', batch_size=BATCH_SIZE):
+    """Planilha XLSX com uma aba; números viram células numéricas e o resto, texto."""
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES_XML)
+        archive.writestr('_rels/.rels', _RELS_XML)
+        archive.writestr('xl/workbook.xml', _WORKBOOK_XML.format(sheet_name=escape(sheet_name)))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS_XML)
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_SHEET_START.encode())
+            sheet.write(_xlsx_row(header))
+            for count, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row))
+                if count % batch_size == 0 and pipe.chunks:
+                    yield pipe.drain()
+            sheet.write(_SHEET_END.encode())
+    yield pipe.drain()
+
+
+def iter_export(file_format, header, rows, **kwargs):
+    if file_format == 'xlsx':
+        return iter_xlsx(header, rows, **kwargs)
+    return iter_csv(header, rows)
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if value is None or (isinstance(value, float) and not math.isfinite(value)):
+            cells.append('<c/>')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value!r}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'.encode()
+
+
+_CONTENT_TYPES_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>'''
+
+_RELS_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+_WORKBOOK_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''
+
+_WORKBOOK_RELS_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>'''
+
+_SHEET_START = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'''
+
+_SHEET_END = '</sheetData></worksheet>'
@@ -0,0 +1,92 @@
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from utils.text_utils import parse_currency
+from ..db import get_db
+from .batch import month_goals, save_goals, validate_goals, parse_goals_csv
+import datetime
+
+goals_bp = Blueprint('goals', __name__)
+
+# Rota para definir as metas de um mês (meta geral e de todos os vendedores de uma vez)
+
+
+@goals_bp.route('/set_goals', methods=['GET', 'POST'])
+def set_goals():
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    now = datetime.datetime.now()
+    year = request.values.get('year', now.year, type=int)
+    month = request.values.get('month', now.month, type=int)
+    if not 1 <= month <= 12:
+        flash('Mês inválido.', 'error')
+        return redirect(url_for('goals.set_goals'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+
+    if request.method == 'POST':
+        # Campos em branco mantêm a meta atual
+        try:
+            general_goal = parse_currency(request.form.get('general_goal', ''))
+            individual_goals = []
+            for key, value in request.form.items():
+                if key.startswith('goal_') and value.strip():
+                    individual_goals.append((int(key[len('goal_'):]), year, month, parse_currency(value)))
+        except ValueError:
+            flash('Valor de meta inválido.', 'error')
+            return redirect(url_for('goals.set_goals', year=year, month=month))
+
+        if general_goal is None and not individual_goals:
+            flash('Preencha pelo menos um dos campos de metas.', 'error')
+            return redirect(url_for('goals.set_goals', year=year, month=month))
+
+        general_goals = [(year, month, general_goal)] if general_goal is not None else []
+        errors = validate_goals(cursor, general_goals, individual_goals)
+        if errors:
+            for error in errors:
+                flash(error, 'error')
+            return redirect(url_for('goals.set_goals', year=year, month=month))
+
+        save_goals(cursor, general_goals, individual_goals)
+        conn.commit()
+
+        flash('Metas atualizadas com sucesso!', 'success')
+        return redirect(url_for('goals.set_goals', year=year, month=month))
+
+    # Só as metas do mês selecionado
+    general_goal, individual_goals = month_goals(cursor, year, month)
+    cursor.execute("SELECT id, username, name, active FROM Users WHERE role = 'seller' ORDER BY name")
+    sellers = cursor.fetchall()
+
+    return render_template('set_goals.html', sellers=sellers, year=year, month=month,
+                           general_goal=general_goal,
+                           individual_goals=individual_goals)
+
+
+# Rota para importar metas de um CSV (ano;mes;username;meta)
+
+
+@goals_bp.route('/set_goals/import', methods=['POST'])
+def import_goals():
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    file = request.files.get('file')
+    if not file or not file.filename:
+        flash('Nenhum arquivo enviado.', 'error')
+        return redirect(url_for('goals.set_goals'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+    general_goals, individual_goals, errors = parse_goals_csv(cursor, file.read())
+    if errors:
+        for error in errors[:20]:
+            flash(error, 'error')
+        flash('Nenhuma meta foi gravada.', 'error')
+        return redirect(url_for('goals.set_goals'))
+
+    save_goals(cursor, general_goals, individual_goals)
+    conn.commit()
+
+    flash(f'{len(general_goals)} metas gerais e {len(individual_goals)} metas individuais importadas.', 'success')
+    return redirect(url_for('goals.set_goals'))
@@ -0,0 +1,123 @@
+from utils.text_utils import normalize_name, parse_currency
+import csv
+import io
+import math
+
+# Gravação das metas em lote: todas as metas de um ou mais meses vão em um
+# executemany, numa única transação, usando os índices únicos por período
+# (IndividualGoals (user_id, year, month) e GeneralGoals (year, month)) no upsert.
+
+CSV_COLUMNS = ('ano', 'mes', 'username', 'meta')
+
+
+class _SemicolonDialect(csv.excel):
+    delimiter = ';'
+
+
+def month_goals(cursor, year, month):
+    """Retorna a meta geral e as metas individuais ({user_id: meta}) do mês."""
+    cursor.execute('SELECT goal FROM GeneralGoals WHERE year = ? AND month = ?', (year, month))
+    row = cursor.fetchone()
+    general_goal = row['goal'] if row else None
+
+    cursor.execute('SELECT user_id, goal FROM IndividualGoals WHERE year = ? AND month = ?', (year, month))
+    return general_goal, {row['user_id']: row['goal'] for row in cursor.fetchall()}
+
+
+def save_goals(cursor, general_goals, individual_goals):
+    """Grava as metas informadas; o commit fica a cargo de quem chama.
+
+    `general_goals` é uma lista de (ano, mês, meta) e `individual_goals`, de
+    (user_id, ano, mês, meta). Metas já cadastradas no período são substituídas.
+    """
+    cursor.executemany('''
+        INSERT INTO GeneralGoals (year, month, goal) VALUES (?, ?, ?)
+        ON CONFLICT(year, month) DO UPDATE SET goal = excluded.goal
+    ''', general_goals)
+    cursor.executemany('''
+        INSERT INTO IndividualGoals (user_id, year, month, goal) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, year, month) DO UPDATE SET goal = excluded.goal
+    ''', individual_goals)
+
+
+def validate_goals(cursor, general_goals, individual_goals):
+    """Confere as metas antes de save_goals; retorna a lista de erros (vazia se tudo pode ser gravado).
+
+    As metas devem ser números finitos e não negativos, e as individuais,
+    de vendedores cadastrados. Recebe as listas no formato de save_goals.
+    """
+    errors = []
+    for year, month, goal in general_goals:
+        if not _valid_goal(goal):
+            errors.append(f'Meta geral de {month:02d}/{year} inválida: informe um valor não negativo.')
+
+    cursor.execute("SELECT id, username FROM Users WHERE role = 'seller'")
+    sellers = {row['id']: row['username'] for row in cursor.fetchall()}
+    for user_id, year, month, goal in individual_goals:
+        if user_id not in sellers:
+            errors.append(f'Vendedor {user_id} não cadastrado.')
+        elif not _valid_goal(goal):
+            errors.append(f'Meta de {sellers[user_id]} em {month:02d}/{year} inválida: '
+                          'informe um valor não negativo.')
+    return errors
+
+
+def _valid_goal(goal):
+    # parse_currency e float() aceitam 'nan' e 'inf'
+    return isinstance(goal, (int, float)) and math.isfinite(goal) and goal >= 0
+
+
+def parse_goals_csv(cursor, data):
+    """Lê um CSV de metas (colunas ano, mes, username e meta; username vazio é a meta geral).
+
+    O vendedor pode ser informado pelo username ou pelo nome, e as metas
+    passam por validate_goals. Retorna (metas gerais, metas individuais,
+    erros); com qualquer erro, nada deve ser gravado.
+    """
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('latin-1')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=';,\t')
+    except csv.Error:
+        dialect = _SemicolonDialect
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    fields = {(name or '').strip().lower() for name in reader.fieldnames or ()}
+    missing = [column for column in CSV_COLUMNS if column not in fields]
+    if missing:
+        return [], [], [f'Colunas ausentes no CSV: {", ".join(missing)}.']
+
+    cursor.execute("SELECT id, username, name FROM Users WHERE role = 'seller'")
+    sellers = {}
+    for row in cursor.fetchall():
+        sellers[row['username'].lower()] = row['id']
+        sellers.setdefault(normalize_name(row['name']), row['id'])
+
+    general_goals, individual_goals, errors = [], [], []
+    for line, row in enumerate(reader, start=2):
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        if not any(row.values()):
+            continue
+        try:
+            year, month = int(row['ano']), int(row['mes'])
+            goal = parse_currency(row['meta'])
+        except ValueError:
+            errors.append(f'Linha {line}: ano, mês ou meta inválidos.')
+            continue
+        if not 1 <= month <= 12 or goal is None:
+            errors.append(f'Linha {line}: ano, mês ou meta inválidos.')
+            continue
+
+        seller = row['username']
+        if not seller:
+            general_goals.append((year, month, goal))
+            continue
+        user_id = sellers.get(seller.lower()) or sellers.get(normalize_name(seller))
+        if user_id is None:
+            errors.append(f'Linha {line}: vendedor {seller} não cadastrado.')
+            continue
+        individual_goals.append((user_id, year, month, goal))
+
+    errors.extend(validate_goals(cursor, general_goals, individual_goals))
+    return general_goals, individual_goals, errors
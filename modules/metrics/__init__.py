@@ -0,0 +1,149 @@
+from flask import Blueprint, Response, current_app, g, request, session, abort, before_render_template, \
+    template_rendered
+from .registry import REGISTRY
+from . import sql
+import cProfile
+import hmac
+import os
+import random
+import time
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Instrumentação das requisições: latência por rota, quantidade e tempo de
+# SQL por requisição (via a conexão instrumentada de modules/db.py), tempo de
+# renderização dos templates e das etapas da importação de planilhas. Tudo é
+# exposto em /metrics no formato de texto do Prometheus; cada resposta também
+# leva um cabeçalho Server-Timing com os números da própria requisição.
+#
+# Com METRICS_PROFILE_RATE > 0, essa fração das requisições roda sob o
+# cProfile e o resultado é gravado em METRICS_PROFILE_DIR (um .prof por
+# requisição, para abrir com pstats ou snakeviz).
+
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+REQUEST_SECONDS = REGISTRY.histogram('comisys_request_seconds', 'Duração das requisições por rota.',
+                                     ('endpoint', 'method', 'status'))
+REQUEST_SQL_QUERIES = REGISTRY.histogram('comisys_request_sql_queries', 'Comandos SQL por requisição.',
+                                         ('endpoint',), SQL_COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = REGISTRY.histogram('comisys_request_sql_seconds', 'Tempo em SQL por requisição.',
+                                         ('endpoint',))
+TEMPLATE_SECONDS = REGISTRY.histogram('comisys_template_render_seconds', 'Duração da renderização dos templates.',
+                                      ('template',))
+IMPORT_STAGE_SECONDS = REGISTRY.histogram('comisys_import_stage_seconds', 'Duração das etapas da importação.',
+                                          ('stage',), (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+
+
+def _dashboard_cache_stats(key):
+    def collect():
+        cache = current_app.extensions.get('dashboard_cache')
+        return {(): cache.stats()[key]} if cache is not None else {}
+    return collect
+
+
+REGISTRY.collected('comisys_dashboard_cache_hits_total', 'Acertos do cache dos dashboards.', 'counter', (),
+                   _dashboard_cache_stats('hits'))
+REGISTRY.collected('comisys_dashboard_cache_misses_total', 'Faltas do cache dos dashboards.', 'counter', (),
+                   _dashboard_cache_stats('misses'))
+REGISTRY.collected('comisys_dashboard_cache_entries', 'Entradas em memória no cache dos dashboards.', 'gauge', (),
+                   _dashboard_cache_stats('entries'))
+
+
+def _dashboard_snapshot_age():
+    snapshot = current_app.extensions.get('dashboard_read_pool')
+    age = snapshot.age() if hasattr(snapshot, 'age') else None
+    return {(): age} if age is not None else {}
+
+
+REGISTRY.collected('comisys_dashboard_snapshot_age_seconds',
+                   'Segundos desde a última conferência da cópia de leitura dos dashboards.', 'gauge', (),
+                   _dashboard_snapshot_age)
+
+
+def init_app(app):
+    app.config.setdefault('METRICS_SLOW_QUERY_SECONDS', float(os.environ.get('COMISYS_SLOW_QUERY_SECONDS', 0.1)))
+    app.config.setdefault('METRICS_PROFILE_RATE', float(os.environ.get('COMISYS_PROFILE_RATE', 0)))
+    app.config.setdefault('METRICS_PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    # Token para o coletor do Prometheus (Authorization: Bearer ...); sem ele, só o master vê /metrics
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('COMISYS_METRICS_TOKEN'))
+    sql.slow_query_seconds = app.config['METRICS_SLOW_QUERY_SECONDS']
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    before_render_template.connect(start_template, app)
+    template_rendered.connect(finish_template, app)
+
+
+def observe_import(timings):
+    """Registra o tempo de cada etapa de uma importação (ImportResult.timings)."""
+    for stage, seconds in timings.items():
+        IMPORT_STAGE_SECONDS.observe(seconds, stage)
+
+
+def start_request():
+    g.request_started = time.perf_counter()
+    # [comandos, segundos], atualizado pela conexão instrumentada
+    g.sql_stats = [0, 0.0]
+    g.template_seconds = 0.0
+
+    rate = current_app.config['METRICS_PROFILE_RATE']
+    if rate and random.random() < rate:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Outro profiler já está ativo neste processo
+            return
+        g.profiler = profiler
+
+
+def finish_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    endpoint = request.endpoint or 'desconhecido'
+    queries, sql_seconds = g.sql_stats
+
+    REQUEST_SECONDS.observe(duration, endpoint, request.method, str(response.status_code))
+    REQUEST_SQL_QUERIES.observe(queries, endpoint)
+    REQUEST_SQL_SECONDS.observe(sql_seconds, endpoint)
+    response.headers['Server-Timing'] = (f'sql;dur={sql_seconds * 1000:.1f};desc="{queries} comandos", '
+                                         f'tpl;dur={g.template_seconds * 1000:.1f}, '
+                                         f'total;dur={duration * 1000:.1f}')
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        directory = current_app.config['METRICS_PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, f'{time.time():.3f}-{endpoint}.prof'))
+    return response
+
+
+def start_template(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+
+def finish_template(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    TEMPLATE_SECONDS.observe(duration, template.name or 'desconhecido')
+    if 'template_seconds' in g:
+        g.template_seconds += duration
+
+
+# Rota para as métricas no formato do Prometheus
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    authorized_token = token and hmac.compare_digest(authorization, f'Bearer {token}')
+    if not authorized_token and ('user_id' not in session or session['role'] != 'master'):
+        abort(403)
+
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
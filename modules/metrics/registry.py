@@ -0,0 +1,130 @@
+from threading import Lock
+import bisect
+
+# Contadores e histogramas em memória, no formato de exposição de texto do
+# Prometheus. Cada série é identificada pelos valores dos rótulos (labels);
+# os rótulos usados aqui têm poucos valores possíveis (rotas, templates,
+# etapas da importação), então o número de séries fica limitado.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        if not self.labels and not values:
+            values[()] = 0
+        for label_values, value in sorted(values.items()):
+            yield self.name, _labels(self.labels, label_values), value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # {rótulos: [contagem por faixa..., soma, total]}
+        self.values = {}
+        self.lock = Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self.lock:
+            values = {key: list(series) for key, series in self.values.items()}
+        for label_values, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield (f'{self.name}_bucket', _labels(self.labels + ('le',), label_values + (_number(bound),)),
+                       cumulative)
+            yield f'{self.name}_bucket', _labels(self.labels + ('le',), label_values + ('+Inf',)), series[-1]
+            yield f'{self.name}_sum', _labels(self.labels, label_values), series[-2]
+            yield f'{self.name}_count', _labels(self.labels, label_values), series[-1]
+
+
+class Collected:
+    """Valores lidos na hora da coleta, de uma função que devolve {rótulos: valor}."""
+
+    def __init__(self, name, help, type, labels, collect):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labels = labels
+        self.collect = collect
+
+    def samples(self):
+        for label_values, value in sorted(self.collect().items()):
+            yield self.name, _labels(self.labels, label_values), value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collected(self, name, help, type, labels, collect):
+        return self.register(Collected(name, help, type, labels, collect))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Registro usado pela aplicação; cada módulo registra as próprias métricas
+REGISTRY = Registry()
@@ -0,0 +1,90 @@
+from flask import g, has_app_context
+from .registry import REGISTRY
+import logging
+import sqlite3
+import time
+
+# Conexão SQLite instrumentada: cada comando executado é cronometrado e entra
+# no histograma global e nos totais da requisição atual (g.sql_stats, quando
+# a requisição é medida). Comandos mais lentos que `slow_query_seconds` são
+# registrados no log 'comisys.sql' com o SQL e os parâmetros.
+#
+# O tempo medido é o de execute(), que roda o primeiro passo do comando: para
+# agregações e ordenações é onde o trabalho acontece. fetchall() e fetchmany()
+# entram no tempo da requisição, mas não contam como comandos. As conexões do
+# PostgreSQL (modules/storage/postgresql.py) registram da mesma forma.
+
+SQL_SECONDS = REGISTRY.histogram('comisys_sql_query_seconds', 'Duração dos comandos SQL.')
+SLOW_QUERIES = REGISTRY.counter('comisys_sql_slow_queries_total', 'Comandos SQL acima do limite de lentidão.')
+
+logger = logging.getLogger('comisys.sql')
+
+# Limite do log de consultas lentas, em segundos (configurado em metrics.init_app)
+slow_query_seconds = 0.1
+MAX_LOGGED_PARAMETERS = 500
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(sql, '(executemany)', time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record_fetch(time.perf_counter() - started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            record_fetch(time.perf_counter() - started)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Os atalhos da conexão não passam por cursor().execute no sqlite3
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _request_stats():
+    return g.get('sql_stats') if has_app_context() else None
+
+
+def record_query(sql, parameters, duration):
+    SQL_SECONDS.observe(duration)
+    stats = _request_stats()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += duration
+    if duration >= slow_query_seconds:
+        SLOW_QUERIES.inc()
+        logged = repr(parameters)
+        if len(logged) > MAX_LOGGED_PARAMETERS:
+            logged = logged[:MAX_LOGGED_PARAMETERS] + '...'
+        logger.warning('Consulta lenta (%.3f s): %s | parâmetros: %s', duration, ' '.join(sql.split()), logged)
+
+
+def record_fetch(duration):
+    stats = _request_stats()
+    if stats is not None:
+        stats[1] += duration
@@ -0,0 +1,132 @@
+from ..db import get_db_connection
+from . import postgresql, versions
+from .transfer import copy_database
+import click
+import logging
+
+logger = logging.getLogger('comisys.migrations')
+
+# Migrações versionadas do esquema, aplicadas na inicialização. A versão do
+# banco é o número de migrações já aplicadas (PRAGMA user_version no SQLite,
+# tabela SchemaVersion no PostgreSQL), então uma inicialização com o banco em
+# dia só lê esse número. Cada migração roda na sua própria transação de escrita
+# exclusiva (BEGIN IMMEDIATE no SQLite, trava consultiva no PostgreSQL, para as
+# instâncias que sobem juntas não migrarem duas vezes), junto com a troca de
+# versão: se ela falhar, o banco fica na versão anterior. Quando alguma
+# migração é aplicada, as estatísticas usadas pelo planejador de consultas são
+# atualizadas para os índices novos.
+#
+# Cada backend tem a sua lista de migrações (ver modules/storage).
+
+MIGRATIONS = {
+    'sqlite': versions.MIGRATIONS,
+    'postgresql': postgresql.MIGRATIONS,
+}
+
+
+def init_app(app):
+    conn = get_db_connection(app.config['DATABASE'])
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+    app.cli.add_command(db_command)
+
+
+def schema_version(conn):
+    return conn.storage.schema_version(conn)
+
+
+def app_version(conn):
+    """Versão do esquema esperada pela aplicação no backend da conexão."""
+    return len(MIGRATIONS[conn.storage.name])
+
+
+def migrate(conn, target=None):
+    """Aplica as migrações pendentes até `target` (padrão: a última); retorna as versões aplicadas."""
+    storage = conn.storage
+    migrations = MIGRATIONS[storage.name]
+    if target is None:
+        target = len(migrations)
+    if schema_version(conn) >= target:
+        return []
+    if conn.in_transaction:
+        conn.commit()
+
+    applied = []
+    cursor = conn.cursor()
+    for version in range(1, target + 1):
+        migration = migrations[version - 1]
+        try:
+            storage.begin_write(cursor)
+            # Conferir de novo com o banco travado: outro processo pode ter migrado antes
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migration(conn, cursor)
+            storage.set_schema_version(cursor, version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception('Falha na migração %d (%s).', version, migration.__name__)
+            raise
+        logger.info('Migração %d aplicada (%s).', version, migration.__name__)
+        applied.append(version)
+
+    if applied:
+        storage.analyze(cursor)
+        conn.commit()
+    return applied
+
+
+# Comandos do esquema (flask --app comisys db version|analyze|copy)
+
+
+@click.group('db', help='Esquema do banco de dados.')
+def db_command():
+    pass
+
+
+@db_command.command('version')
+def version_command():
+    """Mostra a versão do esquema do banco e a da aplicação."""
+    conn = get_db_connection()
+    try:
+        print(f'Banco na versão {schema_version(conn)}; aplicação na versão {app_version(conn)}.')
+    finally:
+        conn.close()
+
+
+@db_command.command('analyze')
+def analyze_command():
+    """Atualiza as estatísticas do planejador de consultas (ANALYZE)."""
+    conn = get_db_connection()
+    try:
+        conn.storage.analyze(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+    print('Estatísticas atualizadas.')
+
+
+@db_command.command('copy')
+@click.argument('source')
+def copy_command(source):
+    """Substitui os dados do banco da aplicação pelos de SOURCE (arquivo SQLite ou URL postgresql://).
+
+    SOURCE é só lido: ele precisa estar na versão de esquema da aplicação.
+    """
+    source_conn = get_db_connection(source, read_only=True)
+    conn = get_db_connection()
+    try:
+        source_version, expected = schema_version(source_conn), app_version(source_conn)
+        if source_version != expected:
+            raise click.ClickException(f'{source} está na versão {source_version} do esquema, e a aplicação, na '
+                                       f'versão {expected}. Migre-o antes (inicie a aplicação com ele em '
+                                       'COMISYS_DATABASE) e copie de novo.')
+        copied = copy_database(source_conn, conn)
+    finally:
+        source_conn.close()
+        conn.close()
+    for table, rows in copied.items():
+        print(f'{table}: {rows} linhas.')
@@ -0,0 +1,233 @@
+# Migrações do esquema no PostgreSQL. A versão do banco fica na tabela
+# SchemaVersion (ver modules/storage/postgresql.py).
+#
+# Não há bancos PostgreSQL anteriores ao controle de versão, então a primeira
+# migração cria de uma vez o esquema equivalente ao das migrações do SQLite
+# (modules/migrations/versions.py) e as próximas mudanças do esquema entram nas
+# duas listas. Os tipos seguem o que a aplicação grava: datas como texto
+# 'aaaa-mm-dd', valores em DOUBLE PRECISION e status (active) como 0 ou 1.
+
+# Impressão digital do conteúdo de um pedido, calculada no servidor (no SQLite
+# é a função Python registrada em reconcile.register_functions). Os valores só
+# são comparados dentro do mesmo banco, então basta ser estável aqui.
+CONTENT_HASH_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION content_hash(TEXT, DOUBLE PRECISION, BIGINT) RETURNS BIGINT
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT ('x' || substr(md5($1 || '|' || to_char(round($2::numeric, 2), 'FM999999999999990.00') || '|'
+                                  || coalesce($3::text, '')), 1, 16))::bit(64)::bigint
+    $$
+'''
+
+# Versões dos dados, incrementadas por gatilhos como no SQLite. Os argumentos
+# do gatilho são os escopos alterados: 'period' vira o mês da linha ('aaaa-mm').
+BUMP_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION bump_data_versions() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        changed RECORD;
+        changed_scope TEXT;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed := OLD;
+        ELSE
+            changed := NEW;
+        END IF;
+        FOREACH changed_scope IN ARRAY TG_ARGV LOOP
+            IF changed_scope = 'period' THEN
+                changed_scope := to_char(changed.year, 'FM0000') || '-' || to_char(changed.month, 'FM00');
+            END IF;
+            INSERT INTO DataVersions (scope, version, updated_at)
+            VALUES (changed_scope, 1, CAST(extract(epoch FROM now()) AS BIGINT))
+            ON CONFLICT(scope) DO UPDATE SET version = DataVersions.version + 1, updated_at = excluded.updated_at;
+        END LOOP;
+        RETURN NULL;
+    END
+    $$
+'''
+VERSION_TRIGGERS = {
+    'MonthlySalesSummary': ('INSERT OR DELETE', "'period', 'sales'"),
+    'IndividualGoals': ('INSERT OR UPDATE OR DELETE', "'period'"),
+    'GeneralGoals': ('INSERT OR UPDATE OR DELETE', "'period'"),
+    'Users': ('INSERT OR UPDATE OR DELETE', "'*'"),
+    'CommissionTiers': ('INSERT OR UPDATE OR DELETE', "'*'"),
+}
+
+TABLES = (
+    '''CREATE TABLE Users (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        username TEXT NOT NULL,
+        password TEXT NOT NULL,
+        name TEXT NOT NULL,  -- Nome completo do usuário
+        role TEXT NOT NULL,  -- 'seller' ou 'master'
+        branch TEXT NOT NULL DEFAULT 'Loja',  -- Filial do usuário
+        active INTEGER NOT NULL DEFAULT 1
+    )''',
+    '''CREATE TABLE IndividualGoals (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        goal DOUBLE PRECISION NOT NULL,
+        year INTEGER,
+        month INTEGER
+    )''',
+    '''CREATE TABLE GeneralGoals (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        goal DOUBLE PRECISION NOT NULL,
+        year INTEGER,
+        month INTEGER
+    )''',
+    '''CREATE TABLE Sales (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        date TEXT NOT NULL,
+        amount DOUBLE PRECISION NOT NULL,
+        user_id INTEGER,
+        order_number TEXT NOT NULL,
+        content_hash BIGINT
+    )''',
+    '''CREATE TABLE MonthlySalesSummary (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        user_id INTEGER,
+        branch TEXT,
+        total DOUBLE PRECISION NOT NULL,
+        order_count INTEGER NOT NULL
+    )''',
+    '''CREATE TABLE SalesPeriods (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        PRIMARY KEY (year, month)
+    )''',
+    '''CREATE TABLE ImportJobs (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        status TEXT NOT NULL,  -- 'queued', 'running', 'done' ou 'error'
+        rows_parsed INTEGER,
+        rows_merged INTEGER,
+        warnings TEXT,  -- Lista de avisos em JSON
+        exclusions TEXT,  -- Linhas e valor excluídos por regra, em JSON
+        result TEXT,
+        import_id INTEGER,  -- Registro em Imports, quando concluída
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )''',
+    '''CREATE TABLE SellerAliases (
+        alias TEXT PRIMARY KEY,  -- Nome normalizado, como em normalize_name
+        user_id INTEGER NOT NULL
+    )''',
+    '''CREATE TABLE ExclusionRules (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        term TEXT NOT NULL UNIQUE,  -- Trecho do nome do cliente, sem acentos e em minúsculas
+        active INTEGER NOT NULL DEFAULT 1
+    )''',
+    '''CREATE TABLE CommissionTiers (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        branch TEXT NOT NULL,
+        valid_from INTEGER NOT NULL,  -- Primeiro mês de vigência, como aaaamm (0 = desde sempre)
+        kind TEXT NOT NULL,  -- 'commission' ou 'bonus'
+        basis TEXT NOT NULL DEFAULT 'seller',  -- Total comparado com min_amount: 'seller' ou 'branch'
+        min_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+        min_branch_percentage DOUBLE PRECISION NOT NULL DEFAULT 0,  -- Percentual mínimo da meta geral
+        rate DOUBLE PRECISION NOT NULL
+    )''',
+    '''CREATE TABLE DataVersions (
+        scope TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at BIGINT  -- Horário da última alteração (epoch, UTC)
+    )''',
+    '''CREATE TABLE Imports (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        file_name TEXT,
+        year INTEGER NOT NULL,  -- Mês de referência da planilha
+        month INTEGER NOT NULL,
+        rows_parsed INTEGER NOT NULL,
+        orders INTEGER NOT NULL,
+        inserted INTEGER NOT NULL,
+        updated INTEGER NOT NULL,
+        deleted INTEGER NOT NULL,
+        unchanged INTEGER NOT NULL,
+        file_hash TEXT,  -- SHA-256 do arquivo enviado
+        parse_seconds DOUBLE PRECISION,  -- Tempo de leitura da planilha
+        resolve_seconds DOUBLE PRECISION,  -- Tempo de identificação dos vendedores
+        merge_seconds DOUBLE PRECISION,  -- Tempo de aplicação em Sales e no resumo mensal
+        rolled_back_at TEXT,  -- Preenchido quando as diferenças foram desfeitas
+        created_at TEXT NOT NULL
+    )''',
+    '''CREATE TABLE ImportChanges (
+        import_id INTEGER NOT NULL,
+        order_number TEXT NOT NULL,
+        change TEXT NOT NULL,  -- 'insert', 'update' ou 'delete'
+        old_date TEXT,
+        old_amount DOUBLE PRECISION,
+        old_user_id INTEGER,
+        new_date TEXT,
+        new_amount DOUBLE PRECISION,
+        new_user_id INTEGER,
+        PRIMARY KEY (import_id, order_number)
+    )''',
+)
+
+INDEXES = (
+    'CREATE UNIQUE INDEX idx_sales_order_number ON Sales (order_number)',
+    'CREATE INDEX idx_sales_date ON Sales (date)',
+    'CREATE INDEX idx_sales_user_date_amount ON Sales (user_id, date, amount)',
+    'CREATE INDEX idx_sales_user_order ON Sales (user_id, order_number, date, amount)',
+    'CREATE UNIQUE INDEX idx_summary_period_user ON MonthlySalesSummary (year, month, user_id)',
+    'CREATE INDEX idx_summary_user_period ON MonthlySalesSummary (user_id, year, month)',
+    'CREATE UNIQUE INDEX idx_individual_goals_unique ON IndividualGoals (user_id, year, month)',
+    'CREATE UNIQUE INDEX idx_general_goals_unique ON GeneralGoals (year, month)',
+    'CREATE INDEX idx_import_jobs_status ON ImportJobs (status)',
+    'CREATE INDEX idx_imports_period ON Imports (year, month)',
+    'CREATE INDEX idx_commission_tiers_branch ON CommissionTiers (branch, valid_from)',
+)
+
+
+def create_schema(conn, cursor):
+    """Tabelas, índices, funções e gatilhos do esquema atual, com as regras e faixas iniciais."""
+    for statement in TABLES + INDEXES:
+        cursor.execute(statement)
+    cursor.execute(CONTENT_HASH_FUNCTION)
+    cursor.execute(BUMP_FUNCTION)
+    for table, (events, scopes) in VERSION_TRIGGERS.items():
+        cursor.execute(f'''
+            CREATE TRIGGER trg_version_{table.lower()} AFTER {events} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION bump_data_versions({scopes})
+        ''')
+
+    cursor.execute("INSERT INTO ExclusionRules (term) VALUES ('comagro')")
+    cursor.executemany('''
+        INSERT INTO CommissionTiers (branch, valid_from, kind, basis, min_amount, min_branch_percentage, rate)
+        VALUES (?, 0, ?, ?, ?, ?, ?)
+    ''', [
+        ('Loja', 'commission', 'seller', 0, 0, 0.01),
+        ('Loja', 'bonus', 'seller', 225000, 100, 0.006),
+        ('Loja', 'bonus', 'seller', 170000, 0, 0.004),
+        ('Loja', 'bonus', 'seller', 130000, 0, 0.003),
+        ('Oficina', 'commission', 'branch', 0, 0, 0.005),
+        ('Oficina', 'commission', 'branch', 500000, 0, 0.01),
+    ])
+
+
+def import_checks(conn, cursor):
+    """Tempo de gravação na tabela temporária e estado das vendas do mês ao fim de cada importação."""
+    cursor.execute('''
+        ALTER TABLE Imports
+        ADD COLUMN IF NOT EXISTS stage_seconds DOUBLE PRECISION,
+        ADD COLUMN IF NOT EXISTS sales_count INTEGER,
+        ADD COLUMN IF NOT EXISTS sales_checksum BIGINT
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_imports_file_hash ON Imports (file_hash)')
+
+
+def sales_page_index(conn, cursor):
+    """Troca o índice (user_id, order_number) de Sales pelo da lista de vendas paginada por (date, order_number)."""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_user_date_order ON Sales (user_id, date, order_number, amount)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_sales_user_order')
+
+
+MIGRATIONS = [
+    create_schema,
+    import_checks,
+    sales_page_index,
+]
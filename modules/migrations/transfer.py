@@ -0,0 +1,59 @@
+from ..sales.reconcile import register_functions
+
+# Cópia dos dados entre bancos (ex.: do arquivo SQLite de uma instância única
+# para o PostgreSQL compartilhado). Os dois bancos precisam estar migrados; os
+# dados do destino são substituídos em uma única transação, com a carga em
+# massa do backend (COPY no PostgreSQL). As colunas são as do destino, e o
+# content_hash das vendas é recalculado com a função do destino. DataVersions
+# não é copiada: os gatilhos do destino incrementam as versões, invalidando os
+# caches das instâncias que já liam dele.
+
+TABLES = (
+    'Users',
+    'SellerAliases',
+    'ExclusionRules',
+    'CommissionTiers',
+    'IndividualGoals',
+    'GeneralGoals',
+    'Sales',
+    'MonthlySalesSummary',
+    'SalesPeriods',
+    'Imports',
+    'ImportChanges',
+    'ImportJobs',
+)
+BATCH_SIZE = 5000
+
+
+def copy_database(source, target):
+    """Substitui os dados de `target` pelos de `source`; retorna {tabela: linhas copiadas}."""
+    source_cursor = source.cursor()
+    cursor = target.cursor()
+    if target.in_transaction:
+        target.commit()
+    try:
+        target.storage.begin_write(cursor)
+        for table in reversed(TABLES):
+            cursor.execute(f'DELETE FROM {table}')
+
+        copied = {}
+        for table in TABLES:
+            cursor.execute(f'SELECT * FROM {table} WHERE 1 = 0')
+            columns = [column[0] for column in cursor.description]
+            source_cursor.execute(f'SELECT {", ".join(columns)} FROM {table}')
+            copied[table] = 0
+            while True:
+                rows = [tuple(row) for row in source_cursor.fetchmany(BATCH_SIZE)]
+                if not rows:
+                    break
+                target.storage.load_rows(cursor, table, columns, rows)
+                copied[table] += len(rows)
+
+        register_functions(target)
+        cursor.execute('UPDATE Sales SET content_hash = content_hash(date, amount, user_id)')
+        target.storage.analyze(cursor)
+        target.commit()
+    except Exception:
+        target.rollback()
+        raise
+    return copied
@@ -0,0 +1,407 @@
+from ..summary import rebuild_monthly_summary, rebuild_sales_periods
+from ..sales.reconcile import register_functions
+
+# Migrações do esquema no SQLite, na ordem em que são aplicadas. A versão de
+# um banco é o número de migrações já aplicadas (PRAGMA user_version).
+#
+# Bancos criados antes do controle de versão estão na versão 0, mas podem ter
+# qualquer parte deste esquema (criada pelo antigo init_db ou à mão), então
+# cada migração confere o que já existe antes de criar ou alterar. Nenhuma
+# migração faz commit: o executor aplica cada uma na sua própria transação.
+
+
+def add_column_if_missing(cursor, table, column, definition):
+    """Adiciona a coluna em bancos antigos; retorna True se ela foi criada agora."""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row['name'] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        return True
+    return False
+
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, index):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,))
+    return cursor.fetchone() is not None
+
+
+def create_base_tables(conn, cursor):
+    """Usuários, metas e vendas, com os índices das consultas por período."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        password TEXT NOT NULL,
+        name TEXT NOT NULL,  -- Nome completo do usuário
+        role TEXT NOT NULL,  -- 'seller' ou 'master'
+        branch TEXT NOT NULL,  -- Filial do usuário
+        active INTEGER NOT NULL DEFAULT 1
+    );
+    ''')
+    add_column_if_missing(cursor, 'Users', 'branch', "TEXT NOT NULL DEFAULT 'Loja'")
+    add_column_if_missing(cursor, 'Users', 'active', 'INTEGER NOT NULL DEFAULT 1')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS IndividualGoals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        goal REAL NOT NULL,
+        year INTEGER,
+        month INTEGER,
+        FOREIGN KEY(user_id) REFERENCES Users(id)
+    );
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS GeneralGoals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        goal REAL NOT NULL,
+        year INTEGER,
+        month INTEGER
+    );
+    ''')
+    # Metas por período (bancos antigos não tinham ano e mês nas metas)
+    for table in ('IndividualGoals', 'GeneralGoals'):
+        add_column_if_missing(cursor, table, 'year', 'INTEGER')
+        add_column_if_missing(cursor, table, 'month', 'INTEGER')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date DATE NOT NULL,
+        amount REAL NOT NULL,
+        user_id INTEGER,
+        order_number TEXT NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES Users(id)
+    );
+    ''')
+    # Índices para os filtros por período (date >= ? AND date < ?)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_date ON Sales (date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_user_date ON Sales (user_id, date)')
+    # Índice da lista de vendas paginada por número de pedido (cobre a consulta da API)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_user_order ON Sales (user_id, order_number, date, amount)')
+
+
+def unique_order_numbers(conn, cursor):
+    """Índice único por número de pedido (usado no upsert da importação)."""
+    if index_exists(cursor, 'idx_sales_order_number'):
+        return
+    # Vendas sem número de pedido ('nan' de células vazias) são vendas distintas:
+    # ganham um sufixo com o id em vez de serem somadas abaixo
+    cursor.execute('''
+        UPDATE Sales
+        SET order_number = order_number || '-' || id
+        WHERE trim(order_number) IN ('nan', '')
+        AND id NOT IN (SELECT MIN(id) FROM Sales WHERE trim(order_number) IN ('nan', '') GROUP BY order_number)
+    ''')
+    # Unificar pedidos repetidos no mesmo mês, somando os valores na linha mais antiga
+    cursor.execute('''
+        UPDATE Sales
+        SET amount = (SELECT SUM(s.amount) FROM Sales s
+                      WHERE s.order_number = Sales.order_number
+                      AND substr(s.date, 1, 7) = substr(Sales.date, 1, 7))
+        WHERE id IN (SELECT MIN(id) FROM Sales
+                     GROUP BY order_number, substr(date, 1, 7)
+                     HAVING COUNT(*) > 1)
+    ''')
+    cursor.execute('''
+        DELETE FROM Sales
+        WHERE id NOT IN (SELECT MIN(id) FROM Sales GROUP BY order_number, substr(date, 1, 7))
+    ''')
+    # Pedidos repetidos em meses diferentes ganham um sufixo
+    cursor.execute('''
+        UPDATE Sales
+        SET order_number = order_number || '-' || id
+        WHERE id NOT IN (SELECT MIN(id) FROM Sales GROUP BY order_number)
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX idx_sales_order_number ON Sales (order_number)')
+
+
+def monthly_summary(conn, cursor):
+    """Resumo mensal de vendas por vendedor e catálogo dos meses com vendas."""
+    summary_exists = table_exists(cursor, 'MonthlySalesSummary')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS MonthlySalesSummary (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        user_id INTEGER,
+        branch TEXT,
+        total REAL NOT NULL,
+        order_count INTEGER NOT NULL
+    );
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_summary_period_user
+        ON MonthlySalesSummary (year, month, user_id)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_summary_user_period ON MonthlySalesSummary (user_id, year, month)')
+
+    sales_periods_exist = table_exists(cursor, 'SalesPeriods')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS SalesPeriods (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        PRIMARY KEY (year, month)
+    ) WITHOUT ROWID;
+    ''')
+    if not summary_exists:
+        rebuild_monthly_summary(cursor)
+    elif not sales_periods_exist:
+        rebuild_sales_periods(cursor)
+
+
+def import_jobs(conn, cursor):
+    """Importações de planilhas em segundo plano."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ImportJobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        status TEXT NOT NULL,  -- 'queued', 'running', 'done' ou 'error'
+        rows_parsed INTEGER,
+        rows_merged INTEGER,
+        warnings TEXT,  -- Lista de avisos em JSON
+        exclusions TEXT,  -- Linhas e valor excluídos por regra, em JSON
+        result TEXT,
+        import_id INTEGER,  -- Registro em Imports, quando concluída
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    );
+    ''')
+    add_column_if_missing(cursor, 'ImportJobs', 'exclusions', 'TEXT')
+    add_column_if_missing(cursor, 'ImportJobs', 'import_id', 'INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_import_jobs_status ON ImportJobs (status)')
+
+
+def seller_aliases_and_exclusions(conn, cursor):
+    """Apelidos de vendedores (grafias usadas pelo ERP) e regras de exclusão de clientes internos."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS SellerAliases (
+        alias TEXT PRIMARY KEY,  -- Nome normalizado, como em normalize_name
+        user_id INTEGER NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES Users(id)
+    );
+    ''')
+
+    exclusion_rules_exist = table_exists(cursor, 'ExclusionRules')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ExclusionRules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        term TEXT NOT NULL UNIQUE,  -- Trecho do nome do cliente, sem acentos e em minúsculas
+        active INTEGER NOT NULL DEFAULT 1
+    );
+    ''')
+    if not exclusion_rules_exist:
+        # Regra que antes era fixa na importação ('comagro' cobre as demais variações)
+        cursor.execute("INSERT INTO ExclusionRules (term) VALUES ('comagro')")
+
+
+def commission_tiers(conn, cursor):
+    """Faixas de comissão e bônus por filial."""
+    commission_tiers_exist = table_exists(cursor, 'CommissionTiers')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS CommissionTiers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        branch TEXT NOT NULL,
+        valid_from INTEGER NOT NULL,  -- Primeiro mês de vigência, como aaaamm (0 = desde sempre)
+        kind TEXT NOT NULL,  -- 'commission' ou 'bonus'
+        basis TEXT NOT NULL DEFAULT 'seller',  -- Total comparado com min_amount: 'seller' ou 'branch'
+        min_amount REAL NOT NULL DEFAULT 0,
+        min_branch_percentage REAL NOT NULL DEFAULT 0,  -- Percentual mínimo da meta geral
+        rate REAL NOT NULL
+    );
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_commission_tiers_branch ON CommissionTiers (branch, valid_from)')
+    if not commission_tiers_exist:
+        # Faixas que antes eram fixas no dashboard
+        cursor.executemany('''
+            INSERT INTO CommissionTiers (branch, valid_from, kind, basis, min_amount, min_branch_percentage, rate)
+            VALUES (?, 0, ?, ?, ?, ?, ?)
+        ''', [
+            ('Loja', 'commission', 'seller', 0, 0, 0.01),
+            ('Loja', 'bonus', 'seller', 225000, 100, 0.006),
+            ('Loja', 'bonus', 'seller', 170000, 0, 0.004),
+            ('Loja', 'bonus', 'seller', 130000, 0, 0.003),
+            ('Oficina', 'commission', 'branch', 0, 0, 0.005),
+            ('Oficina', 'commission', 'branch', 500000, 0, 0.01),
+        ])
+
+
+# Escopos de versão alterados por cada gatilho: o mês ('aaaa-mm'), as vendas
+# em geral ('sales') e os dados gerais ('*')
+PERIOD_SCOPE = "printf('%04d-%02d', {row}.year, {row}.month)"
+VERSION_TRIGGERS = {
+    ('MonthlySalesSummary', 'INSERT'): [PERIOD_SCOPE.format(row='NEW'), "'sales'"],
+    ('MonthlySalesSummary', 'DELETE'): [PERIOD_SCOPE.format(row='OLD'), "'sales'"],
+    ('IndividualGoals', 'INSERT'): [PERIOD_SCOPE.format(row='NEW')],
+    ('IndividualGoals', 'UPDATE'): [PERIOD_SCOPE.format(row='NEW')],
+    ('IndividualGoals', 'DELETE'): [PERIOD_SCOPE.format(row='OLD')],
+    ('GeneralGoals', 'INSERT'): [PERIOD_SCOPE.format(row='NEW')],
+    ('GeneralGoals', 'UPDATE'): [PERIOD_SCOPE.format(row='NEW')],
+    ('GeneralGoals', 'DELETE'): [PERIOD_SCOPE.format(row='OLD')],
+    ('Users', 'INSERT'): ["'*'"],
+    ('Users', 'UPDATE'): ["'*'"],
+    ('Users', 'DELETE'): ["'*'"],
+    ('CommissionTiers', 'INSERT'): ["'*'"],
+    ('CommissionTiers', 'UPDATE'): ["'*'"],
+    ('CommissionTiers', 'DELETE'): ["'*'"],
+}
+
+BUMP_VERSION = '''
+            INSERT INTO DataVersions (scope, version, updated_at)
+            VALUES ({scope}, 1, CAST(strftime('%s', 'now') AS INTEGER))
+            ON CONFLICT(scope) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;'''
+
+
+def data_versions(conn, cursor):
+    """Versões dos dados mantidas por gatilhos, para invalidar os caches."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS DataVersions (
+        scope TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at INTEGER  -- Horário da última alteração (epoch, UTC)
+    );
+    ''')
+    add_column_if_missing(cursor, 'DataVersions', 'updated_at', 'INTEGER')
+    for (table, event), scopes in VERSION_TRIGGERS.items():
+        # Bancos sem versão podem ter gatilhos de versões anteriores do init_db
+        trigger = f'trg_version_{table.lower()}_{event.lower()}'
+        body = ''.join(BUMP_VERSION.format(scope=scope) for scope in scopes)
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute(f'''
+            CREATE TRIGGER {trigger} AFTER {event} ON {table}
+            BEGIN{body}
+            END
+        ''')
+
+
+def import_log(conn, cursor):
+    """content_hash das vendas e registro das importações aplicadas (Imports e ImportChanges)."""
+    # Impressão digital do conteúdo de cada pedido (importação por diferenças)
+    if add_column_if_missing(cursor, 'Sales', 'content_hash', 'INTEGER'):
+        register_functions(conn)
+        cursor.execute('UPDATE Sales SET content_hash = content_hash(date, amount, user_id)')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Imports (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_name TEXT,
+        year INTEGER NOT NULL,  -- Mês de referência da planilha
+        month INTEGER NOT NULL,
+        rows_parsed INTEGER NOT NULL,
+        orders INTEGER NOT NULL,
+        inserted INTEGER NOT NULL,
+        updated INTEGER NOT NULL,
+        deleted INTEGER NOT NULL,
+        unchanged INTEGER NOT NULL,
+        file_hash TEXT,  -- SHA-256 do arquivo enviado
+        parse_seconds REAL,  -- Tempo de leitura da planilha
+        resolve_seconds REAL,  -- Tempo de identificação dos vendedores
+        merge_seconds REAL,  -- Tempo de aplicação em Sales e no resumo mensal
+        rolled_back_at TEXT,  -- Preenchido quando as diferenças foram desfeitas
+        created_at TEXT NOT NULL
+    );
+    ''')
+    for column, column_type in (('file_hash', 'TEXT'), ('parse_seconds', 'REAL'), ('resolve_seconds', 'REAL'),
+                                ('merge_seconds', 'REAL'), ('rolled_back_at', 'TEXT')):
+        add_column_if_missing(cursor, 'Imports', column, column_type)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_imports_period ON Imports (year, month)')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ImportChanges (
+        import_id INTEGER NOT NULL,
+        order_number TEXT NOT NULL,
+        change TEXT NOT NULL,  -- 'insert', 'update' ou 'delete'
+        old_date TEXT,
+        old_amount REAL,
+        old_user_id INTEGER,
+        new_date TEXT,
+        new_amount REAL,
+        new_user_id INTEGER,
+        PRIMARY KEY (import_id, order_number),
+        FOREIGN KEY(import_id) REFERENCES Imports(id)
+    ) WITHOUT ROWID;
+    ''')
+
+
+def unique_goal_periods(conn, cursor):
+    """Índices únicos por período das metas (usados no upsert), mantendo só a meta mais recente de cada período."""
+    goal_indexes = (
+        ('IndividualGoals', 'idx_individual_goals_period', 'idx_individual_goals_unique', 'user_id, year, month'),
+        ('GeneralGoals', 'idx_general_goals_period', 'idx_general_goals_unique', 'year, month'),
+    )
+    for table, old_index, index, columns in goal_indexes:
+        if index_exists(cursor, index):
+            continue
+        cursor.execute(f'''
+            DELETE FROM {table}
+            WHERE year IS NOT NULL AND month IS NOT NULL
+            AND id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {columns})
+        ''')
+        cursor.execute(f'DROP INDEX IF EXISTS {old_index}')
+        cursor.execute(f'CREATE UNIQUE INDEX {index} ON {table} ({columns})')
+
+
+def drop_sales_processed(conn, cursor):
+    """Remove Sales.processed, a marcação da conciliação antiga que só existia em bancos em uso."""
+    cursor.execute('PRAGMA table_info(Sales)')
+    if 'processed' in [row['name'] for row in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE Sales DROP COLUMN processed')
+
+
+def covering_sales_index(conn, cursor):
+    """Troca o índice (user_id, date) de Sales por um que também cobre amount.
+
+    refresh_monthly_summary soma amount por user_id nas vendas de um mês: com
+    (user_id, date, amount) o SQLite percorre só o índice, vendedor a vendedor
+    (skip-scan, com as estatísticas do ANALYZE), sem buscar cada linha na tabela.
+    """
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sales_user_date_amount ON Sales (user_id, date, amount)')
+    cursor.execute('DROP INDEX IF EXISTS idx_sales_user_date')
+
+
+def import_checks(conn, cursor):
+    """Tempo de gravação na tabela temporária e estado das vendas do mês ao fim de cada importação.
+
+    sales_count e sales_checksum (ver history.month_fingerprint) permitem
+    reconhecer um reenvio do mesmo arquivo só se as vendas do mês não mudaram
+    desde a importação. Importações antigas ficam sem esses valores e são
+    sempre processadas de novo.
+    """
+    for column, column_type in (('stage_seconds', 'REAL'), ('sales_count', 'INTEGER'),
+                                ('sales_checksum', 'INTEGER')):
+        add_column_if_missing(cursor, 'Imports', column, column_type)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_imports_file_hash ON Imports (file_hash)')
+
+
+def sales_page_index(conn, cursor):
+    """Troca o índice (user_id, order_number) de Sales por (user_id, date, order_number).
+
+    A lista de vendas da API é paginada por (date, order_number) dentro do mês
+    do vendedor: com a data logo depois de user_id, cada página começa no
+    cursor e para no LIMIT, em vez de percorrer o histórico inteiro do
+    vendedor na ordem dos pedidos descartando as datas de outros meses.
+    """
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sales_user_date_order ON Sales (user_id, date, order_number, amount)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_sales_user_order')
+
+
+MIGRATIONS = [
+    create_base_tables,
+    unique_order_numbers,
+    monthly_summary,
+    import_jobs,
+    seller_aliases_and_exclusions,
+    commission_tiers,
+    data_versions,
+    import_log,
+    unique_goal_periods,
+    drop_sales_processed,
+    covering_sales_index,
+    import_checks,
+    sales_page_index,
+]
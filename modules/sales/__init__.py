@@ -1,10 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from utils.text_utils import remove_accents
-from ..db import get_db_connection
-import pandas as pd
-import tempfile
-import datetime
-import os
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from ..db import get_db
+from ..summary import refresh_monthly_summary, rebuild_monthly_summary, sale_periods
+from . import jobs
+from .exclusions import normalize_client
+from .history import rollback_import, replay_import
+import click
 
 
 sales_bp = Blueprint('sales', __name__)
@@ -16,7 +16,7 @@ def upload():
     if 'user_id' not in session or session['role'] != 'master':
         return redirect(url_for('users.login'))
 
-    # Processar a planilha de vendas
+    # Enviar a planilha de vendas para processamento em segundo plano
     if request.method == 'POST':
         # Verificar se o arquivo foi enviado
         if 'file' not in request.files:
@@ -31,139 +31,28 @@ def upload():
             flash('Nenhum arquivo selecionado', 'error')
             return redirect(request.url)
 
-        # Se o arquivo for válido, processar
+        # Se o arquivo for válido, criar o job de importação
         if file:
-            # Salvar o arquivo temporariamente
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-                file_path = temp_file.name
-                file.save(file_path)
-
-            # Tenta processar o arquivo
-            try:
-                process_file(file_path)
-            except Exception as e:
-                flash(f'Erro ao processa a planilha: {e}', 'error')
-            finally:
-                os.remove(file_path)
-
-    return render_template('upload.html')
-
-# Função para processar a planilha de vendas
-
-
-def process_file(file_path):
-    try:
-        # Ler a planilha
-        df = pd.read_excel(file_path, header=None)
-
-        # Identificar a linha inicial da tabela
-        start_row = None
-        for i, row in df.iterrows():
-            if 'data' in row.astype(str).str.lower().tolist():
-                start_row = i
-                break
-
-        # Se não encontrar a linha inicial, exibir mensagem de erro
-        if start_row is None:
-            flash('Não foi possível identificar a linha inicial da tabela.', 'error')
-            return
-
-        # Ler a planilha novamente, pulando as linhas iniciais
-        df = pd.read_excel(file_path, skiprows=start_row)
-
-        # Renomear as colunas para facilitar o acesso
-        df.columns = [str(col).strip().lower() for col in df.columns]
-
-        # Identificar o fim da tabela com base na consistência dos dados
-        df = df.dropna(how='all')  # Remove linhas completamente vazias
-        df = df.reset_index(drop=True)
-
-        # Filtrar colunas necessárias
-        required_columns = {'data', 'valor total', 'nº ped/ os/ prq', 'vendedor', 'cliente'}
-        missing_columns = required_columns - set(df.columns)
-        if missing_columns:
-            flash(f'A planilha está faltando as seguintes colunas: {", ".join(missing_columns)}', 'error')
-            return
-
-        # Converter e limpar dados
-        df['data'] = pd.to_datetime(df['data'], format='%d/%m/%Y', errors='coerce')
-        df['valor total'] = pd.to_numeric(df['valor total'], errors='coerce')
-        df['nº ped/ os/ prq'] = df['nº ped/ os/ prq'].astype(str)
-        df['vendedor'] = df['vendedor'].astype(str)
-        df['cliente'] = df['cliente'].astype(str)
-
-        # Remover linhas onde qualquer das colunas principais é NaN
-        df = df.dropna(subset=['data', 'valor total', 'nº ped/ os/ prq', 'vendedor', 'cliente'])
-
-        # Filtrar pedidos da Comagro
-        comagro_terms = ['comagro', 'comagro oficina', 'comagro peças e serviços']
-        df = df[~df['cliente'].str.lower().str.contains('|'.join(comagro_terms), na=False)]
-
-        # Iniciar a conexão com o banco de dados
-        conn = get_db_connection()
-        cursor = conn.cursor()
+            job_id = jobs.enqueue(file)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(job_id=job_id, status_url=url_for('sales.upload_status', job_id=job_id)), 202
+            return redirect(url_for('sales.upload', job_id=job_id))
 
-        # Marcar todas as vendas do mês atual como não processadas
-        current_year = datetime.now().year
-        current_month = datetime.now().month
-        cursor.execute('''
-            UPDATE Sales 
-            SET processed = 0 
-            WHERE strftime('%Y', date) = ? AND strftime('%m', date) = ?
-        ''', (current_year, current_month))
-
-        # Obter vendedores do banco de dados
-        cursor.execute('SELECT id, name FROM Users')
-        sellers = cursor.fetchall()
-        sellers_dict = {remove_accents(seller['name'].title()): seller['id'] for seller in sellers}
-
-        # Set para armazenar vendedores não cadastrados
-        non_registered_sellers = set()
-
-        # Inserir vendas na tabela Sales
-        for index, row in df.iterrows():
-            seller_name = remove_accents(row['vendedor'].title())
-            user_id = sellers_dict.get(seller_name, None)  # Pode ser None se o vendedor não estiver cadastrado
-
-            if user_id is None and seller_name not in non_registered_sellers:
-                non_registered_sellers.add(seller_name)
-                flash(f'Vendedor {row["vendedor"].title()} não cadastrado.', 'warning')
-
-            order_number = row['nº ped/ os/ prq']
-            sale_amount = row['valor total']
-
-            # Verifica se o pedido já existe no banco de dados
-            cursor.execute('SELECT id, amount FROM Sales WHERE order_number = ?', (order_number,))
-            existing_order = cursor.fetchone()
-
-            if existing_order:
-                # Se o pedido existe, atualiza o valor do pedido
-                new_amount = existing_order['amount'] + sale_amount
-                if new_amount <= 0:
-                    cursor.execute('DELETE FROM Sales WHERE id = ?', (existing_order['id'],))
-                else:
-                    cursor.execute('UPDATE Sales SET amount = ?, processed = 1 WHERE id = ?',
-                                   (new_amount, existing_order['id']))
-            else:
-                # Insere a venda no banco de dados
-                cursor.execute('''
-                    INSERT INTO Sales (date, amount, user_id, order_number, processed)
-                    VALUES (?, ?, ?, ?, 1)
-                ''', (row['data'].strftime('%Y-%m-%d'), sale_amount, user_id, order_number))
-
-        # Apagar vendas do mês atual que não foram processadas (consideradas devoluções totais)
-        cursor.execute('''
-            DELETE FROM Sales 
-            WHERE processed = 0 
-            AND strftime('%Y', date) = ? AND strftime('%m', date) = ?
-        ''', (current_year, current_month))
+    return render_template('upload.html', job_id=request.args.get('job_id', type=int))
 
-        conn.commit()
-        conn.close()
 
-        flash('Planilha processada com sucesso!', 'success')
-    except Exception as e:
-        flash(f'Ocorreu um erro ao processar o arquivo: {e}, {e.__class__}', 'error')
+# Rota para acompanhar o andamento de uma importação
+
+
+@sales_bp.route('/upload/status/<int:job_id>')
+def upload_status(job_id):
+    if 'user_id' not in session or session['role'] != 'master':
+        return jsonify(error='Acesso negado.'), 403
+
+    job = jobs.get_job(get_db().cursor(), job_id)
+    if job is None:
+        return jsonify(error='Importação não encontrada.'), 404
+    return jsonify(job)
 
 
 # Rota para deletar vendas
@@ -173,11 +62,12 @@ def delete_sale(sale_id):
     if 'user_id' not in session or session['role'] != 'master':
         return redirect(url_for('users.login'))
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
+    periods = sale_periods(cursor, 'id = ?', (sale_id,))
     cursor.execute('DELETE FROM Sales WHERE id = ?', (sale_id,))
+    refresh_monthly_summary(cursor, periods)
     conn.commit()
-    conn.close()
 
     flash('Venda deletada com sucesso!', 'success')
     return redirect(request.referrer)
@@ -188,11 +78,133 @@ def delete_all_sales(seller_id):
     if 'user_id' not in session or session['role'] != 'master':
         return redirect(url_for('users.login'))
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
+    periods = sale_periods(cursor, 'user_id = ?', (seller_id,))
     cursor.execute('DELETE FROM Sales WHERE user_id = ?', (seller_id,))
+    refresh_monthly_summary(cursor, periods)
     conn.commit()
-    conn.close()
 
     flash('Todas as vendas foram deletadas com sucesso!', 'success')
     return redirect(request.referrer)
+
+
+# Rotas para as regras de exclusão de clientes internos
+
+
+@sales_bp.route('/exclusion_rules', methods=['GET', 'POST'])
+def exclusion_rules():
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+
+    if request.method == 'POST':
+        term = normalize_client(request.form['term'])
+        if not term:
+            flash('Informe um trecho do nome do cliente.', 'error')
+            return redirect(request.url)
+
+        cursor.execute('''
+            INSERT INTO ExclusionRules (term) VALUES (?)
+            ON CONFLICT(term) DO UPDATE SET active = 1
+        ''', (term,))
+        conn.commit()
+
+        flash(f'Regra "{term}" cadastrada com sucesso!', 'success')
+        return redirect(url_for('sales.exclusion_rules'))
+
+    cursor.execute('SELECT id, term, active FROM ExclusionRules ORDER BY id')
+    rules = cursor.fetchall()
+
+    return render_template('exclusion_rules.html', rules=rules)
+
+
+@sales_bp.route('/exclusion_rules/<int:rule_id>/status', methods=['POST'])
+def update_exclusion_rule(rule_id):
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('UPDATE ExclusionRules SET active = ? WHERE id = ?', (int(request.form['active']), rule_id))
+    conn.commit()
+
+    flash('Regra atualizada com sucesso!', 'success')
+    return redirect(url_for('sales.exclusion_rules'))
+
+
+@sales_bp.route('/exclusion_rules/<int:rule_id>/delete', methods=['POST'])
+def delete_exclusion_rule(rule_id):
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM ExclusionRules WHERE id = ?', (rule_id,))
+    conn.commit()
+
+    flash('Regra removida com sucesso!', 'success')
+    return redirect(url_for('sales.exclusion_rules'))
+
+
+# Comando para reconstruir o resumo mensal (flask --app comisys sales rebuild-summary)
+
+
+@sales_bp.cli.command('rebuild-summary')
+def rebuild_summary_command():
+    conn = get_db()
+    cursor = conn.cursor()
+    rebuild_monthly_summary(cursor)
+    conn.commit()
+    print('Resumo mensal reconstruído.')
+
+
+# Comandos do registro de importações (flask --app comisys sales imports|rollback-import|replay-import)
+
+
+@sales_bp.cli.command('imports')
+@click.option('--limit', default=20, show_default=True, help='Quantidade de importações listadas.')
+def imports_command(limit):
+    """Lista as últimas importações, com as contagens e o tempo de cada etapa."""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, file_name, year, month, rows_parsed, inserted, updated, deleted, unchanged,
+               parse_seconds, resolve_seconds, stage_seconds, merge_seconds, rolled_back_at, created_at
+        FROM Imports ORDER BY id DESC LIMIT ?
+    ''', (limit,))
+
+    print('id;arquivo;mes;linhas;novos;alterados;removidos;iguais;leitura_s;vendedores_s;gravacao_s;aplicacao_s;desfeita;data')
+    for row in cursor.fetchall():
+        timings = ';'.join(f'{value:.3f}' if value is not None else ''
+                           for value in (row['parse_seconds'], row['resolve_seconds'], row['stage_seconds'],
+                                         row['merge_seconds']))
+        print(f"{row['id']};{row['file_name']};{row['year']:04d}-{row['month']:02d};{row['rows_parsed']};"
+              f"{row['inserted']};{row['updated']};{row['deleted']};{row['unchanged']};{timings};"
+              f"{row['rolled_back_at'] or ''};{row['created_at']}")
+
+
+def history_command(name, apply, done, help):
+    @sales_bp.cli.command(name, help=help)
+    @click.argument('import_id', type=int)
+    @click.option('--force', is_flag=True, help='Sobrescreve vendas alteradas depois da importação.')
+    def command(import_id, force):
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            conn.storage.begin_write(cursor)
+            periods = apply(cursor, import_id, force)
+            refresh_monthly_summary(cursor, periods)
+            conn.commit()
+        except ValueError as e:
+            conn.rollback()
+            raise click.ClickException(str(e))
+        print(f'Importação {import_id} {done}.')
+
+
+history_command('rollback-import', rollback_import, 'desfeita',
+                'Desfaz as alterações gravadas por uma importação (a ativa mais recente).')
+history_command('replay-import', replay_import, 'aplicada novamente',
+                'Aplica de novo as alterações de uma importação desfeita.')
@@ -0,0 +1,64 @@
+from functools import lru_cache
+from utils.text_utils import remove_accents
+import numpy as np
+import pandas as pd
+import re
+
+# Regras de exclusão de clientes internos (ex.: pedidos da própria Comagro).
+# Os termos ficam em ExclusionRules, editáveis pelos masters. As regras ativas
+# são compiladas uma vez em uma única expressão regular, e cada bloco da
+# planilha só testa os nomes de clientes distintos; as linhas recebem o
+# resultado pelo código do cliente (pd.factorize).
+
+
+def normalize_client(name):
+    return remove_accents(' '.join(str(name).split())).lower()
+
+
+@lru_cache(maxsize=32)
+def compile_rules(terms):
+    """Compila os termos em uma expressão com um grupo por regra, na ordem informada."""
+    if not terms:
+        return None
+    return re.compile('|'.join(f'({re.escape(term)})' for term in terms))
+
+
+class ExclusionRules:
+    def __init__(self, cursor):
+        cursor.execute('SELECT id, term FROM ExclusionRules WHERE active = 1 ORDER BY id')
+        self.rules = [(row['id'], row['term']) for row in cursor.fetchall()]
+        self.pattern = compile_rules(tuple(term for _, term in self.rules))
+        # Linhas e valor excluídos por regra, acumulados entre os blocos
+        self.rows = [0] * len(self.rules)
+        self.revenue = [0.0] * len(self.rules)
+
+    def match(self, client_name):
+        """Retorna o índice da primeira regra que casa com o cliente, ou -1."""
+        if self.pattern is None:
+            return -1
+        found = self.pattern.search(normalize_client(client_name))
+        return found.lastindex - 1 if found else -1
+
+    def apply(self, df):
+        """Remove do bloco as linhas de clientes excluídos e acumula as estatísticas."""
+        if self.pattern is None or df.empty:
+            return df
+
+        codes, clients = pd.factorize(df['cliente'])
+        client_rules = [self.match(client) for client in clients]
+        row_rules = np.array(client_rules)[codes]
+
+        excluded = row_rules >= 0
+        if excluded.any():
+            amounts = df['valor total'].to_numpy()
+            for rule_index in set(row_rules[excluded]):
+                rule_rows = row_rules == rule_index
+                self.rows[rule_index] += int(rule_rows.sum())
+                self.revenue[rule_index] += float(amounts[rule_rows].sum())
+
+        return df[~excluded]
+
+    def report(self):
+        """Linhas e valor excluídos por cada regra ativa na importação."""
+        return [{'rule_id': rule_id, 'term': term, 'rows': rows, 'revenue': round(revenue, 2)}
+                for (rule_id, term), rows, revenue in zip(self.rules, self.rows, self.revenue)]
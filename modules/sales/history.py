@@ -0,0 +1,193 @@
+from ..db import timestamp, month_range
+from .reconcile import register_functions
+import hashlib
+
+# Registro das importações aplicadas (Imports) e das diferenças que cada uma
+# gravou em Sales (ImportChanges), com os valores antes e depois de cada pedido.
+#
+# Com os dois lados guardados, uma importação pode ser desfeita (rollback) e
+# aplicada de novo (replay) sem o arquivo original, como uma pilha: só a
+# importação ativa mais recente pode ser desfeita, e só a desfeita mais
+# recente pode ser refeita. Assim a última importação ativa de um mês sempre
+# corresponde ao estado das vendas, e reenviar o mesmo arquivo (mesmo
+# file_hash) não precisa ser processado de novo, se as vendas do mês não
+# foram alteradas depois dele (ver find_duplicate).
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_hash(file_path):
+    """SHA-256 do arquivo enviado, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def month_fingerprint(cursor, year, month):
+    """Quantidade de vendas do mês e soma dos content_hash (reduzidos, para a soma não estourar)."""
+    start_date, end_date = month_range(year, month)
+    cursor.execute('''
+        SELECT COUNT(*), CAST(COALESCE(SUM(content_hash % 1000000007), 0) AS BIGINT)
+        FROM Sales WHERE date >= ? AND date < ?
+    ''', (start_date, end_date))
+    return tuple(cursor.fetchone())
+
+
+def find_duplicate(cursor, file_hash):
+    """Retorna a última importação ativa do mesmo arquivo se nada mudou no seu mês desde então, ou None.
+
+    A importação precisa ser a ativa mais recente do mês, e as vendas do mês
+    precisam estar como ela deixou (mesma quantidade e soma dos content_hash):
+    se Sales foi alterada depois, o arquivo é processado de novo.
+    """
+    cursor.execute('''
+        SELECT id, year, month, sales_count, sales_checksum FROM Imports
+        WHERE file_hash = ? AND rolled_back_at IS NULL
+        ORDER BY id DESC LIMIT 1
+    ''', (file_hash,))
+    row = cursor.fetchone()
+    if row is None or row['sales_count'] is None:
+        return None
+    cursor.execute('SELECT MAX(id) FROM Imports WHERE year = ? AND month = ? AND rolled_back_at IS NULL',
+                   (row['year'], row['month']))
+    if cursor.fetchone()[0] != row['id']:
+        return None
+    if month_fingerprint(cursor, row['year'], row['month']) != (row['sales_count'], row['sales_checksum']):
+        return None
+    return row
+
+
+def record_import(cursor, file_name, year, month, result, changes, file_hash=None):
+    """Registra a importação e copia as diferenças de ImportDiff; retorna o id do registro."""
+    cursor.execute('''
+        INSERT INTO Imports (file_name, year, month, rows_parsed, orders, inserted, updated, deleted, unchanged,
+                             file_hash, parse_seconds, resolve_seconds, stage_seconds, merge_seconds,
+                             sales_count, sales_checksum, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        RETURNING id
+    ''', (file_name, year, month, result.rows_parsed, result.rows_merged, changes.inserted, changes.updated,
+          changes.deleted, changes.unchanged, file_hash, result.timings.get('parse'),
+          result.timings.get('resolve'), result.timings.get('stage'), result.timings.get('merge'),
+          *month_fingerprint(cursor, year, month), timestamp()))
+    import_id = cursor.fetchone()[0]
+
+    cursor.execute('''
+        INSERT INTO ImportChanges (import_id, order_number, change, old_date, old_amount, old_user_id,
+                                   new_date, new_amount, new_user_id)
+        SELECT ?, order_number, change, old_date, old_amount, old_user_id, new_date, new_amount, new_user_id
+        FROM ImportDiff
+    ''', (import_id,))
+    cursor.execute('DROP TABLE ImportDiff')
+    return import_id
+
+
+def get_import(cursor, import_id):
+    cursor.execute('SELECT * FROM Imports WHERE id = ?', (import_id,))
+    return cursor.fetchone()
+
+
+def rollback_import(cursor, import_id, force=False):
+    """Desfaz as diferenças gravadas pela importação; retorna os períodos alterados.
+
+    Só a importação ativa mais recente pode ser desfeita. Se alguma venda
+    tocada por ela foi alterada depois (ex.: removida à mão), a operação é
+    recusada, a menos que `force` seja usado. O commit fica a cargo de quem chama.
+    """
+    record = get_import(cursor, import_id)
+    if record is None:
+        raise ValueError(f'Importação {import_id} não encontrada.')
+    if record['rolled_back_at'] is not None:
+        raise ValueError(f'Importação {import_id} já foi desfeita.')
+    cursor.execute('SELECT MAX(id) FROM Imports WHERE rolled_back_at IS NULL')
+    if cursor.fetchone()[0] != import_id:
+        raise ValueError(f'Importação {import_id} não é a mais recente; desfaça as posteriores antes.')
+
+    # As vendas devem estar como a importação deixou
+    _check_state(cursor, import_id, 'new', force)
+
+    register_functions(cursor.connection)
+    cursor.execute('''
+        DELETE FROM Sales
+        WHERE order_number IN (SELECT order_number FROM ImportChanges WHERE import_id = ? AND change = 'insert')
+    ''', (import_id,))
+    _restore(cursor, import_id, 'old', ('update', 'delete'))
+    cursor.execute('UPDATE Imports SET rolled_back_at = ? WHERE id = ?', (timestamp(), import_id))
+    return change_periods(cursor, import_id)
+
+
+def replay_import(cursor, import_id, force=False):
+    """Aplica de novo as diferenças de uma importação desfeita; retorna os períodos alterados.
+
+    Só a importação desfeita mais recente, sem importações ativas depois dela,
+    pode ser refeita. Os valores gravados são os registrados em ImportChanges,
+    então repetir o comando não duplica valores.
+    """
+    record = get_import(cursor, import_id)
+    if record is None:
+        raise ValueError(f'Importação {import_id} não encontrada.')
+    if record['rolled_back_at'] is None:
+        raise ValueError(f'Importação {import_id} está ativa; desfaça-a antes de aplicar de novo.')
+    cursor.execute('SELECT 1 FROM Imports WHERE id > ? AND rolled_back_at IS NULL', (import_id,))
+    if cursor.fetchone() is not None:
+        raise ValueError(f'Há importações ativas posteriores à {import_id}; desfaça-as antes.')
+
+    # As vendas devem estar como antes da importação
+    _check_state(cursor, import_id, 'old', force)
+
+    register_functions(cursor.connection)
+    cursor.execute('''
+        DELETE FROM Sales
+        WHERE order_number IN (SELECT order_number FROM ImportChanges WHERE import_id = ? AND change = 'delete')
+    ''', (import_id,))
+    _restore(cursor, import_id, 'new', ('insert', 'update'))
+    cursor.execute('UPDATE Imports SET rolled_back_at = NULL WHERE id = ?', (import_id,))
+    return change_periods(cursor, import_id)
+
+
+def _check_state(cursor, import_id, side, force):
+    """Confere se as vendas tocadas pela importação estão com os valores `side` ('old' ou 'new')."""
+    # Do lado 'new', os pedidos apagados não devem existir; do lado 'old', os inseridos
+    missing = 'delete' if side == 'new' else 'insert'
+    distinct = cursor.connection.storage.distinct_from
+    cursor.execute(f'''
+        SELECT COUNT(*) FROM ImportChanges c
+        LEFT JOIN Sales s ON s.order_number = c.order_number
+        WHERE c.import_id = ?
+        AND CASE WHEN c.change = ? THEN s.id IS NOT NULL
+                 ELSE s.id IS NULL OR s.date {distinct} c.{side}_date
+                      OR round(CAST(s.amount AS NUMERIC), 2) {distinct} round(CAST(c.{side}_amount AS NUMERIC), 2)
+                      OR s.user_id {distinct} c.{side}_user_id
+            END
+    ''', (import_id, missing))
+    divergent = cursor.fetchone()[0]
+    if divergent and not force:
+        raise ValueError(f'{divergent} vendas foram alteradas depois da importação {import_id}; '
+                         'use --force para sobrescrevê-las.')
+
+
+def _restore(cursor, import_id, side, changes):
+    """Grava em Sales os valores `side` ('old' ou 'new') dos pedidos com os tipos de mudança informados."""
+    placeholders = ', '.join('?' * len(changes))
+    cursor.execute(f'''
+        INSERT INTO Sales (date, amount, user_id, order_number, content_hash)
+        SELECT {side}_date, {side}_amount, {side}_user_id, order_number,
+               content_hash({side}_date, {side}_amount, {side}_user_id)
+        FROM ImportChanges
+        WHERE import_id = ? AND change IN ({placeholders})
+        ON CONFLICT(order_number) DO UPDATE SET date = excluded.date, amount = excluded.amount,
+                                                user_id = excluded.user_id, content_hash = excluded.content_hash
+    ''', (import_id, *changes))
+
+
+def change_periods(cursor, import_id):
+    """Meses (ano, mês) das datas antigas e novas dos pedidos alterados pela importação."""
+    cursor.execute('''
+        SELECT CAST(substr(old_date, 1, 4) AS INTEGER) AS year, CAST(substr(old_date, 6, 2) AS INTEGER) AS month
+        FROM ImportChanges WHERE import_id = ? AND old_date IS NOT NULL
+        UNION
+        SELECT CAST(substr(new_date, 1, 4) AS INTEGER), CAST(substr(new_date, 6, 2) AS INTEGER)
+        FROM ImportChanges WHERE import_id = ? AND new_date IS NOT NULL
+    ''', (import_id, import_id))
+    return {(row['year'], row['month']) for row in cursor.fetchall()}
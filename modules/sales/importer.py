@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from ..summary import refresh_monthly_summary
+from ..metrics import observe_import
+from .parser import iter_chunks
+from .exclusions import ExclusionRules
+from .sellers import SellerResolver
+from .reconcile import (group_orders, create_staging, stage_orders, fingerprint_staging, staged_period,
+                        merge_staging)
+from .history import record_import, file_hash as compute_file_hash, find_duplicate
+import time
+
+# Leitura da planilha de vendas e aplicação no banco. Não depende de uma
+# requisição (não usa flash), para poder rodar em segundo plano: avisos e
+# contagens são devolvidos em um ImportResult, junto com o tempo gasto em cada
+# etapa (leitura, identificação dos vendedores e aplicação no banco).
+
+
+@dataclass
+class ImportResult:
+    rows_parsed: int = 0
+    rows_merged: int = 0
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    year: int = None  # Mês das vendas da planilha
+    month: int = None
+    import_id: int = None
+    duplicate_of: int = None
+    warnings: list = field(default_factory=list)
+    exclusions: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+
+    def summary(self):
+        if self.duplicate_of is not None:
+            return f'Arquivo idêntico à importação {self.duplicate_of}; nenhuma venda foi alterada.'
+        return (f'{self.inserted} pedidos novos, {self.updated} alterados, {self.deleted} removidos '
+                f'e {self.unchanged} sem alteração.')
+
+    def add_time(self, stage, started):
+        self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def process_file(conn, file_path, file_name=None, on_progress=None, before_commit=None):
+    """Importa a planilha de vendas, aplicando os pedidos em uma única transação.
+
+    `on_progress(result)` é chamado a cada bloco lido, antes de abrir a
+    transação; `before_commit(cursor, result)` roda dentro da transação, logo
+    antes do commit, e pode levantar uma exceção para desfazer a importação.
+
+    O mês da importação é o das datas da planilha, que deve ter vendas de um
+    único mês. Se o arquivo é idêntico ao da última importação ativa do seu
+    mês e as vendas do mês não mudaram desde então, a planilha não é lida de
+    novo: só `before_commit` roda, com `result.duplicate_of` preenchido.
+    """
+    result = ImportResult()
+    cursor = conn.cursor()
+    try:
+        digest = compute_file_hash(file_path)
+        if conn.in_transaction:
+            conn.commit()
+        conn.storage.begin_write(cursor)
+        duplicate = find_duplicate(cursor, digest)
+        if duplicate is not None:
+            result.duplicate_of = result.import_id = duplicate['id']
+            result.year, result.month = duplicate['year'], duplicate['month']
+            if before_commit:
+                before_commit(cursor, result)
+            conn.commit()
+            return result
+        conn.rollback()
+
+        # Índice de vendedores (nomes e apelidos cadastrados)
+        sellers = SellerResolver(cursor)
+        # Regras de clientes internos, compiladas uma vez para toda a planilha
+        exclusions = ExclusionRules(cursor)
+
+        # Ler a planilha em blocos, agrupando os pedidos na tabela temporária.
+        # O tempo de leitura inclui a espera pelo próximo bloco do arquivo
+        create_staging(cursor)
+        started = time.perf_counter()
+        for chunk in iter_chunks(file_path):
+            chunk = exclusions.apply(chunk)
+            result.rows_parsed += len(chunk)
+            result.add_time('parse', started)
+
+            started = time.perf_counter()
+            chunk = chunk.assign(user_id=sellers.resolve(chunk['vendedor']))
+            result.add_time('resolve', started)
+
+            started = time.perf_counter()
+            stage_orders(cursor, group_orders(chunk))
+            result.add_time('stage', started)
+            if on_progress:
+                on_progress(result)
+            started = time.perf_counter()
+        result.add_time('parse', started)
+
+        # Vendedores não cadastrados são avisados uma única vez, em lista
+        result.warnings.extend(sellers.warnings())
+        result.exclusions = exclusions.report()
+        started = time.perf_counter()
+        fingerprint_staging(cursor)
+        result.year, result.month = staged_period(cursor)
+        result.add_time('stage', started)
+
+        # A tabela temporária não bloqueia o banco; o bloqueio de escrita só
+        # é obtido agora, para aplicar os pedidos em uma única transação
+        conn.commit()
+        started = time.perf_counter()
+        conn.storage.begin_write(cursor)
+
+        cursor.execute('SELECT COUNT(*) FROM ImportStaging')
+        result.rows_merged = cursor.fetchone()[0]
+        changes = merge_staging(cursor, result.year, result.month)
+        refresh_monthly_summary(cursor, changes.periods)
+        result.add_time('merge', started)
+
+        result.inserted, result.updated = changes.inserted, changes.updated
+        result.deleted, result.unchanged = changes.deleted, changes.unchanged
+        result.import_id = record_import(cursor, file_name or file_path, result.year, result.month, result, changes,
+                                         file_hash=digest)
+
+        if before_commit:
+            before_commit(cursor, result)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    observe_import(result.timings)
+    return result
@@ -0,0 +1,171 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from ..db import get_db, get_db_connection, timestamp
+from .importer import process_file
+from threading import Thread
+import json
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger('comisys.jobs')
+
+# Importações de planilhas em segundo plano.
+# Cada upload vira uma linha em ImportJobs e é processado por um pool de
+# threads local. A aplicação das vendas e a marcação do job como concluído
+# acontecem na mesma transação, então um job interrompido (ex.: reinício do
+# servidor) pode ser executado de novo sem duplicar valores.
+#
+# Com várias instâncias no mesmo banco PostgreSQL, UPLOAD_FOLDER precisa ser um
+# diretório compartilhado entre elas: o job pode ser retomado por outra
+# instância, e a trava de escrita e a conferência do status dentro da
+# transação impedem que o mesmo job seja aplicado duas vezes.
+#
+# Um job em andamento ('running') renova updated_at a cada bloco lido da
+# planilha. Outra instância (ou esta, depois de reiniciar) só o retoma quando
+# ele fica mais de IMPORT_LEASE_SECONDS sem renovar, ou seja, quando quem o
+# processava parou; os jobs na fila ('queued') podem ser retomados a qualquer
+# momento. Uma thread confere os jobs parados a cada meio prazo.
+
+PENDING_STATUSES = ('queued', 'running')
+# Jobs que podem ser reservados; o parâmetro é o horário em que o prazo vence
+RESUMABLE = "(status = 'queued' OR (status = 'running' AND updated_at < ?))"
+
+
+def init_app(app):
+    app.config.setdefault('UPLOAD_FOLDER', os.path.join(app.instance_path, 'uploads'))
+    app.config.setdefault('IMPORT_WORKERS', 1)
+    app.config.setdefault('IMPORT_LEASE_SECONDS', float(os.environ.get('COMISYS_IMPORT_LEASE_SECONDS', 600)))
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    app.extensions['import_executor'] = ThreadPoolExecutor(max_workers=app.config['IMPORT_WORKERS'],
+                                                           thread_name_prefix='import')
+    # Jobs enviados ao pool desta instância e ainda não terminados
+    app.extensions['import_jobs'] = set()
+    resume_pending_jobs(app)
+    Thread(target=_resume_loop, args=(app,), name='import-lease', daemon=True).start()
+
+
+def _resume_loop(app):
+    while True:
+        time.sleep(app.config['IMPORT_LEASE_SECONDS'] / 2)
+        try:
+            resume_pending_jobs(app)
+        except Exception:
+            logger.exception('Falha ao retomar as importações pendentes.')
+
+
+def resume_pending_jobs(app):
+    """Envia para o pool os jobs na fila e os em andamento cujo prazo (IMPORT_LEASE_SECONDS) venceu."""
+    conn = get_db_connection(app.config['DATABASE'])
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT id FROM ImportJobs WHERE {RESUMABLE} ORDER BY id',
+                   (timestamp(app.config['IMPORT_LEASE_SECONDS']),))
+    job_ids = [row['id'] for row in cursor.fetchall()]
+    conn.close()
+
+    for job_id in job_ids:
+        if job_id not in app.extensions['import_jobs']:
+            submit(app, job_id)
+
+
+def enqueue(file):
+    """Salva o arquivo enviado, registra o job e o envia para processamento."""
+    extension = os.path.splitext(file.filename)[1].lower() or '.xlsx'
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], uuid.uuid4().hex + extension)
+    file.save(file_path)
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO ImportJobs (file_name, file_path, status, created_at, updated_at)
+        VALUES (?, ?, 'queued', ?, ?)
+        RETURNING id
+    ''', (file.filename, file_path, timestamp(), timestamp()))
+    job_id = cursor.fetchone()[0]
+    conn.commit()
+
+    submit(current_app._get_current_object(), job_id)
+    return job_id
+
+
+def submit(app, job_id):
+    submitted = app.extensions['import_jobs']
+    submitted.add(job_id)
+    future = app.extensions['import_executor'].submit(run_job, app.config['DATABASE'], job_id,
+                                                      app.config['IMPORT_LEASE_SECONDS'])
+    future.add_done_callback(lambda _: submitted.discard(job_id))
+
+
+def run_job(database, job_id, lease_seconds):
+    conn = get_db_connection(database)
+    cursor = conn.cursor()
+    try:
+        # Reservar o job; se outro processo já o concluiu ou ainda o processa, não há nada a fazer
+        cursor.execute(f'''
+            UPDATE ImportJobs SET status = 'running', updated_at = ?
+            WHERE id = ? AND {RESUMABLE}
+        ''', (timestamp(), job_id, timestamp(lease_seconds)))
+        claimed = cursor.rowcount
+        conn.commit()
+        if not claimed:
+            return
+
+        cursor.execute('SELECT file_name, file_path FROM ImportJobs WHERE id = ?', (job_id,))
+        job = cursor.fetchone()
+        file_name, file_path = job['file_name'], job['file_path']
+
+        def on_progress(result):
+            cursor.execute('''
+                UPDATE ImportJobs SET rows_parsed = ?, updated_at = ?
+                WHERE id = ?
+            ''', (result.rows_parsed, timestamp(), job_id))
+            conn.commit()
+
+        def before_commit(cursor, result):
+            # Conferir dentro da transação que ninguém aplicou este job antes
+            cursor.execute('SELECT status FROM ImportJobs WHERE id = ?', (job_id,))
+            if cursor.fetchone()['status'] != 'running':
+                raise RuntimeError(f'Importação {job_id} já foi processada.')
+            if result.duplicate_of is not None:
+                message = f'Planilha já importada. {result.summary()}'
+            else:
+                message = f'Planilha processada com sucesso! {result.summary()}'
+            cursor.execute('''
+                UPDATE ImportJobs
+                SET status = 'done', rows_merged = ?, warnings = ?, exclusions = ?, result = ?, import_id = ?,
+                    updated_at = ?
+                WHERE id = ?
+            ''', (result.rows_merged, json.dumps(result.warnings, ensure_ascii=False),
+                  json.dumps(result.exclusions, ensure_ascii=False),
+                  message, result.import_id, timestamp(), job_id))
+
+        process_file(conn, file_path, file_name=file_name, on_progress=on_progress, before_commit=before_commit)
+    except Exception as e:
+        cursor.execute('''
+            UPDATE ImportJobs SET status = 'error', result = ?, updated_at = ?
+            WHERE id = ? AND status = 'running'
+        ''', (f'Erro ao processar a planilha: {e}', timestamp(), job_id))
+        conn.commit()
+    finally:
+        cursor.execute('SELECT status, file_path FROM ImportJobs WHERE id = ?', (job_id,))
+        job = cursor.fetchone()
+        if job and job['status'] not in PENDING_STATUSES and os.path.exists(job['file_path']):
+            os.remove(job['file_path'])
+        conn.close()
+
+
+def get_job(cursor, job_id):
+    """Retorna o estado de um job como dicionário, ou None se não existir."""
+    cursor.execute('''
+        SELECT id, file_name, status, rows_parsed, rows_merged, warnings, exclusions, result, import_id,
+               created_at, updated_at
+        FROM ImportJobs WHERE id = ?
+    ''', (job_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job['warnings'] = json.loads(job['warnings']) if job['warnings'] else []
+    job['exclusions'] = json.loads(job['exclusions']) if job['exclusions'] else []
+    return job
@@ -0,0 +1,145 @@
+import codecs
+import csv
+import datetime
+import os
+import pandas as pd
+from openpyxl import load_workbook
+
+# Leitura em fluxo das planilhas de vendas (.xlsx do ERP ou exportação .csv).
+# O arquivo é aberto uma única vez, a linha de cabeçalho é encontrada durante
+# a leitura e as linhas são devolvidas em blocos de DataFrames já tipados,
+# para que a memória usada não dependa do tamanho da planilha.
+
+REQUIRED_COLUMNS = ('data', 'valor total', 'nº ped/ os/ prq', 'vendedor', 'cliente')
+CHUNK_SIZE = 10000
+
+
+class SpreadsheetError(Exception):
+    """A planilha não está no formato esperado."""
+
+
+def iter_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """Gera DataFrames com as colunas de REQUIRED_COLUMNS já convertidas.
+
+    'data' vira datetime, 'valor total' vira número e as demais viram texto;
+    linhas sem data ou valor válidos são descartadas. O índice dos DataFrames
+    é o número da linha na planilha.
+    """
+    rows = enumerate(_iter_rows(file_path), start=1)
+
+    # Identificar a linha inicial da tabela
+    for _, row in rows:
+        header = [_header_name(cell) for cell in row]
+        if 'data' in header:
+            break
+    else:
+        raise SpreadsheetError('Não foi possível identificar a linha inicial da tabela.')
+
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing_columns:
+        raise SpreadsheetError(f'A planilha está faltando as seguintes colunas: {", ".join(missing_columns)}')
+    indexes = [header.index(column) for column in REQUIRED_COLUMNS]
+
+    chunk, line_numbers = [], []
+    for line_number, row in rows:
+        values = [row[i] if i < len(row) else None for i in indexes]
+        if all(_is_empty(value) for value in values):
+            continue  # Linhas vazias (fim da tabela, totais, etc.)
+        chunk.append(values)
+        line_numbers.append(line_number)
+        if len(chunk) >= chunk_size:
+            yield _to_frame(chunk, line_numbers)
+            chunk, line_numbers = [], []
+    if chunk:
+        yield _to_frame(chunk, line_numbers)
+
+
+def _iter_rows(file_path):
+    if os.path.splitext(file_path)[1].lower() == '.csv':
+        yield from _iter_csv_rows(file_path)
+    else:
+        yield from _iter_xlsx_rows(file_path)
+
+
+def _iter_xlsx_rows(file_path):
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_csv_rows(file_path):
+    with open(file_path, 'rb') as raw_file:
+        sample = raw_file.read(65536)
+    encoding = 'utf-8-sig' if _is_utf8(sample) else 'cp1252'
+    delimiter = _guess_delimiter(sample.decode(encoding, errors='ignore'))
+
+    with open(file_path, newline='', encoding=encoding) as csv_file:
+        yield from csv.reader(csv_file, delimiter=delimiter)
+
+
+def _guess_delimiter(text_sample):
+    # O delimitador é o separador mais frequente na linha do cabeçalho; as
+    # linhas de título do relatório, antes dele, costumam não ter nenhum
+    for line in text_sample.splitlines():
+        if 'data' in line.lower():
+            return max(';,\t', key=line.count)
+    return ';'
+
+
+def _is_utf8(sample):
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _header_name(cell):
+    return str(cell).strip().lower() if cell is not None else ''
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _to_frame(chunk, line_numbers):
+    df = pd.DataFrame(chunk, columns=list(REQUIRED_COLUMNS), index=line_numbers, dtype=object)
+
+    # Converter e limpar dados
+    df['data'] = _to_datetime(df['data'])
+    df['valor total'] = _to_number(df['valor total'])
+    for column in ('nº ped/ os/ prq', 'vendedor', 'cliente'):
+        # Células vazias viram 'nan', como na leitura anterior via pandas
+        df[column] = df[column].map(_to_text)
+
+    return df.dropna(subset=['data', 'valor total'])
+
+
+def _to_datetime(series):
+    # Células de data do Excel já chegam como datetime; textos seguem dd/mm/aaaa
+    is_date = series.map(lambda value: isinstance(value, (datetime.date, datetime.datetime)))
+    dates = pd.to_datetime(series.where(~is_date).astype(str).str.strip(), format='%d/%m/%Y', errors='coerce')
+    if is_date.any():
+        dates[is_date] = pd.to_datetime(list(series[is_date]))
+    return dates
+
+
+def _to_number(series):
+    # Valores em texto podem vir no formato brasileiro (1.234,56)
+    text = series.map(lambda value: isinstance(value, str))
+    if text.any():
+        series = series.copy()
+        brazilian = text & series.astype(str).str.contains(',', regex=False)
+        series[brazilian] = (series[brazilian].str.replace('.', '', regex=False)
+                             .str.replace(',', '.', regex=False))
+    return pd.to_numeric(series, errors='coerce')
+
+
+def _to_text(value):
+    if _is_empty(value):
+        return 'nan'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Números de pedido lidos como 132142.0
+    return str(value).strip() if isinstance(value, str) else str(value)
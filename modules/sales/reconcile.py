@@ -0,0 +1,231 @@
+from dataclasses import dataclass, field
+from ..db import month_range
+import hashlib
+import sqlite3
+
+# Conciliação das vendas da planilha com a tabela Sales.
+# Em vez de um SELECT/UPDATE/INSERT por linha, os pedidos são agrupados com
+# pandas, gravados numa tabela temporária (executemany no SQLite, COPY no
+# PostgreSQL) e aplicados com poucos comandos SQL em uma única transação. Cada
+# venda guarda o content_hash do pedido aplicado por último, então uma nova
+# planilha do mês só escreve os pedidos que de fato mudaram.
+
+ORDER_COLUMN = 'nº ped/ os/ prq'
+
+
+def group_orders(df):
+    """Agrupa as linhas da planilha por número de pedido.
+
+    Espera a coluna 'user_id' já preenchida (ver SellerResolver). Retorna uma
+    lista de tuplas (order_number, date, amount, user_id), onde a data e o
+    vendedor vêm da primeira linha do pedido e o valor é a soma de todas as
+    linhas (devoluções entram como valores negativos).
+
+    Linhas sem número de pedido ('nan', ver parser._to_text) são vendas
+    distintas, como em unique_order_numbers: cada uma recebe a chave
+    'nan-aaaamm-<linha>', com o mês da venda e a linha da planilha (o índice
+    do DataFrame), que se repete a cada envio do mesmo arquivo.
+    """
+    if df.empty:
+        return []
+
+    unnumbered = df[ORDER_COLUMN] == 'nan'
+    if unnumbered.any():
+        keys = 'nan-' + df['data'].dt.strftime('%Y%m') + '-' + df.index.astype(str)
+        df = df.assign(**{ORDER_COLUMN: df[ORDER_COLUMN].where(~unnumbered, keys)})
+
+    orders = df.drop_duplicates(ORDER_COLUMN).set_index(ORDER_COLUMN)
+    amounts = df.groupby(ORDER_COLUMN, sort=False)['valor total'].sum()
+
+    dates = orders['data'].dt.strftime('%Y-%m-%d')
+    user_ids = orders['user_id'].astype(object).where(orders['user_id'].notna(), None)
+
+    return [(order_number, date, float(amounts[order_number]), None if user_id is None else int(user_id))
+            for order_number, date, user_id in zip(orders.index, dates, user_ids)]
+
+
+def content_hash(date, amount, user_id):
+    """Impressão digital do conteúdo de um pedido (data, valor e vendedor), como inteiro de 64 bits."""
+    text = f'{date}|{round(amount, 2):.2f}|{"" if user_id is None else int(user_id)}'
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def register_functions(conn):
+    """Disponibiliza content_hash() nas consultas SQL da conexão.
+
+    No PostgreSQL a função faz parte do esquema (ver modules/migrations/postgresql.py)."""
+    if isinstance(conn, sqlite3.Connection):
+        conn.create_function('content_hash', 3, content_hash, deterministic=True)
+
+
+def create_staging(cursor):
+    """Cria (ou recria) a tabela temporária que recebe os pedidos da planilha."""
+    register_functions(cursor.connection)
+    cursor.execute('DROP TABLE IF EXISTS ImportStaging')
+    cursor.execute('''
+        CREATE TEMP TABLE ImportStaging (
+            order_number TEXT PRIMARY KEY,
+            date TEXT NOT NULL,
+            amount DOUBLE PRECISION NOT NULL,
+            user_id INTEGER,
+            content_hash BIGINT
+        )
+    ''')
+
+
+def stage_orders(cursor, orders):
+    """Grava um bloco de pedidos agrupados na tabela temporária.
+
+    Pedidos que se repetem entre blocos têm os valores somados; a data e o
+    vendedor continuam sendo os do primeiro bloco em que o pedido apareceu.
+    """
+    cursor.connection.storage.stage_orders(cursor, orders)
+
+
+def fingerprint_staging(cursor):
+    """Calcula o content_hash dos pedidos depois de lida a planilha inteira.
+
+    Só mexe na tabela temporária, então pode rodar antes de obter o bloqueio
+    de escrita do banco.
+    """
+    cursor.execute('UPDATE ImportStaging SET content_hash = content_hash(date, amount, user_id)')
+
+
+def staged_period(cursor):
+    """Mês (ano, mês) das vendas da planilha, que deve ter datas de um único mês."""
+    cursor.execute('SELECT MIN(date), MAX(date) FROM ImportStaging')
+    first, last = cursor.fetchone()
+    if first is None:
+        raise ValueError('A planilha não tem vendas.')
+    if first[:7] != last[:7]:
+        raise ValueError(f'A planilha tem vendas de mais de um mês ({first[:7]} a {last[:7]}); '
+                         'envie um arquivo por mês.')
+    return int(first[:4]), int(first[5:7])
+
+
+def apply_orders(cursor, orders, year, month):
+    """Grava os pedidos agrupados na tabela temporária e aplica em Sales."""
+    create_staging(cursor)
+    stage_orders(cursor, orders)
+    fingerprint_staging(cursor)
+    return merge_staging(cursor, year, month)
+
+
+@dataclass
+class Changes:
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    periods: set = field(default_factory=set)
+
+
+def merge_staging(cursor, year, month):
+    """Aplica em Sales só o que mudou desde a última planilha.
+
+    A planilha é a foto do mês: cada pedido fica com o valor somado das suas
+    linhas. Pedidos novos são inseridos; pedidos cujo content_hash mudou são
+    atualizados; pedidos com valor não positivo e vendas do mês informado que
+    não vieram na planilha (devoluções totais) são apagados. Os demais não são
+    tocados.
+
+    Só vendas do mês da planilha são alteradas. Um número de pedido que já
+    existe em Sales com data de outro mês é outra venda (como em
+    unique_order_numbers, na migração dos pedidos repetidos): o pedido da
+    planilha ganha o sufixo '-aaaamm' do mês, e a venda do outro mês fica
+    como está (uma devolução dela na planilha não a altera). As diferenças ficam na tabela temporária ImportDiff, para o
+    registro da importação, e o commit fica a cargo de quem chama.
+
+    Retorna as contagens e os períodos (ano, mês) alterados, para atualizar o
+    resumo mensal.
+    """
+    start_date, end_date = month_range(year, month)
+
+    # Pedidos da planilha com o número de uma venda de outro mês
+    cursor.execute('''
+        UPDATE ImportStaging SET order_number = order_number || ?
+        WHERE EXISTS (SELECT 1 FROM Sales s WHERE s.order_number = ImportStaging.order_number
+                      AND (s.date < ? OR s.date >= ?))
+    ''', (f'-{year:04d}{month:02d}', start_date, end_date))
+
+    cursor.execute('DROP TABLE IF EXISTS ImportDiff')
+    cursor.execute('''
+        CREATE TEMP TABLE ImportDiff (
+            order_number TEXT PRIMARY KEY,
+            change TEXT NOT NULL,  -- 'insert', 'update' ou 'delete'
+            old_date TEXT,
+            old_amount DOUBLE PRECISION,
+            old_user_id INTEGER,
+            new_date TEXT,
+            new_amount DOUBLE PRECISION,
+            new_user_id INTEGER,
+            new_hash BIGINT
+        )
+    ''')
+
+    # Pedidos novos e pedidos cujo conteúdo mudou
+    cursor.execute(f'''
+        INSERT INTO ImportDiff
+        SELECT st.order_number, CASE WHEN s.id IS NULL THEN 'insert' ELSE 'update' END,
+               s.date, s.amount, s.user_id, st.date, st.amount, st.user_id, st.content_hash
+        FROM ImportStaging st
+        LEFT JOIN Sales s ON s.order_number = st.order_number AND s.date >= ? AND s.date < ?
+        WHERE st.amount > 0
+        AND (s.id IS NULL OR s.content_hash {cursor.connection.storage.distinct_from} st.content_hash)
+    ''', (start_date, end_date))
+
+    # Pedidos zerados ou negativos na planilha e vendas do mês que não vieram nela
+    cursor.execute('''
+        INSERT INTO ImportDiff (order_number, change, old_date, old_amount, old_user_id)
+        SELECT s.order_number, 'delete', s.date, s.amount, s.user_id
+        FROM ImportStaging st
+        JOIN Sales s ON s.order_number = st.order_number AND s.date >= ? AND s.date < ?
+        WHERE st.amount <= 0
+    ''', (start_date, end_date))
+    cursor.execute('''
+        INSERT INTO ImportDiff (order_number, change, old_date, old_amount, old_user_id)
+        SELECT s.order_number, 'delete', s.date, s.amount, s.user_id
+        FROM Sales s
+        WHERE s.date >= ? AND s.date < ?
+        AND NOT EXISTS (SELECT 1 FROM ImportStaging st WHERE st.order_number = s.order_number)
+    ''', (start_date, end_date))
+
+    cursor.execute('SELECT change, COUNT(*) AS count FROM ImportDiff GROUP BY change')
+    counts = {row['change']: row['count'] for row in cursor.fetchall()}
+    cursor.execute('SELECT COUNT(*) FROM ImportStaging WHERE amount > 0')
+    staged = cursor.fetchone()[0]
+    changes = Changes(inserted=counts.get('insert', 0), updated=counts.get('update', 0),
+                      deleted=counts.get('delete', 0))
+    changes.unchanged = staged - changes.inserted - changes.updated
+
+    # Aplicar as diferenças
+    cursor.execute('''
+        DELETE FROM Sales
+        WHERE order_number IN (SELECT order_number FROM ImportDiff WHERE change = 'delete')
+    ''')
+    cursor.execute('''
+        UPDATE Sales
+        SET date = d.new_date, amount = d.new_amount, user_id = d.new_user_id, content_hash = d.new_hash
+        FROM ImportDiff d
+        WHERE d.change = 'update' AND Sales.order_number = d.order_number
+    ''')
+    cursor.execute('''
+        INSERT INTO Sales (date, amount, user_id, order_number, content_hash)
+        SELECT new_date, new_amount, new_user_id, order_number, new_hash
+        FROM ImportDiff
+        WHERE change = 'insert'
+    ''')
+
+    # Meses alterados: os das datas antigas e novas dos pedidos que mudaram
+    cursor.execute('''
+        SELECT CAST(substr(old_date, 1, 4) AS INTEGER) AS year, CAST(substr(old_date, 6, 2) AS INTEGER) AS month
+        FROM ImportDiff WHERE old_date IS NOT NULL
+        UNION
+        SELECT CAST(substr(new_date, 1, 4) AS INTEGER), CAST(substr(new_date, 6, 2) AS INTEGER)
+        FROM ImportDiff WHERE new_date IS NOT NULL
+    ''')
+    changes.periods = {(row['year'], row['month']) for row in cursor.fetchall()}
+
+    cursor.execute('DROP TABLE ImportStaging')
+
+    return changes
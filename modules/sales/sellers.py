@@ -0,0 +1,34 @@
+from utils.text_utils import normalize_name
+
+# Identificação dos vendedores da planilha.
+# Os nomes de Users e os apelidos de SellerAliases (grafias diferentes usadas
+# pelo ERP) são normalizados uma vez em um índice; cada bloco da planilha só
+# normaliza os nomes distintos que aparecem nele.
+
+
+class SellerResolver:
+    def __init__(self, cursor):
+        cursor.execute('SELECT id, name FROM Users')
+        self.index = {normalize_name(row['name']): row['id'] for row in cursor.fetchall()}
+
+        cursor.execute('SELECT alias, user_id FROM SellerAliases')
+        for row in cursor.fetchall():
+            self.index.setdefault(normalize_name(row['alias']), row['user_id'])
+
+        # Nomes da planilha sem vendedor correspondente, na ordem em que aparecem
+        self.unregistered = {}
+
+    def resolve(self, names):
+        """Retorna uma Series com o Users.id de cada nome (NaN se não cadastrado)."""
+        mapping = {}
+        for name in names.unique():
+            user_id = self.index.get(normalize_name(name))
+            mapping[name] = user_id
+            if user_id is None:
+                self.unregistered.setdefault(normalize_name(name), ' '.join(name.split()).title())
+        return names.map(mapping)
+
+    def warnings(self):
+        if not self.unregistered:
+            return []
+        return [f'Vendedores não cadastrados: {", ".join(self.unregistered.values())}.']
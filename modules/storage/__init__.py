@@ -0,0 +1,34 @@
+from .sqlite import SqliteStorage
+from .postgresql import PostgresStorage
+
+# Backends de armazenamento. O banco em DATABASE (COMISYS_DATABASE) é o
+# caminho de um arquivo SQLite ou uma URL postgresql://; com o PostgreSQL,
+# várias instâncias da aplicação podem compartilhar o mesmo banco atrás de um
+# balanceador.
+#
+# As consultas são escritas uma vez, no SQL comum aos dois bancos (parâmetros
+# '?', upserts com ON CONFLICT, UPDATE ... FROM, RETURNING, funções de janela),
+# e as conexões dos dois backends têm a interface do sqlite3 (cursor(),
+# execute(), fetchone(), linhas com acesso por nome). Cada conexão leva o seu
+# backend em `conn.storage`, que reúne o que muda de um banco para o outro:
+#
+# - connect(read_only): abre uma conexão configurada e instrumentada (a
+#   somente leitura não altera o banco);
+# - begin_write(cursor): abre a transação de escrita exclusiva das
+#   importações, do histórico e das migrações;
+# - stage_orders(cursor, orders): carrega os pedidos da planilha na tabela
+#   temporária ImportStaging (executemany no SQLite, COPY no PostgreSQL);
+# - load_rows(cursor, table, columns, rows): carga em massa de uma tabela
+#   (usada pela cópia entre bancos, flask db copy);
+# - distinct_from: o operador de diferença que trata NULL como valor;
+# - schema_version(conn), set_schema_version(cursor, version) e
+#   analyze(cursor): usados pelas migrações (modules/migrations).
+
+POSTGRESQL_SCHEMES = ('postgresql://', 'postgres://')
+
+
+def get_storage(database):
+    """Backend do banco informado: uma URL postgresql:// ou o caminho de um arquivo SQLite."""
+    if database.startswith(POSTGRESQL_SCHEMES):
+        return PostgresStorage(database)
+    return SqliteStorage(database)
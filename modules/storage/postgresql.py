@@ -0,0 +1,256 @@
+from ..metrics.sql import record_query, record_fetch
+import functools
+import time
+
+# Banco PostgreSQL compartilhado entre as instâncias da aplicação.
+#
+# O driver (psycopg 3) só é importado quando uma conexão é aberta, então ele
+# só precisa estar instalado onde DATABASE aponta para o PostgreSQL. As
+# conexões imitam a interface do sqlite3 usada pelos módulos: parâmetros '?'
+# (convertidos para os '%s' do psycopg), linhas com acesso por posição e por
+# nome e o atributo in_transaction. Os comandos entram nas métricas de SQL
+# como os do SQLite.
+#
+# As escritas exclusivas (importações, histórico e migrações) usam uma trava
+# consultiva da transação, que faz o papel do BEGIN IMMEDIATE do SQLite entre
+# todas as instâncias.
+
+WRITE_LOCK_KEY = 0x636F6D69  # 'comi'
+
+
+def _import_psycopg():
+    try:
+        import psycopg
+    except ImportError:
+        raise RuntimeError('O banco PostgreSQL precisa do pacote psycopg: pip install "psycopg[binary]".')
+    return psycopg
+
+
+@functools.lru_cache(maxsize=1024)
+def format_sql(sql):
+    """Troca os parâmetros '?' por '%s' e escapa os '%' do SQL, fora de literais e comentários."""
+    parts = []
+    quote = None
+    comment = False
+    for char in sql:
+        if comment:
+            comment = char != '\n'
+        elif quote:
+            quote = None if char == quote else quote
+        elif char in ("'", '"'):
+            quote = char
+        elif char == '-' and parts and parts[-1] == '-':
+            comment = True
+        elif char == '?':
+            char = '%s'
+        parts.append('%%' if char == '%' else char)
+    return ''.join(parts)
+
+
+class Row:
+    """Linha de resultado com acesso por posição e por nome (sem diferenciar maiúsculas), como sqlite3.Row."""
+
+    __slots__ = ('_values', '_names')
+
+    def __init__(self, values, names):
+        self._values = values
+        self._names = names
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._names[key.lower()]]
+        return self._values[key]
+
+    def keys(self):
+        return list(self._names)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        return isinstance(other, Row) and self._values == other._values and self._names == other._names
+
+    def __repr__(self):
+        return f'Row({dict(zip(self._names, self._values))!r})'
+
+
+def row_factory(cursor):
+    names = {}
+    for index, column in enumerate(cursor.description or ()):
+        names.setdefault(column.name.lower(), index)
+    return lambda values: Row(tuple(values), names)
+
+
+class PostgresCursor:
+    arraysize = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.raw.cursor()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            # Sem parâmetros, o psycopg não interpreta '%' no SQL
+            if parameters:
+                self._cursor.execute(format_sql(sql), parameters)
+            else:
+                self._cursor.execute(sql)
+        finally:
+            record_query(sql, parameters, time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(format_sql(sql), seq_of_parameters)
+        finally:
+            record_query(sql, '(executemany)', time.perf_counter() - started)
+        return self
+
+    def copy_rows(self, sql, rows):
+        """Envia as linhas com um COPY ... FROM STDIN."""
+        started = time.perf_counter()
+        try:
+            with self._cursor.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        finally:
+            record_query(sql, '(copy)', time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return self._cursor.fetchall()
+        finally:
+            record_fetch(time.perf_counter() - started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.fetchmany(self.arraysize if size is None else size)
+        finally:
+            record_fetch(time.perf_counter() - started)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class PostgresConnection:
+    def __init__(self, raw, storage):
+        self.raw = raw
+        self.storage = storage
+
+    def cursor(self):
+        return PostgresCursor(self)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != self.storage.psycopg.pq.TransactionStatus.IDLE
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+
+class PostgresStorage:
+    """Banco PostgreSQL, compartilhado por várias instâncias da aplicação."""
+
+    name = 'postgresql'
+    distinct_from = 'IS DISTINCT FROM'
+
+    def __init__(self, database):
+        self.database = database
+        self.psycopg = None
+
+    def connect(self, read_only=False):
+        if self.psycopg is None:
+            self.psycopg = _import_psycopg()
+        # ClientCursor monta o comando no cliente, como o sqlite3: os literais
+        # não dependem da inferência de tipos dos parâmetros no servidor
+        raw = self.psycopg.connect(self.database, cursor_factory=self.psycopg.ClientCursor,
+                                   row_factory=row_factory, application_name='comisys')
+        if read_only:
+            raw.read_only = True
+        return PostgresConnection(raw, self)
+
+    def begin_write(self, cursor):
+        # A trava é liberada no commit ou no rollback
+        cursor.execute('SELECT pg_advisory_xact_lock(?)', (WRITE_LOCK_KEY,))
+
+    def stage_orders(self, cursor, orders):
+        # Cada bloco da planilha vai por COPY para ImportChunk (os pedidos do
+        # bloco já vêm agrupados) e é somado a ImportStaging em um comando
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS ImportChunk (
+                order_number TEXT,
+                date TEXT,
+                amount DOUBLE PRECISION,
+                user_id INTEGER
+            )
+        ''')
+        cursor.execute('TRUNCATE ImportChunk')
+        cursor.copy_rows('COPY ImportChunk (order_number, date, amount, user_id) FROM STDIN', orders)
+        cursor.execute('''
+            INSERT INTO ImportStaging (order_number, date, amount, user_id)
+            SELECT order_number, date, amount, user_id FROM ImportChunk
+            ON CONFLICT(order_number) DO UPDATE SET amount = ImportStaging.amount + excluded.amount
+        ''')
+
+    def load_rows(self, cursor, table, columns, rows):
+        cursor.copy_rows(f'COPY {table} ({", ".join(columns)}) FROM STDIN', rows)
+        if 'id' in columns:
+            # Os ids vieram prontos: a sequência da coluna continua depois do maior
+            cursor.execute(f'''
+                SELECT setval(pg_get_serial_sequence('{table.lower()}', 'id'), COALESCE(MAX(id), 0) + 1, false)
+                FROM {table}
+            ''')
+
+    def schema_version(self, conn):
+        # A tabela SchemaVersion é criada pela primeira migração aplicada. A
+        # consulta é ao catálogo (e não to_regclass, que usa o cache da sessão)
+        # para enxergar a tabela criada por outra instância enquanto esta
+        # esperava pela trava de escrita
+        cursor = conn.execute('''
+            SELECT 1 FROM pg_catalog.pg_tables WHERE schemaname = current_schema() AND tablename = 'schemaversion'
+        ''')
+        if cursor.fetchone() is None:
+            return 0
+        row = conn.execute('SELECT version FROM SchemaVersion').fetchone()
+        return row[0] if row is not None else 0
+
+    def set_schema_version(self, cursor, version):
+        cursor.execute('CREATE TABLE IF NOT EXISTS SchemaVersion (version INTEGER NOT NULL)')
+        cursor.execute('DELETE FROM SchemaVersion')
+        cursor.execute('INSERT INTO SchemaVersion (version) VALUES (?)', (version,))
+
+    def analyze(self, cursor):
+        cursor.execute('ANALYZE')
@@ -0,0 +1,60 @@
+from ..metrics.sql import InstrumentedConnection
+import sqlite3
+
+# Configurações aplicadas uma única vez, quando a conexão é aberta (as de
+# leitura valem também para as cópias somente leitura dos dashboards)
+READ_PRAGMAS = (
+    'PRAGMA cache_size = -16000',  # 16 MB
+    'PRAGMA mmap_size = 134217728',  # 128 MB
+    'PRAGMA temp_store = MEMORY',
+)
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    *READ_PRAGMAS,
+)
+
+
+class SqliteStorage:
+    """Banco em um arquivo SQLite local (uma única instância da aplicação)."""
+
+    name = 'sqlite'
+    distinct_from = 'IS NOT'
+
+    def __init__(self, database):
+        self.database = database
+
+    def connect(self, read_only=False):
+        conn = sqlite3.connect(self.database, timeout=30, check_same_thread=False, factory=InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        # Somente leitura não troca o modo de journal: o arquivo não é alterado
+        for pragma in READ_PRAGMAS if read_only else PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute('PRAGMA query_only = ON')
+        conn.storage = self
+        return conn
+
+    def begin_write(self, cursor):
+        # Obtém a trava de escrita do arquivo já no início da transação
+        cursor.execute('BEGIN IMMEDIATE')
+
+    def stage_orders(self, cursor, orders):
+        cursor.executemany('''
+            INSERT INTO ImportStaging (order_number, date, amount, user_id) VALUES (?, ?, ?, ?)
+            ON CONFLICT(order_number) DO UPDATE SET amount = amount + excluded.amount
+        ''', orders)
+
+    def load_rows(self, cursor, table, columns, rows):
+        cursor.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                           rows)
+
+    def schema_version(self, conn):
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def set_schema_version(self, cursor, version):
+        cursor.execute(f'PRAGMA user_version = {int(version):d}')
+
+    def analyze(self, cursor):
+        cursor.execute('ANALYZE')
+        cursor.execute('PRAGMA optimize')
@@ -0,0 +1,104 @@
+from .db import month_range
+
+# Resumo mensal de vendas por vendedor (MonthlySalesSummary).
+# A tabela é atualizada na mesma transação de quem altera Sales (importação e
+# exclusões), recalculando apenas os meses afetados, para que os dashboards
+# leiam O(vendedores) linhas em vez de somar todas as vendas do mês.
+# SalesPeriods, o catálogo dos meses com vendas, é mantido junto, para que o
+# menu de meses leia O(meses) linhas.
+
+
+def refresh_monthly_summary(cursor, periods):
+    """Recalcula o resumo dos períodos informados, como pares (ano, mês)."""
+    for year, month in sorted(set(periods)):
+        start_date, end_date = month_range(year, month)
+        cursor.execute('DELETE FROM MonthlySalesSummary WHERE year = ? AND month = ?', (year, month))
+        cursor.execute('''
+            INSERT INTO MonthlySalesSummary (year, month, user_id, branch, total, order_count)
+            SELECT ?, ?, s.user_id, u.branch, SUM(s.amount), COUNT(*)
+            FROM Sales s
+            LEFT JOIN Users u ON u.id = s.user_id
+            WHERE s.date >= ? AND s.date < ?
+            GROUP BY s.user_id, u.branch
+        ''', (year, month, start_date, end_date))
+
+        cursor.execute('DELETE FROM SalesPeriods WHERE year = ? AND month = ?', (year, month))
+        cursor.execute('''
+            INSERT INTO SalesPeriods (year, month)
+            SELECT ?, ? WHERE EXISTS (SELECT 1 FROM MonthlySalesSummary WHERE year = ? AND month = ?)
+        ''', (year, month, year, month))
+
+
+def rebuild_monthly_summary(cursor):
+    """Reconstrói o resumo inteiro a partir de Sales (recuperação)."""
+    cursor.execute('DELETE FROM MonthlySalesSummary')
+    cursor.execute('''
+        INSERT INTO MonthlySalesSummary (year, month, user_id, branch, total, order_count)
+        SELECT CAST(substr(s.date, 1, 4) AS INTEGER), CAST(substr(s.date, 6, 2) AS INTEGER),
+               s.user_id, u.branch, SUM(s.amount), COUNT(*)
+        FROM Sales s
+        LEFT JOIN Users u ON u.id = s.user_id
+        GROUP BY 1, 2, s.user_id, u.branch
+    ''')
+    rebuild_sales_periods(cursor)
+
+
+def rebuild_sales_periods(cursor):
+    """Reconstrói o catálogo de meses com vendas a partir do resumo."""
+    cursor.execute('DELETE FROM SalesPeriods')
+    cursor.execute('INSERT INTO SalesPeriods (year, month) SELECT DISTINCT year, month FROM MonthlySalesSummary')
+
+
+def sale_periods(cursor, where, params=()):
+    """Retorna os períodos (ano, mês) das vendas que atendem ao filtro informado."""
+    cursor.execute(f'''
+        SELECT DISTINCT CAST(substr(date, 1, 4) AS INTEGER) AS year, CAST(substr(date, 6, 2) AS INTEGER) AS month
+        FROM Sales
+        WHERE {where}
+    ''', params)
+    return [(row['year'], row['month']) for row in cursor.fetchall()]
+
+
+def available_dates(cursor, seller_id=None):
+    """Meses com vendas, do mais recente para o mais antigo (de um vendedor ou de todos).
+
+    As duas consultas percorrem só um índice na ordem pedida: a chave de
+    SalesPeriods ou idx_summary_user_period.
+    """
+    if seller_id is None:
+        cursor.execute('''
+            SELECT year, month FROM SalesPeriods
+            ORDER BY year DESC, month DESC
+        ''')
+    else:
+        cursor.execute('''
+            SELECT year, month FROM MonthlySalesSummary
+            WHERE user_id = ?
+            ORDER BY year DESC, month DESC
+        ''', (seller_id,))
+    return cursor.fetchall()
+
+
+def month_scope(year, month):
+    return f'{year:04d}-{month:02d}'
+
+
+def data_versions(cursor, scopes):
+    """Versão e horário da última alteração (epoch) de cada escopo de DataVersions.
+
+    Os escopos são um mês ('aaaa-mm'), as vendas em geral ('sales') ou os
+    dados gerais ('*': usuários e faixas de comissão); as versões são
+    incrementadas por gatilhos a cada alteração.
+    """
+    cursor.execute(f'''
+        SELECT scope, version, updated_at FROM DataVersions
+        WHERE scope IN ({', '.join('?' * len(scopes))})
+    ''', tuple(scopes))
+    found = {row['scope']: (row['version'], row['updated_at']) for row in cursor.fetchall()}
+    return {scope: found.get(scope, (0, None)) for scope in scopes}
+
+
+def data_version(cursor, year, month):
+    """Versão dos dados de um mês: vendas e metas do mês, usuários e faixas."""
+    versions = data_versions(cursor, ('*', month_scope(year, month)))
+    return tuple(version for version, _ in versions.values())
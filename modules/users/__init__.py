@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from ..db import get_db_connection
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+from werkzeug.security import generate_password_hash
+from utils.text_utils import normalize_name
+from ..db import get_db
+from .auth import LoginBusy
+from .profiles import invalidate as invalidate_profile
+from .batch import update_users
 
 users_bp = Blueprint('users', __name__)
 
@@ -12,13 +16,17 @@ def users():
     if 'user_id' not in session or session['role'] != 'master':
         return redirect(url_for('users.login'))
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM Users')
     users = cursor.fetchall()
-    conn.close()
 
-    return render_template('users.html', users=users)
+    cursor.execute('SELECT alias, user_id FROM SellerAliases ORDER BY alias')
+    aliases = {}
+    for row in cursor.fetchall():
+        aliases.setdefault(row['user_id'], []).append(row['alias'])
+
+    return render_template('users.html', users=users, aliases=aliases)
 
 
 # Rota para registro de usuários
@@ -37,7 +45,7 @@ def register():
 
         hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
 
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
 
         # Verificar se o pedido já existe
@@ -53,10 +61,12 @@ def register():
                     flash(f'Nome já cadastrado! Username: {user["username"]}', 'error')
                     return render_template('register.html')
         else:
-            cursor.execute('INSERT INTO Users (username, password, name, role, branch, active) VALUES (?, ?, ?, ?, ?, ?)',
-                           (username, hashed_password, name, role, branch, active))
+            cursor.execute('''
+                INSERT INTO Users (username, password, name, role, branch, active) VALUES (?, ?, ?, ?, ?, ?)
+                RETURNING id
+            ''', (username, hashed_password, name, role, branch, active))
+            invalidate_profile(cursor.fetchone()[0])
         conn.commit()
-        conn.close()
 
         flash('Cadastro realizado com sucesso!', 'success')
 
@@ -71,11 +81,13 @@ def delete_user(user_id):
     if 'user_id' not in session or session['role'] != 'master':
         return redirect(url_for('dashboards.dashboard'))
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('DELETE FROM Users WHERE id = ?', (user_id,))
+    cursor.execute('DELETE FROM SellerAliases WHERE user_id = ?', (user_id,))
+    cursor.execute('UPDATE MonthlySalesSummary SET branch = NULL WHERE user_id = ?', (user_id,))
     conn.commit()
-    conn.close()
+    invalidate_profile(user_id)
 
     if session['user_id'] == user_id:
         return redirect(url_for('users.logout'))
@@ -95,11 +107,11 @@ def update_password(user_id):
         new_password = request.form['new_password']
         hashed_password = generate_password_hash(new_password, method='pbkdf2:sha256')
 
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('UPDATE Users SET password = ? WHERE id = ?', (hashed_password, user_id))
         conn.commit()
-        conn.close()
+        invalidate_profile(user_id)
 
         if session['user_id'] == user_id:
             return redirect(url_for('users.logout'))
@@ -117,11 +129,12 @@ def update_branch(user_id):
 
     new_branch = request.form['new_branch']
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('UPDATE Users SET branch = ? WHERE id = ?', (new_branch, user_id))
+    cursor.execute('UPDATE MonthlySalesSummary SET branch = ? WHERE user_id = ?', (new_branch, user_id))
     conn.commit()
-    conn.close()
+    invalidate_profile(user_id)
 
     flash('Filial atualizada com sucesso!', 'success')
     return redirect(url_for('users.users'))
@@ -134,16 +147,80 @@ def update_status(user_id):
     
     new_status = int(request.form['new_status'])
     
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('UPDATE Users SET active = ? WHERE id = ?', (new_status, user_id))
     conn.commit()
-    conn.close()
+    invalidate_profile(user_id)
     
     flash('Status atualizado com sucesso!', 'success')
     return redirect(url_for('users.users'))
 
-# Rota para login
+# Rota para alterar filial e status de vários usuários de uma vez
+
+
+@users_bp.route('/users/batch', methods=['POST'])
+def batch_update_users():
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    user_ids = request.form.getlist('user_ids')
+    branch = request.form.get('branch') or None
+    active = request.form.get('active') or None
+    if not user_ids or (branch is None and active is None):
+        flash('Selecione os usuários e o que deve ser alterado.', 'error')
+        return redirect(url_for('users.users'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        changed = update_users(cursor, [{'id': user_id, 'branch': branch, 'active': active} for user_id in user_ids])
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('users.users'))
+    conn.commit()
+    for user_id in changed:
+        invalidate_profile(user_id)
+
+    flash(f'{len(changed)} usuários atualizados com sucesso!', 'success')
+    return redirect(url_for('users.users'))
+
+# Rotas para apelidos de vendedores (nomes como aparecem na planilha do ERP)
+
+
+@users_bp.route('/add_alias/<int:user_id>', methods=['POST'])
+def add_alias(user_id):
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    alias = normalize_name(request.form['alias'])
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO SellerAliases (alias, user_id) VALUES (?, ?)
+        ON CONFLICT(alias) DO UPDATE SET user_id = excluded.user_id
+    ''', (alias, user_id))
+    conn.commit()
+
+    flash(f'Apelido {alias} cadastrado com sucesso!', 'success')
+    return redirect(url_for('users.users'))
+
+
+@users_bp.route('/delete_alias', methods=['POST'])
+def delete_alias():
+    if 'user_id' not in session or session['role'] != 'master':
+        return redirect(url_for('users.login'))
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM SellerAliases WHERE alias = ?', (request.form['alias'],))
+    conn.commit()
+
+    flash('Apelido removido com sucesso!', 'success')
+    return redirect(url_for('users.users'))
+
+# Rota para login (a senha é conferida no pool de modules/users/auth.py)
 
 
 @users_bp.route('/login', methods=['GET', 'POST'])
@@ -152,21 +229,38 @@ def login():
         username = request.form['username'].lower()
         password = request.form['password']
 
-        conn = get_db_connection()
+        # Limitar tentativas por endereço e falhas por usuário e endereço
+        failures = current_app.extensions['login_failures']
+        attempts = current_app.extensions['login_attempts']
+        failure_key = (request.remote_addr, username)
+        if attempts.blocked(request.remote_addr) or failures.blocked(failure_key):
+            flash('Muitas tentativas de login. Tente novamente em alguns minutos.', 'error')
+            return render_template('login.html'), 429
+        attempts.hit(request.remote_addr)
+
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM Users WHERE lower(username) = ?', (username,))
         user = cursor.fetchone()
-        conn.close()
 
-        if user and check_password_hash(user['password'], password):
+        try:
+            valid = user is not None and current_app.extensions['password_verifier'].verify(user['password'],
+                                                                                            password)
+        except LoginBusy:
+            flash('Muitos acessos ao mesmo tempo. Tente novamente em instantes.', 'error')
+            return render_template('login.html'), 503
+
+        if valid:
             if not user['active']:
                 flash('Usuário inativo, entre em contato com o administrador.', 'error')
                 return render_template('login.html')
+            failures.reset(failure_key)
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['role'] = user['role']
             return redirect(url_for('dashboards.dashboard'))
         else:
+            failures.hit(failure_key)
             flash('Login inválido, verifique suas credenciais.', 'error')
 
     return render_template('login.html')
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from collections import deque
+from threading import Lock, BoundedSemaphore
+from werkzeug.security import check_password_hash
+import time
+
+# Verificação de senhas fora da thread da requisição e limite de tentativas de
+# login. O pbkdf2 é caro de propósito; quando a equipe toda entra no começo do
+# turno, as verificações rodam num pool pequeno (LOGIN_WORKERS threads; o
+# hashlib libera o GIL durante o cálculo), então no máximo esse número de
+# núcleos fica ocupado com logins e as outras requisições seguem atendidas.
+# Logins além da fila (LOGIN_QUEUE_SIZE) ou que esperam mais de LOGIN_TIMEOUT
+# segundos são recusados, em vez de acumular threads esperando.
+#
+# As falhas de senha são limitadas por usuário e endereço; o limite só por
+# endereço é alto porque a equipe toda entra pela mesma rede da loja (o mesmo
+# endereço de saída) no começo do turno.
+
+
+class LoginBusy(Exception):
+    pass
+
+
+def init_app(app):
+    app.config.setdefault('LOGIN_WORKERS', 2)
+    app.config.setdefault('LOGIN_QUEUE_SIZE', 32)
+    app.config.setdefault('LOGIN_TIMEOUT', 10)
+    # Falhas por usuário e endereço, e tentativas por endereço, dentro da janela
+    app.config.setdefault('LOGIN_FAILURE_LIMIT', 5)
+    app.config.setdefault('LOGIN_ATTEMPT_LIMIT', 300)
+    app.config.setdefault('LOGIN_RATE_WINDOW', 300)
+    app.extensions['password_verifier'] = PasswordVerifier(app.config['LOGIN_WORKERS'],
+                                                           app.config['LOGIN_QUEUE_SIZE'],
+                                                           app.config['LOGIN_TIMEOUT'])
+    app.extensions['login_failures'] = RateLimiter(app.config['LOGIN_FAILURE_LIMIT'], app.config['LOGIN_RATE_WINDOW'])
+    app.extensions['login_attempts'] = RateLimiter(app.config['LOGIN_ATTEMPT_LIMIT'], app.config['LOGIN_RATE_WINDOW'])
+
+
+class PasswordVerifier:
+    def __init__(self, workers=2, queue_size=32, timeout=10):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+        self.slots = BoundedSemaphore(workers + queue_size)
+        self.timeout = timeout
+
+    def verify(self, password_hash, password):
+        """Confere a senha no pool; levanta LoginBusy se a fila estiver cheia ou a conferência demorar."""
+        if not self.slots.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            future = self.executor.submit(check_password_hash, password_hash, password)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # A conferência continua no pool e libera a vaga quando terminar
+            raise LoginBusy()
+
+
+class RateLimiter:
+    """Conta eventos por chave numa janela deslizante de `window` segundos.
+
+    As chaves sem eventos na janela são descartadas a cada `window` segundos,
+    para endereços e usuários que não voltam não ficarem na memória.
+    """
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.events = {}
+        self.lock = Lock()
+        self.next_sweep = time.monotonic() + window
+
+    def _recent(self, key, now):
+        events = self.events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self.events[key]
+            return None
+        return events
+
+    def blocked(self, key):
+        with self.lock:
+            events = self._recent(key, time.monotonic())
+            return events is not None and len(events) >= self.limit
+
+    def _sweep(self, now):
+        self.next_sweep = now + self.window
+        for key in [key for key, events in self.events.items() if events[-1] <= now - self.window]:
+            del self.events[key]
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self.lock:
+            if now >= self.next_sweep:
+                self._sweep(now)
+            events = self._recent(key, now)
+            if events is None:
+                events = self.events[key] = deque()
+            events.append(now)
+
+    def reset(self, key):
+        with self.lock:
+            self.events.pop(key, None)
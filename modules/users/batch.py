@@ -0,0 +1,42 @@
+# Alteração de vários usuários de uma vez (filial e situação), em uma única
+# transação com executemany. Como em update_branch, a troca de filial também
+# vale para o resumo mensal do vendedor.
+
+BRANCHES = ('Loja', 'Oficina')
+
+
+def update_users(cursor, updates):
+    """Aplica uma lista de {'id', 'branch'?, 'active'?}; o commit fica a cargo de quem chama.
+
+    Levanta ValueError se algum item for inválido, antes de gravar qualquer coisa.
+    Retorna os ids dos usuários alterados, para quem chama descartar os
+    perfis do cache depois do commit (como em update_branch).
+    """
+    rows = []
+    for update in updates:
+        if not isinstance(update, dict):
+            raise ValueError('Cada usuário deve ser um objeto com id, branch e active.')
+        try:
+            user_id = int(update['id'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Informe o id de cada usuário.')
+        branch = update.get('branch') or None
+        active = update.get('active')
+        if branch is not None and branch not in BRANCHES:
+            raise ValueError(f'Filial inválida: {branch}.')
+        if active is not None and active not in (0, 1, '0', '1', True, False):
+            raise ValueError(f'Status inválido: {active}.')
+        rows.append((branch, None if active is None else int(active), user_id))
+
+    cursor.executemany('''
+        UPDATE Users SET branch = COALESCE(?, branch), active = COALESCE(?, active)
+        WHERE id = ?
+    ''', rows)
+    cursor.executemany('UPDATE MonthlySalesSummary SET branch = ? WHERE user_id = ?',
+                       [(branch, user_id) for branch, _, user_id in rows if branch is not None])
+
+    user_ids = sorted({user_id for _, _, user_id in rows})
+    if not user_ids:
+        return []
+    cursor.execute(f'SELECT id FROM Users WHERE id IN ({", ".join("?" * len(user_ids))})', user_ids)
+    return [row['id'] for row in cursor.fetchall()]
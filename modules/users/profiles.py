@@ -0,0 +1,46 @@
+from threading import Lock
+import time
+
+# Cache curto, em memória, dos dados de perfil dos usuários (nome, filial,
+# papel e situação), para as páginas não consultarem Users a cada acesso: os
+# dashboards e a API conferem a cada requisição se o usuário logado continua
+# ativo (active_profile), e o dashboard do vendedor lê dele o nome e a filial.
+# As rotas que alteram um usuário chamam invalidate(); o TTL limita por quanto
+# tempo outro processo da aplicação pode ver um perfil antigo. A senha nunca
+# entra no cache.
+
+PROFILE_TTL = 60
+
+_profiles = {}
+_lock = Lock()
+
+
+def get_profile(cursor, user_id):
+    """Retorna o perfil do usuário como dicionário, ou None se ele não existir."""
+    now = time.monotonic()
+    with _lock:
+        entry = _profiles.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    cursor.execute('SELECT id, username, name, role, branch, active FROM Users WHERE id = ?', (user_id,))
+    row = cursor.fetchone()
+    profile = dict(row) if row is not None else None
+    with _lock:
+        _profiles[user_id] = (now + PROFILE_TTL, profile)
+    return profile
+
+
+def invalidate(user_id=None):
+    """Descarta o perfil do usuário (ou de todos)."""
+    with _lock:
+        if user_id is None:
+            _profiles.clear()
+        else:
+            _profiles.pop(user_id, None)
+
+
+def active_profile(cursor, user_id):
+    """Perfil do usuário logado, ou None se ele foi removido ou desativado depois do login."""
+    profile = get_profile(cursor, user_id)
+    return profile if profile is not None and profile['active'] else None
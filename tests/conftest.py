@@ -0,0 +1,104 @@
+from flask import Flask
+from modules import db
+from modules.api import api_bp
+from modules.commissions import engine
+from modules.dashboards import cache as dashboard_cache, snapshot as dashboard_snapshot
+from modules.db import get_db_connection
+from modules.migrations import migrate
+from modules.users import profiles
+import os
+import pytest
+
+# Os testes usam um banco novo, criado pelas migrações; o banco de vendas do
+# repositório nunca é aberto. Cada teste roda no SQLite (um arquivo em um
+# diretório temporário) e, se COMISYS_TEST_POSTGRES tiver a URL de um banco
+# PostgreSQL só para testes, também nele: o esquema public desse banco é
+# apagado e recriado a cada teste.
+
+BACKENDS = ('sqlite', 'postgresql')
+
+
+@pytest.fixture(params=BACKENDS)
+def database(request, tmp_path):
+    if request.param == 'sqlite':
+        return str(tmp_path / 'comisys.db')
+
+    url = os.environ.get('COMISYS_TEST_POSTGRES')
+    if not url:
+        pytest.skip('COMISYS_TEST_POSTGRES não configurado.')
+    conn = get_db_connection(url)
+    try:
+        conn.execute('DROP SCHEMA public CASCADE')
+        conn.execute('CREATE SCHEMA public')
+        conn.commit()
+    finally:
+        conn.close()
+    return url
+
+
+@pytest.fixture
+def conn(database):
+    conn = get_db_connection(database)
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def sellers(conn):
+    """Dois vendedores, um em cada filial; retorna {nome: id}."""
+    cursor = conn.cursor()
+    ids = {}
+    for name, branch in (('Ana Souza', 'Loja'), ('Bruno Lima', 'Oficina')):
+        cursor.execute('''
+            INSERT INTO Users (username, password, name, role, branch) VALUES (?, '', ?, 'seller', ?)
+            RETURNING id
+        ''', (name.split()[0].lower(), name, branch))
+        ids[name] = cursor.fetchone()[0]
+    conn.commit()
+    return ids
+
+
+@pytest.fixture
+def write_sheet(tmp_path):
+    """Grava uma planilha .csv no layout do ERP com linhas (data 'aaaa-mm-dd', valor, pedido, vendedor)."""
+    def write(name, rows):
+        path = tmp_path / name
+        lines = ['Relatório de vendas', 'Data;Valor Total;Nº Ped/ OS/ PRQ;Vendedor;Cliente']
+        for date, amount, order_number, seller in rows:
+            year, month, day = date.split('-')
+            amount = f'{amount:.2f}'.replace('.', ',')
+            lines.append(f'{day}/{month}/{year};{amount};{order_number};{seller};Cliente')
+        path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def client(conn, database, tmp_path):
+    """Cliente da API JSON no banco do teste, com a sessão de um usuário master."""
+    app = Flask('comisys', instance_path=str(tmp_path / 'instance'))
+    app.secret_key = 'test'
+    app.config.update(DATABASE=database, DASHBOARD_READ_MODE='primary')
+    db.init_app(app)
+    dashboard_cache.init_app(app)
+    dashboard_snapshot.init_app(app)
+    app.register_blueprint(api_bp)
+
+    # Os caches do processo são indexados só pelas versões e ids, que se
+    # repetem entre os bancos dos testes
+    engine._cache.clear()
+    profiles.invalidate()
+
+    cursor = conn.execute('''
+        INSERT INTO Users (username, password, name, role, branch) VALUES ('admin', '', 'Administrador', 'master', 'Loja')
+        RETURNING id
+    ''')
+    master_id = cursor.fetchone()[0]
+    conn.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = master_id
+        session['role'] = 'master'
+    return client
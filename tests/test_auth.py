@@ -0,0 +1,76 @@
+from modules.db import get_db_connection
+from modules.users.auth import LoginBusy, PasswordVerifier, RateLimiter
+from modules.users.batch import update_users
+from modules.users.profiles import active_profile, invalidate
+import pytest
+import threading
+
+
+def test_rate_limiter_blocks_after_limit():
+    limiter = RateLimiter(limit=2, window=60)
+    limiter.hit(('10.0.0.1', 'ana'))
+    limiter.hit(('10.0.0.1', 'ana'))
+
+    assert limiter.blocked(('10.0.0.1', 'ana'))
+    assert not limiter.blocked(('10.0.0.1', 'bruno'))
+
+
+def test_rate_limiter_sweeps_expired_keys(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('modules.users.auth.time.monotonic', lambda: now[0])
+    limiter = RateLimiter(limit=5, window=60)
+    for address in range(100):
+        limiter.hit((f'10.0.0.{address}', 'ana'))
+
+    now[0] += 120
+    limiter.hit(('10.0.1.1', 'ana'))
+
+    assert list(limiter.events) == [('10.0.1.1', 'ana')]
+
+
+def test_slow_password_check_is_busy(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr('modules.users.auth.check_password_hash', lambda *args: release.wait())
+    verifier = PasswordVerifier(workers=1, queue_size=0, timeout=0.05)
+    try:
+        with pytest.raises(LoginBusy):
+            verifier.verify('hash', 'senha')
+    finally:
+        release.set()
+        verifier.executor.shutdown()
+
+
+def test_deactivated_user_loses_api_access(client, conn, sellers):
+    with client.session_transaction() as session:
+        session['user_id'] = sellers['Ana Souza']
+        session['role'] = 'seller'
+    assert client.get('/api/v1/goals/2024/7').status_code == 403
+
+    conn.execute('UPDATE Users SET active = 0 WHERE id = ?', (sellers['Ana Souza'],))
+    conn.commit()
+    invalidate(sellers['Ana Souza'])  # Como em update_status
+
+    assert client.get('/api/v1/goals/2024/7').status_code == 401
+
+
+def test_profile_read_before_commit_is_not_kept(client, conn, database, sellers, monkeypatch):
+    seller_id = sellers['Ana Souza']
+
+    def update_and_read(cursor, updates):
+        changed = update_users(cursor, updates)
+        # Outra requisição confere o vendedor antes do commit e guarda o perfil ainda ativo
+        reader = get_db_connection(database)
+        try:
+            assert active_profile(reader.cursor(), seller_id) is not None
+        finally:
+            reader.close()
+        return changed
+
+    monkeypatch.setattr('modules.api.update_users', update_and_read)
+    response = client.patch('/api/v1/users', json={'users': [{'id': seller_id, 'active': 0}]})
+    assert response.get_json() == {'updated': 1}
+
+    with client.session_transaction() as session:
+        session['user_id'] = seller_id
+        session['role'] = 'seller'
+    assert client.get('/api/v1/goals/2024/7').status_code == 401
@@ -0,0 +1,55 @@
+from modules.migrations import migrate, schema_version, app_version
+from modules.sales.history import rollback_import, replay_import
+from modules.sales.importer import process_file
+from tests.test_imports import JULY, JULY_CHANGED, apply_history
+
+# Fluxo completo em cada backend (ver conftest.py): migrações, importação,
+# histórico e os números do dashboard pela API JSON.
+
+
+def test_migrations_are_applied_once(conn):
+    assert schema_version(conn) == app_version(conn)
+    assert migrate(conn) == []
+
+
+def test_dashboard_json(client, conn, sellers, write_sheet):
+    process_file(conn, write_sheet('julho.csv', JULY))
+    second = process_file(conn, write_sheet('julho2.csv', JULY_CHANGED))
+
+    response = client.get('/api/v1/dashboard/2024/7')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['total_sales'], data['total_store_sales'], data['total_workshop_sales']) == (750.0, 350.0, 400.0)
+    assert sorted(seller['name'] for seller in data['sellers']) == ['Ana Souza', 'Bruno Lima']
+
+    data = client.get(f"/api/v1/dashboard/{sellers['Ana Souza']}/2024/7").get_json()
+    assert (data['user_name'], data['total_seller_sales'], data['total_branch_sales']) == ('Ana Souza', 350.0, 350.0)
+
+    # O rollback e o replay mudam a versão do mês: a resposta não vem do cache
+    apply_history(conn, rollback_import, second.import_id)
+    assert client.get('/api/v1/dashboard/2024/7').get_json()['total_sales'] == 600.0
+    apply_history(conn, replay_import, second.import_id)
+    assert client.get('/api/v1/dashboard/2024/7').get_json()['total_sales'] == 750.0
+
+
+def test_sales_list_pages(client, conn, sellers, write_sheet):
+    # Vários pedidos no mesmo dia, e um pedido de outro mês que não entra na lista
+    process_file(conn, write_sheet('junho.csv', [('2024-06-30', 5.0, '0999', 'Ana Souza')]))
+    process_file(conn, write_sheet('julho.csv', [
+        (f'2024-07-{day:02d}', 10.0, f'{day}{index}', 'Ana Souza') for day in (1, 2, 3) for index in range(3)
+    ]))
+
+    orders, cursor = [], None
+    while True:
+        params = {'seller_id': sellers['Ana Souza'], 'year': 2024, 'month': 7, 'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        page = client.get('/api/v1/sales', query_string=params).get_json()
+        orders += [(date, order_number) for _, order_number, date, _ in page['rows']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert orders == sorted(orders, reverse=True)
+    assert [order_number for _, order_number in orders] == ['32', '31', '30', '22', '21', '20', '12', '11', '10']
+    assert client.get('/api/v1/sales?year=2024&month=7&cursor=abc').status_code == 400
@@ -0,0 +1,38 @@
+from modules.goals.batch import validate_goals, parse_goals_csv, save_goals, month_goals
+import pytest
+
+
+@pytest.mark.parametrize('goal', [float('nan'), float('inf'), -5.0, None, '100'])
+def test_invalid_goal_values(conn, sellers, goal):
+    ana = sellers['Ana Souza']
+
+    assert validate_goals(conn.cursor(), [(2024, 7, goal)], []) == [
+        'Meta geral de 07/2024 inválida: informe um valor não negativo.']
+    assert validate_goals(conn.cursor(), [], [(ana, 2024, 7, goal)]) == [
+        'Meta de ana em 07/2024 inválida: informe um valor não negativo.']
+
+
+def test_unknown_seller(conn, sellers):
+    assert validate_goals(conn.cursor(), [], [(999, 2024, 7, 100.0)]) == ['Vendedor 999 não cadastrado.']
+
+
+def test_valid_goals_are_saved(conn, sellers):
+    cursor = conn.cursor()
+    general_goals, individual_goals = [(2024, 7, 1000.0)], [(sellers['Ana Souza'], 2024, 7, 0)]
+
+    assert validate_goals(cursor, general_goals, individual_goals) == []
+    save_goals(cursor, general_goals, individual_goals)
+    assert month_goals(cursor, 2024, 7) == (1000.0, {sellers['Ana Souza']: 0})
+
+
+def test_csv_goals_are_validated(conn, sellers):
+    data = 'ano;mes;username;meta\n2024;7;;nan\n2024;7;ana;-5\n2024;7;bruno;1.500,00\n2024;7;carla;10\n'
+
+    general_goals, individual_goals, errors = parse_goals_csv(conn.cursor(), data.encode())
+
+    assert errors == [
+        'Linha 5: vendedor carla não cadastrado.',
+        'Meta geral de 07/2024 inválida: informe um valor não negativo.',
+        'Meta de ana em 07/2024 inválida: informe um valor não negativo.',
+    ]
+    assert (sellers['Bruno Lima'], 2024, 7, 1500.0) in individual_goals
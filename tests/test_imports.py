@@ -0,0 +1,193 @@
+from modules.sales.importer import process_file
+from modules.sales.history import rollback_import, replay_import
+from modules.summary import refresh_monthly_summary
+import pytest
+
+JULY = [
+    ('2024-07-01', 100.0, '1001', 'Ana Souza'),
+    ('2024-07-02', 200.0, '1002', 'Ana Souza'),
+    ('2024-07-03', 300.0, '1003', 'Bruno Lima'),
+]
+# 1001 igual, 1002 alterado, 1003 ausente (devolução) e 1004 novo
+JULY_CHANGED = [
+    ('2024-07-01', 100.0, '1001', 'Ana Souza'),
+    ('2024-07-02', 250.0, '1002', 'Ana Souza'),
+    ('2024-07-04', 400.0, '1004', 'Bruno Lima'),
+]
+
+
+def sales(conn):
+    cursor = conn.execute('SELECT order_number, date, amount FROM Sales ORDER BY order_number')
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def summary_totals(conn, year, month):
+    cursor = conn.execute('''
+        SELECT user_id, total, order_count FROM MonthlySalesSummary WHERE year = ? AND month = ? ORDER BY user_id
+    ''', (year, month))
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def apply_history(conn, apply, import_id, force=False):
+    # Como os comandos rollback-import e replay-import
+    cursor = conn.cursor()
+    conn.storage.begin_write(cursor)
+    periods = apply(cursor, import_id, force)
+    refresh_monthly_summary(cursor, periods)
+    conn.commit()
+    return periods
+
+
+def test_first_import_inserts_orders(conn, sellers, write_sheet):
+    result = process_file(conn, write_sheet('julho.csv', JULY))
+
+    assert (result.year, result.month) == (2024, 7)
+    assert (result.inserted, result.updated, result.deleted, result.unchanged) == (3, 0, 0, 0)
+    assert sales(conn) == [('1001', '2024-07-01', 100.0), ('1002', '2024-07-02', 200.0),
+                           ('1003', '2024-07-03', 300.0)]
+    assert summary_totals(conn, 2024, 7) == [(sellers['Ana Souza'], 300.0, 2), (sellers['Bruno Lima'], 300.0, 1)]
+
+
+def test_reimport_applies_only_differences(conn, sellers, write_sheet):
+    process_file(conn, write_sheet('julho.csv', JULY))
+    result = process_file(conn, write_sheet('julho2.csv', JULY_CHANGED))
+
+    assert (result.inserted, result.updated, result.deleted, result.unchanged) == (1, 1, 1, 1)
+    assert sales(conn) == [('1001', '2024-07-01', 100.0), ('1002', '2024-07-02', 250.0),
+                           ('1004', '2024-07-04', 400.0)]
+    cursor = conn.execute('''
+        SELECT order_number, change, old_amount, new_amount FROM ImportChanges WHERE import_id = ?
+        ORDER BY order_number
+    ''', (result.import_id,))
+    assert [tuple(row) for row in cursor.fetchall()] == [
+        ('1002', 'update', 200.0, 250.0),
+        ('1003', 'delete', 300.0, None),
+        ('1004', 'insert', None, 400.0),
+    ]
+    assert summary_totals(conn, 2024, 7) == [(sellers['Ana Souza'], 350.0, 2), (sellers['Bruno Lima'], 400.0, 1)]
+
+
+def test_order_lines_are_summed_and_non_positive_orders_removed(conn, sellers, write_sheet):
+    process_file(conn, write_sheet('julho.csv', JULY))
+    result = process_file(conn, write_sheet('julho2.csv', JULY + [
+        ('2024-07-01', -100.0, '1001', 'Ana Souza'),  # devolução total
+        ('2024-07-02', 50.0, '1002', 'Ana Souza'),
+    ]))
+
+    assert (result.inserted, result.updated, result.deleted, result.unchanged) == (0, 1, 1, 1)
+    assert sales(conn) == [('1002', '2024-07-02', 250.0), ('1003', '2024-07-03', 300.0)]
+
+
+def test_purge_is_limited_to_the_sheet_month(conn, sellers, write_sheet):
+    process_file(conn, write_sheet('junho.csv', [('2024-06-10', 80.0, '900', 'Ana Souza')]))
+    process_file(conn, write_sheet('julho.csv', JULY))
+    result = process_file(conn, write_sheet('julho2.csv', JULY_CHANGED))
+
+    assert result.deleted == 1
+    assert ('900', '2024-06-10', 80.0) in sales(conn)
+    assert summary_totals(conn, 2024, 6) == [(sellers['Ana Souza'], 80.0, 1)]
+
+
+def test_return_of_an_order_from_another_month_keeps_that_sale(conn, sellers, write_sheet):
+    process_file(conn, write_sheet('junho.csv', [('2024-06-20', 500.0, '77', 'Ana Souza'),
+                                                 ('2024-06-21', 90.0, '78', 'Ana Souza')]))
+    july = JULY + [('2024-07-05', -200.0, '77', 'Ana Souza'), ('2024-07-06', 150.0, '78', 'Ana Souza')]
+
+    result = process_file(conn, write_sheet('julho.csv', july))
+
+    # O pedido 78 de julho é outra venda; a devolução do 77 não é gravada
+    assert (result.inserted, result.updated, result.deleted) == (4, 0, 0)
+    assert ('77', '2024-06-20', 500.0) in sales(conn)
+    assert ('78', '2024-06-21', 90.0) in sales(conn)
+    assert ('78-202407', '2024-07-06', 150.0) in sales(conn)
+    assert summary_totals(conn, 2024, 6) == [(sellers['Ana Souza'], 590.0, 2)]
+
+    # Reenviar o mês não soma de novo nem mexe em junho
+    again = process_file(conn, write_sheet('julho2.csv', july + [('2024-07-07', 10.0, '1005', 'Bruno Lima')]))
+    assert (again.inserted, again.updated, again.deleted, again.unchanged) == (1, 0, 0, 4)
+    assert summary_totals(conn, 2024, 6) == [(sellers['Ana Souza'], 590.0, 2)]
+
+
+def test_unnumbered_line_does_not_touch_another_month(conn, sellers, write_sheet):
+    process_file(conn, write_sheet('junho.csv', [('2024-06-10', 80.0, '', 'Ana Souza')]))
+
+    process_file(conn, write_sheet('julho.csv', JULY + [('2024-07-10', 50.0, '', 'Bruno Lima')]))
+
+    cursor = conn.execute("SELECT date, amount, user_id FROM Sales WHERE order_number LIKE 'nan%' ORDER BY date")
+    assert [tuple(row) for row in cursor.fetchall()] == [('2024-06-10', 80.0, sellers['Ana Souza']),
+                                                         ('2024-07-10', 50.0, sellers['Bruno Lima'])]
+    assert summary_totals(conn, 2024, 6) == [(sellers['Ana Souza'], 80.0, 1)]
+
+
+def test_unnumbered_lines_are_separate_sales(conn, sellers, write_sheet):
+    july = JULY + [('2024-07-10', 30.0, '', 'Ana Souza'), ('2024-07-11', 50.0, '', 'Bruno Lima')]
+    process_file(conn, write_sheet('julho.csv', july))
+
+    cursor = conn.execute("SELECT date, amount, user_id FROM Sales WHERE order_number LIKE 'nan%' ORDER BY date")
+    assert [tuple(row) for row in cursor.fetchall()] == [('2024-07-10', 30.0, sellers['Ana Souza']),
+                                                         ('2024-07-11', 50.0, sellers['Bruno Lima'])]
+    assert summary_totals(conn, 2024, 7) == [(sellers['Ana Souza'], 330.0, 3), (sellers['Bruno Lima'], 350.0, 2)]
+
+    # As chaves se repetem a cada envio da planilha
+    again = process_file(conn, write_sheet('julho2.csv', july + [('2024-07-12', 10.0, '1005', 'Bruno Lima')]))
+    assert (again.inserted, again.updated, again.deleted, again.unchanged) == (1, 0, 0, 5)
+
+
+def test_sheet_with_more_than_one_month_is_rejected(conn, sellers, write_sheet):
+    path = write_sheet('julho_agosto.csv', JULY + [('2024-08-01', 10.0, '2001', 'Ana Souza')])
+
+    with pytest.raises(ValueError, match='mais de um mês'):
+        process_file(conn, path)
+    assert sales(conn) == []
+    assert conn.execute('SELECT COUNT(*) FROM Imports').fetchone()[0] == 0
+
+
+def test_same_file_is_skipped_until_sales_change(conn, sellers, write_sheet):
+    path = write_sheet('julho.csv', JULY)
+    first = process_file(conn, path)
+
+    duplicate = process_file(conn, path)
+    assert duplicate.duplicate_of == first.import_id
+
+    conn.execute("DELETE FROM Sales WHERE order_number = '1002'")
+    conn.commit()
+    again = process_file(conn, path)
+    assert again.duplicate_of is None
+    assert (again.inserted, again.unchanged) == (1, 2)
+    assert len(sales(conn)) == 3
+
+
+def test_rollback_and_replay(conn, sellers, write_sheet):
+    process_file(conn, write_sheet('julho.csv', JULY))
+    after_first = sales(conn), summary_totals(conn, 2024, 7)
+    second = process_file(conn, write_sheet('julho2.csv', JULY_CHANGED))
+    after_second = sales(conn), summary_totals(conn, 2024, 7)
+
+    assert apply_history(conn, rollback_import, second.import_id) == {(2024, 7)}
+    assert (sales(conn), summary_totals(conn, 2024, 7)) == after_first
+
+    apply_history(conn, replay_import, second.import_id)
+    assert (sales(conn), summary_totals(conn, 2024, 7)) == after_second
+
+
+def test_rollback_only_latest_import(conn, sellers, write_sheet):
+    first = process_file(conn, write_sheet('julho.csv', JULY))
+    process_file(conn, write_sheet('julho2.csv', JULY_CHANGED))
+
+    with pytest.raises(ValueError, match='não é a mais recente'):
+        apply_history(conn, rollback_import, first.import_id)
+    conn.rollback()
+
+
+def test_rollback_refuses_sales_changed_after_import(conn, sellers, write_sheet):
+    result = process_file(conn, write_sheet('julho.csv', JULY))
+    conn.execute("UPDATE Sales SET amount = 1 WHERE order_number = '1001'")
+    conn.commit()
+
+    with pytest.raises(ValueError, match='alteradas depois'):
+        apply_history(conn, rollback_import, result.import_id)
+    conn.rollback()
+
+    apply_history(conn, rollback_import, result.import_id, force=True)
+    assert sales(conn) == []
+    assert summary_totals(conn, 2024, 7) == []
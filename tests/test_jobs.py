@@ -0,0 +1,52 @@
+from modules.db import timestamp
+from modules.sales.jobs import run_job
+
+LEASE_SECONDS = 600
+
+
+def add_job(conn, path, status, updated_at):
+    cursor = conn.execute('''
+        INSERT INTO ImportJobs (file_name, file_path, status, created_at, updated_at) VALUES ('julho.csv', ?, ?, ?, ?)
+        RETURNING id
+    ''', (path, status, updated_at, updated_at))
+    job_id = cursor.fetchone()[0]
+    conn.commit()
+    return job_id
+
+
+def job(conn, job_id):
+    conn.commit()  # Enxergar o que a conexão do job gravou
+    return conn.execute('SELECT status, updated_at, import_id FROM ImportJobs WHERE id = ?', (job_id,)).fetchone()
+
+
+def test_running_job_within_lease_is_not_taken(conn, database, sellers, write_sheet):
+    updated_at = timestamp(60)
+    job_id = add_job(conn, write_sheet('julho.csv', [('2024-07-01', 100.0, '1001', 'Ana Souza')]), 'running',
+                     updated_at)
+
+    run_job(database, job_id, LEASE_SECONDS)
+
+    assert tuple(job(conn, job_id)) == ('running', updated_at, None)
+    assert conn.execute('SELECT COUNT(*) FROM Sales').fetchone()[0] == 0
+
+
+def test_running_job_past_lease_is_resumed(conn, database, sellers, write_sheet):
+    job_id = add_job(conn, write_sheet('julho.csv', [('2024-07-01', 100.0, '1001', 'Ana Souza')]), 'running',
+                     timestamp(LEASE_SECONDS + 60))
+
+    run_job(database, job_id, LEASE_SECONDS)
+
+    row = job(conn, job_id)
+    assert row['status'] == 'done' and row['import_id'] is not None
+    assert conn.execute('SELECT COUNT(*) FROM Sales').fetchone()[0] == 1
+
+
+def test_queued_job_is_processed_once(conn, database, sellers, write_sheet):
+    job_id = add_job(conn, write_sheet('julho.csv', [('2024-07-01', 100.0, '1001', 'Ana Souza')]), 'queued',
+                     timestamp())
+
+    run_job(database, job_id, LEASE_SECONDS)
+    run_job(database, job_id, LEASE_SECONDS)
+
+    assert job(conn, job_id)['status'] == 'done'
+    assert conn.execute('SELECT COUNT(*) FROM Imports').fetchone()[0] == 1
@@ -0,0 +1,19 @@
+import os
+import pytest
+import subprocess
+import sys
+
+# Cada pacote de modules deve poder ser importado sozinho, como fazem os
+# comandos da CLI, os workers e os benchmarks. O import roda em um processo
+# novo, porque neste os demais pacotes já foram importados pelo conftest.py.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGES = sorted(name for name in os.listdir(os.path.join(ROOT, 'modules'))
+                  if os.path.isfile(os.path.join(ROOT, 'modules', name, '__init__.py')))
+
+
+@pytest.mark.parametrize('package', PACKAGES)
+def test_package_imports_on_its_own(package):
+    process = subprocess.run([sys.executable, '-c', f'import modules.{package}'], cwd=ROOT,
+                             capture_output=True, text=True)
+    assert process.returncode == 0, process.stderr
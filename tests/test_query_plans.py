@@ -0,0 +1,98 @@
+from modules.api import sales_page, decode_cursor
+from modules.sales.importer import process_file
+from modules.sales.reconcile import create_staging, stage_orders, fingerprint_staging, merge_staging
+from modules.summary import refresh_monthly_summary
+import pytest
+import re
+
+# As consultas de Sales por período (totais do resumo mensal usados pelos
+# dashboards, lista de vendas de um vendedor e remoção das vendas do mês na
+# importação) devem buscar nos índices de data, ou pelo número do pedido, e
+# não percorrer a tabela.
+# Os comandos são os executados de fato pelas funções, capturados com o
+# trace do sqlite3 (já com os parâmetros) e passados ao EXPLAIN QUERY PLAN.
+
+INDEXED = re.compile(r'^SEARCH (Sales|s) USING (COVERING )?INDEX idx_sales_(date|user_date_amount|user_date_order|order_number) ')
+SCAN = re.compile(r'^SCAN (Sales|s)\b')
+
+
+@pytest.fixture
+def database(tmp_path):
+    # O trace e o EXPLAIN QUERY PLAN são do SQLite
+    return str(tmp_path / 'comisys.db')
+
+
+def period_queries(conn, run):
+    """Executa `run` e retorna os comandos que filtraram Sales por data."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        run()
+    finally:
+        conn.set_trace_callback(None)
+    # Os gatilhos repetem o comando que os disparou no trace
+    return [sql for sql in dict.fromkeys(statements)
+            if re.search(r'FROM Sales\b', sql) and re.search(r'\bdate >= ', sql)]
+
+
+def query_plan(conn, sql):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()]
+
+
+def assert_uses_date_index(conn, queries):
+    assert queries
+    for sql in queries:
+        plan = query_plan(conn, sql)
+        assert not [detail for detail in plan if SCAN.match(detail)], plan
+        assert [detail for detail in plan if INDEXED.match(detail)], plan
+
+
+def seed(conn, sellers, write_sheet):
+    """Alguns meses de vendas, com as estatísticas do planejador atualizadas."""
+    for month in range(1, 7):
+        process_file(conn, write_sheet(f'{month:02d}.csv', [
+            (f'2024-{month:02d}-{day:02d}', 10.0 * day, f'{month}{day:03d}{index}', seller)
+            for day in range(1, 29) for index, seller in enumerate(sellers)
+        ]))
+    cursor = conn.cursor()
+    conn.storage.analyze(cursor)
+    conn.commit()
+
+
+def test_monthly_totals_use_date_index(conn, sellers, write_sheet):
+    seed(conn, sellers, write_sheet)
+    cursor = conn.cursor()
+
+    queries = period_queries(conn, lambda: refresh_monthly_summary(cursor, {(2024, 3)}))
+
+    assert_uses_date_index(conn, queries)
+    conn.rollback()
+
+
+def test_seller_sales_list_uses_date_index(conn, sellers, write_sheet):
+    seed(conn, sellers, write_sheet)
+    cursor = conn.cursor()
+    seller_id = sellers['Ana Souza']
+
+    def run():
+        rows, next_cursor = sales_page(cursor, seller_id, 2024, 3, limit=10)
+        sales_page(cursor, seller_id, 2024, 3, decode_cursor(next_cursor), limit=10)
+
+    assert_uses_date_index(conn, period_queries(conn, run))
+
+
+def test_import_month_purge_uses_date_index(conn, sellers, write_sheet):
+    seed(conn, sellers, write_sheet)
+    cursor = conn.cursor()
+    create_staging(cursor)
+    stage_orders(cursor, [('3001', '2024-03-01', 5.0, sellers['Ana Souza'])])
+    fingerprint_staging(cursor)
+
+    queries = period_queries(conn, lambda: merge_staging(cursor, 2024, 3))
+
+    # merge_staging apaga ImportStaging no fim, e ImportDiff só existe até o
+    # rollback: o plano é conferido com as duas tabelas temporárias presentes
+    create_staging(cursor)
+    assert_uses_date_index(conn, queries)
+    conn.rollback()
+
@@ -0,0 +1,28 @@
+from modules.dashboards.snapshot import Snapshot
+from modules.goals.batch import save_goals
+import pytest
+
+
+@pytest.fixture
+def database(tmp_path):
+    # A cópia de leitura só existe no SQLite
+    return str(tmp_path / 'comisys.db')
+
+
+def test_snapshot_is_copied_again_only_when_dashboard_data_changes(conn, database, tmp_path):
+    snapshot = Snapshot(database, str(tmp_path / 'snapshots'))
+    assert snapshot.refresh()
+    assert not snapshot.refresh()
+
+    # Commits que não mudam os dados dos dashboards (ex.: andamento de uma importação)
+    conn.execute('''
+        INSERT INTO ImportJobs (file_name, file_path, status, created_at, updated_at)
+        VALUES ('julho.csv', 'julho.csv', 'running', '2024-07-31 10:00:00', '2024-07-31 10:00:00')
+    ''')
+    conn.commit()
+    assert not snapshot.refresh()
+
+    save_goals(conn.cursor(), [(2024, 7, 1000.0)], [])
+    conn.commit()
+    assert snapshot.refresh()
+    assert snapshot.version == 2
@@ -1,4 +1,5 @@
 import unicodedata
+from functools import lru_cache
 
 # Filtros de formatação de texto
 
@@ -6,6 +7,19 @@ def format_currency(value):
     return f'R$ {value:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
 
 
+def parse_currency(value):
+    """Converte valores digitados como '225.000,00', 'R$ 1.500' ou '1500.5' em float (vazio vira None)."""
+    text = str(value).replace('R$', '').replace(' ', '').replace('\xa0', '').strip()
+    if not text:
+        return None
+    if ',' in text:
+        text = text.replace('.', '').replace(',', '.')
+    elif text.count('.') > 1 or (text.count('.') == 1 and len(text.split('.')[1]) == 3):
+        # Só pontos de milhar, como em '225.000'
+        text = text.replace('.', '')
+    return float(text)
+
+
 def format_percentage(value):
     return f'{value:,.2f}%'.replace(',', 'X').replace('X', '.')
 
@@ -14,6 +28,13 @@ def remove_accents(input_str):
     nfkd_form = unicodedata.normalize('NFKD', input_str)
     return u"".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
+
+@lru_cache(maxsize=4096)
+def normalize_name(name):
+    """Forma usada para comparar nomes de vendedores: sem acentos, espaços extras ou diferença de caixa."""
+    return remove_accents(' '.join(str(name).split()).title())
+
+
 def month_name(month_number):
     months = {
         1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril", 5: "Maio", 6: "Junho",